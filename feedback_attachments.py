@@ -0,0 +1,156 @@
+# Interactive Feedback MCP attachment store
+# Screenshots and log files uploaded with an answer are written to a
+# content-addressed directory: a file is named after the SHA-256 of its bytes
+# (plus its extension), so the same file uploaded twice is stored once. The
+# agent gets the paths back in the feedback text and reads the files itself.
+# Old files are swept when a store is first opened in a process: anything not
+# uploaded within the retention period goes, then the oldest files until the
+# store fits its size cap.
+import os
+import re
+import time
+import hashlib
+import mimetypes
+import tempfile
+import threading
+from dataclasses import dataclass
+from typing import BinaryIO, Optional
+
+# Bytes copied at a time while hashing an upload into the store
+COPY_CHUNK_SIZE = 1024 * 1024
+# Types the page may show inline as a preview; everything else is served as a download
+PREVIEW_TYPES = {"image/png", "image/jpeg", "image/gif", "image/webp", "image/bmp"}
+# Files not uploaded again for this long are removed (0 keeps them all)
+DEFAULT_RETENTION_DAYS = 7
+# Oldest files are removed once the store is larger than this (0 means no limit)
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+_ATTACHMENT_ID = re.compile(r"[0-9a-f]{64}(\.[a-z0-9]{1,10})?")
+_EXTENSION = re.compile(r"\.[a-z0-9]{1,10}")
+_CONTROL_CHARS = re.compile(r"[\x00-\x1f\x7f]")
+
+# Roots already swept by this process; a subprocess web child sweeps once per question
+_swept_roots = set()
+_sweep_lock = threading.Lock()
+
+def default_attachment_dir() -> str:
+    uid = os.getuid() if hasattr(os, "getuid") else os.environ.get("USERNAME", "user")
+    default = os.path.join(tempfile.gettempdir(), f"interactive-feedback-attachments-{uid}")
+    return os.environ.get("INTERACTIVE_FEEDBACK_ATTACHMENT_DIR", default)
+
+def _extension(filename: Optional[str]) -> str:
+    ext = os.path.splitext(filename or "")[1].lower()
+    return ext if _EXTENSION.fullmatch(ext) else ""
+
+@dataclass
+class Attachment:
+    id: str
+    path: str
+    filename: str
+    content_type: str
+    size: int
+
+    @property
+    def previewable(self) -> bool:
+        return self.content_type in PREVIEW_TYPES
+
+    def describe(self) -> str:
+        """One line for the feedback text handed back to the agent."""
+        return f"{self.path} ({self.filename}, {self.content_type}, {self.size} bytes)"
+
+def content_type_for(attachment_id: str) -> str:
+    return mimetypes.guess_type("file" + _extension(attachment_id))[0] or "application/octet-stream"
+
+class AttachmentStore:
+    """Content-addressed files under root/<first two hex digits>/<sha256><ext>."""
+
+    def __init__(self, root: Optional[str] = None, retention_days: Optional[float] = None,
+                 max_bytes: Optional[int] = None):
+        self.root = root or default_attachment_dir()
+        environ = os.environ
+        self.retention_days = retention_days if retention_days is not None else float(
+            environ.get("INTERACTIVE_FEEDBACK_ATTACHMENT_DAYS", DEFAULT_RETENTION_DAYS))
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            environ.get("INTERACTIVE_FEEDBACK_ATTACHMENT_MAX_BYTES", DEFAULT_MAX_BYTES))
+        with _sweep_lock:
+            first_open = self.root not in _swept_roots
+            _swept_roots.add(self.root)
+        if first_open:
+            self.prune()
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Apply the retention policy to the files on disk; returns how many were removed."""
+        if self.retention_days <= 0 and self.max_bytes <= 0:
+            return 0
+        now = time.time() if now is None else now
+        files = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        # Oldest first; mtime is refreshed whenever the same content is uploaded again
+        files.sort()
+        cutoff = now - self.retention_days * 86400 if self.retention_days > 0 else None
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for mtime, size, path in files:
+            expired = cutoff is not None and mtime < cutoff
+            if not expired and (self.max_bytes <= 0 or total <= self.max_bytes):
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    def path_for(self, attachment_id: str) -> Optional[str]:
+        """Path of a stored attachment, or None for unknown or malformed ids."""
+        if not _ATTACHMENT_ID.fullmatch(attachment_id):
+            return None
+        path = os.path.join(self.root, attachment_id[:2], attachment_id)
+        return path if os.path.isfile(path) else None
+
+    def put(self, source: BinaryIO, filename: Optional[str] = None,
+            content_type: Optional[str] = None) -> Attachment:
+        """Stream source into the store, hashing as it goes; duplicates are kept once."""
+        os.makedirs(self.root, mode=0o700, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=self.root, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = source.read(COPY_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+            attachment_id = digest.hexdigest() + _extension(filename)
+            path = os.path.join(self.root, attachment_id[:2], attachment_id)
+            os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+            try:
+                # Uploaded again, so it counts as new for the retention sweep
+                os.utime(path)
+            except FileNotFoundError:
+                # Atomic, so a concurrent reader never sees a half-written file
+                os.replace(temp_path, path)
+            else:
+                os.unlink(temp_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+        # The extension decides how the file is served, so it decides the type too
+        if _extension(attachment_id) or not content_type:
+            content_type = content_type_for(attachment_id)
+        # The name ends up in the agent's feedback text; keep it to one line
+        filename = _CONTROL_CHARS.sub("_", os.path.basename(filename or "")) or attachment_id
+        return Attachment(attachment_id, path, filename, content_type, size)
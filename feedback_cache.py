@@ -0,0 +1,130 @@
+# Interactive Feedback MCP answer cache
+# Agents often ask the same question with the same options several times in one
+# session ("Proceed with the migration?"). With the cache enabled, an answer is
+# remembered for a while, keyed by the normalized question and options:
+#
+#   off      never cache (default)
+#   suggest  ask again, but offer "reuse previous answer" as the first option
+#   auto     return the previous answer straight away, without asking
+#
+# When one server is shared by several MCP clients (HTTP transport), answers are
+# scoped to the client session that got them, so one IDE never reuses another's.
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+CACHE_MODES = ("off", "suggest", "auto")
+DEFAULT_TTL = 3600
+DEFAULT_MAX_ENTRIES = 128
+# Characters of the previous answer shown in the reuse option
+REUSE_PREVIEW_CHARS = 80
+REUSE_PREFIX = "↩ Reuse previous answer: "
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize(text: str) -> str:
+    """Case and whitespace differences don't make a question new."""
+    return _WHITESPACE.sub(" ", text).strip().casefold()
+
+def cache_key(message: str, options: Optional[List[str]], scope: Optional[str] = None) -> str:
+    normalized = [normalize(message), [normalize(option) for option in options or []]]
+    if scope:
+        normalized.append(scope)
+    return hashlib.sha256(json.dumps(normalized, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def cacheable(answer: str) -> bool:
+    """Empty answers (window closed, timeout) and errors are never reused."""
+    return bool(answer.strip()) and not answer.startswith("Error:")
+
+def reuse_option(answer: str) -> str:
+    preview = _WHITESPACE.sub(" ", answer).strip()
+    if len(preview) > REUSE_PREVIEW_CHARS:
+        preview = preview[:REUSE_PREVIEW_CHARS - 1] + "…"
+    return REUSE_PREFIX + preview
+
+def resolve_reuse(feedback: str, option: str, answer: str) -> Tuple[str, bool]:
+    """Swap the reuse option in a returned answer for the answer it stands for.
+
+    The option is always first, so when picked it leads the answer, followed by
+    "; " and more options, by "\\n\\n" and typed text, or by nothing.
+    Returns (feedback, whether the previous answer was reused).
+    """
+    if not feedback.startswith(option):
+        return feedback, False
+    rest = feedback[len(option):]
+    if rest.startswith("; "):
+        rest = "\n\n" + rest[2:]
+    elif rest and not rest.startswith("\n\n"):
+        # An option that merely starts with the same text
+        return feedback, False
+    return answer + rest, True
+
+class AnswerCache:
+    """Bounded LRU of answers with a time-to-live, plus hit/miss counters."""
+
+    def __init__(self, mode: str = "off", ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 clock=time.monotonic):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"answer cache mode must be one of {', '.join(CACHE_MODES)}, not {mode!r}")
+        self.mode = mode
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0, "reused": 0}
+
+    @classmethod
+    def from_env(cls, environ) -> "AnswerCache":
+        return cls(
+            mode=environ.get("INTERACTIVE_FEEDBACK_ANSWER_CACHE", "off").strip().lower() or "off",
+            ttl=float(environ.get("INTERACTIVE_FEEDBACK_ANSWER_CACHE_TTL", DEFAULT_TTL)),
+            max_entries=int(environ.get("INTERACTIVE_FEEDBACK_ANSWER_CACHE_SIZE", DEFAULT_MAX_ENTRIES)),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off" and self.max_entries > 0
+
+    def get(self, message: str, options: Optional[List[str]], scope: Optional[str] = None) -> Optional[str]:
+        key = cache_key(message, options, scope)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._clock() - entry[0] > self.ttl:
+                del self._entries[key]
+                self._counters["expired"] += 1
+                entry = None
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry[1]
+
+    def put(self, message: str, options: Optional[List[str]], answer: str, scope: Optional[str] = None):
+        if not self.enabled or not cacheable(answer):
+            return
+        key = cache_key(message, options, scope)
+        with self._lock:
+            self._entries[key] = (self._clock(), answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evicted"] += 1
+
+    def record_reuse(self):
+        """The user picked "reuse previous answer" (suggest mode)."""
+        with self._lock:
+            self._counters["reused"] += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._counters, entries=len(self._entries))
+        lookups = stats["hits"] + stats["misses"]
+        stats["lookups"] = lookups
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,309 @@
+# Interactive Feedback MCP form parser
+# Streaming parser for feedback submissions (application/x-www-form-urlencoded and
+# multipart/form-data). The request body is read in fixed-size chunks and each
+# field's value goes into its own spool that moves to a temporary file once it
+# grows past SPOOL_SIZE, so a huge pasted log is never held in memory as the raw
+# body, the parsed body and the decoded text all at once.
+import io
+import tempfile
+from http.client import parse_headers
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import unquote_to_bytes
+
+# Bytes read from the socket at a time
+CHUNK_SIZE = 64 * 1024
+# A field value larger than this is spooled to a temporary file
+SPOOL_SIZE = 1024 * 1024
+# Bodies larger than this are refused before anything is read
+MAX_BODY_SIZE = 64 * 1024 * 1024
+# Field names and multipart part headers are tiny; anything bigger is malformed
+MAX_NAME_SIZE = 1024
+MAX_PART_HEADER_SIZE = 16 * 1024
+
+class FormError(ValueError):
+    """The body isn't a well-formed form."""
+
+class FormTooLarge(FormError):
+    """The body is over the configured size limit."""
+
+class FormField:
+    """One form value, kept in memory while small and in a temporary file once large."""
+
+    __slots__ = ("name", "filename", "content_type", "size", "_buffer", "file")
+
+    def __init__(self, name: str, filename: Optional[str] = None, content_type: Optional[str] = None):
+        self.name = name
+        self.filename = filename
+        self.content_type = content_type
+        self.size = 0
+        # Most fields are a few bytes (option_3=1), so only large ones pay for a file
+        self._buffer = bytearray()
+        self.file = None
+
+    def write(self, data: bytes):
+        if not data:
+            return
+        self.size += len(data)
+        if self.file is not None:
+            self.file.write(data)
+            return
+        self._buffer += data
+        if len(self._buffer) > SPOOL_SIZE:
+            self.file = tempfile.TemporaryFile()
+            self.file.write(self._buffer)
+            self._buffer = bytearray()
+
+    @property
+    def spooled(self) -> bool:
+        """Whether the value went to disk."""
+        return self.file is not None
+
+    def read_bytes(self) -> bytes:
+        if self.file is None:
+            return bytes(self._buffer)
+        self.file.seek(0)
+        return self.file.read()
+
+    def read_text(self) -> str:
+        return self.read_bytes().decode("utf-8", errors="replace")
+
+    def open(self):
+        """A binary file object positioned at the start of the value."""
+        if self.file is None:
+            return io.BytesIO(self._buffer)
+        self.file.seek(0)
+        return self.file
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+        self._buffer = bytearray()
+
+class FormData:
+    """Parsed fields by name, in the order they arrived."""
+
+    def __init__(self):
+        self.fields: Dict[str, List[FormField]] = {}
+
+    def add(self, field: FormField):
+        self.fields.setdefault(field.name, []).append(field)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.fields
+
+    def get(self, name: str) -> Optional[FormField]:
+        values = self.fields.get(name)
+        return values[0] if values else None
+
+    def get_text(self, name: str, default: str = "") -> str:
+        field = self.get(name)
+        return field.read_text() if field is not None else default
+
+    def files(self) -> Iterator[FormField]:
+        """Uploaded file parts (multipart only)."""
+        for values in self.fields.values():
+            for field in values:
+                if field.filename is not None:
+                    yield field
+
+    def close(self):
+        for values in self.fields.values():
+            for field in values:
+                field.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _read_chunks(stream, length: int) -> Iterator[bytes]:
+    remaining = length
+    while remaining > 0:
+        chunk = stream.read(min(CHUNK_SIZE, remaining))
+        if not chunk:
+            raise FormError("request body ended early")
+        remaining -= len(chunk)
+        yield chunk
+
+def _split_content_type(content_type: str):
+    """'multipart/form-data; boundary=x' -> ('multipart/form-data', {'boundary': 'x'})"""
+    kind, *params = content_type.split(";")
+    options = {}
+    for param in params:
+        key, _, value = param.strip().partition("=")
+        options[key.lower()] = value.strip().strip('"')
+    return kind.strip().lower(), options
+
+class _UrlencodedParser:
+    """Incremental a=1&b=2 parser; a field or percent escape may straddle chunk boundaries."""
+
+    def __init__(self, form: FormData):
+        self.form = form
+        # The token cut off at the end of the last chunk: its name so far, or its field
+        self.name = b""
+        self.field: Optional[FormField] = None
+        # Undecoded tail of the value: an incomplete "%X" escape
+        self.carry = b""
+
+    def feed(self, chunk: bytes):
+        tokens = chunk.split(b"&")
+        for token in tokens[:-1]:
+            if self.field is None and not self.name:
+                # Whole token inside this chunk: the common case for option_i=1
+                self._add(*token.partition(b"=")[::2])
+            else:
+                self._continue(token)
+                self._finish()
+        self._continue(tokens[-1])
+
+    def close(self):
+        self._finish()
+
+    def _add(self, name: bytes, value: bytes):
+        if name:
+            field = FormField(_unquote(name).decode("utf-8", errors="replace"))
+            field.write(_unquote(value))
+            self.form.add(field)
+
+    def _continue(self, data: bytes):
+        if self.field is None:
+            name, sep, value = (self.name + data).partition(b"=")
+            if not sep:
+                if len(name) > MAX_NAME_SIZE:
+                    raise FormError("form field name too long")
+                self.name = name
+                return
+            self.name = b""
+            self.field = FormField(_unquote(name).decode("utf-8", errors="replace"))
+            data = value
+        data = self.carry + data
+        # Hold back a trailing "%" or "%X" until the rest of the escape arrives
+        cut = data.rfind(b"%", max(0, len(data) - 2))
+        if cut != -1:
+            data, self.carry = data[:cut], data[cut:]
+        else:
+            self.carry = b""
+        self.field.write(_unquote(data))
+
+    def _finish(self):
+        if self.field is None:
+            # A bare name with no "=" still counts as present (e.g. a checkbox)
+            self._add(self.name, b"")
+            self.name = b""
+            return
+        self.field.write(_unquote(self.carry))
+        self.carry = b""
+        if self.field.name:
+            self.form.add(self.field)
+        self.field = None
+
+def _unquote(data: bytes) -> bytes:
+    if b"%" not in data and b"+" not in data:
+        return data
+    return unquote_to_bytes(data.replace(b"+", b" "))
+
+class _MultipartParser:
+    """Incremental multipart/form-data parser (RFC 7578)."""
+
+    def __init__(self, form: FormData, boundary: str):
+        self.form = form
+        # The first delimiter may sit at the very start of the body, with no CRLF before it
+        self.delimiter = b"\r\n--" + boundary.encode("latin-1")
+        self.buffer = b"\r\n"
+        self.state = "preamble"
+        self.field: Optional[FormField] = None
+
+    def feed(self, chunk: bytes):
+        self.buffer += chunk
+        while True:
+            if self.state == "preamble":
+                index = self.buffer.find(self.delimiter)
+                if index == -1:
+                    self.buffer = self.buffer[-len(self.delimiter):]
+                    return
+                self.buffer = self.buffer[index + len(self.delimiter):]
+                self.state = "after_delimiter"
+            elif self.state == "after_delimiter":
+                if len(self.buffer) < 2:
+                    return
+                if self.buffer.startswith(b"--"):
+                    self.state = "epilogue"
+                    self.buffer = b""
+                    return
+                self.state = "headers"
+            elif self.state == "headers":
+                end = self.buffer.find(b"\r\n\r\n")
+                if end == -1:
+                    if len(self.buffer) > MAX_PART_HEADER_SIZE:
+                        raise FormError("multipart part headers too long")
+                    return
+                self._start_part(self.buffer[:end + 4])
+                self.buffer = self.buffer[end + 4:]
+                self.state = "body"
+            elif self.state == "body":
+                index = self.buffer.find(self.delimiter)
+                if index == -1:
+                    # Keep enough bytes to recognise a delimiter split across chunks
+                    keep = len(self.delimiter) - 1
+                    if len(self.buffer) > keep:
+                        self.field.write(self.buffer[:-keep])
+                        self.buffer = self.buffer[-keep:]
+                    return
+                self.field.write(self.buffer[:index])
+                self.form.add(self.field)
+                self.field = None
+                self.buffer = self.buffer[index + len(self.delimiter):]
+                self.state = "after_delimiter"
+            else:
+                # Epilogue: ignored
+                self.buffer = b""
+                return
+
+    def close(self):
+        if self.state != "epilogue":
+            if self.field is not None:
+                self.field.close()
+            raise FormError("multipart body is missing its closing boundary")
+
+    def _start_part(self, raw_headers: bytes):
+        # The header block starts right after the delimiter line's CRLF
+        headers = parse_headers(io.BytesIO(raw_headers.lstrip(b"\r\n") or b"\r\n"))
+        disposition = headers.get("Content-Disposition", "")
+        kind, params = _split_content_type(disposition)
+        if kind != "form-data" or "name" not in params:
+            raise FormError("multipart part without a form-data name")
+        self.field = FormField(params["name"], params.get("filename"), headers.get("Content-Type"))
+
+def parse_form(stream, content_type: str, content_length: Optional[int],
+               max_size: int = MAX_BODY_SIZE) -> FormData:
+    """Read and parse a form body of content_length bytes from stream.
+
+    Raises FormTooLarge when the body is over max_size (nothing is read in
+    that case) and FormError for a missing length or a malformed body.
+    The caller closes the returned FormData to remove any spooled files.
+    """
+    if content_length is None:
+        raise FormError("Content-Length is required")
+    if content_length > max_size:
+        raise FormTooLarge(f"request body of {content_length} bytes exceeds the {max_size} byte limit")
+
+    kind, params = _split_content_type(content_type or "application/x-www-form-urlencoded")
+    form = FormData()
+    if kind == "multipart/form-data":
+        if not params.get("boundary"):
+            raise FormError("multipart body without a boundary")
+        parser = _MultipartParser(form, params["boundary"])
+    elif kind == "application/x-www-form-urlencoded":
+        parser = _UrlencodedParser(form)
+    else:
+        raise FormError(f"unsupported form content type {kind}")
+
+    try:
+        for chunk in _read_chunks(stream, content_length):
+            parser.feed(chunk)
+        parser.close()
+    except BaseException:
+        form.close()
+        raise
+    return form
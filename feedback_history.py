@@ -0,0 +1,369 @@
+# Interactive Feedback MCP history
+# An append-only record of every question asked and how it was answered, kept in
+# SQLite so it can be searched later. Enabled by naming the database file in
+# INTERACTIVE_FEEDBACK_HISTORY. Tool calls only queue their entry; a writer
+# thread inserts queued entries in batches, one transaction each, so answering a
+# question never waits on the disk. The database runs in WAL mode, so the query
+# CLI can read while the server writes:
+#
+#   python feedback_history.py search "migration" --since 7d
+#   python feedback_history.py recent --limit 50
+#   python feedback_history.py stats
+#   python feedback_history.py prune
+import os
+import re
+import sys
+import json
+import time
+import queue
+import atexit
+import sqlite3
+import argparse
+import threading
+from typing import Dict, Iterable, List, Optional
+
+# Days an entry is kept (INTERACTIVE_FEEDBACK_HISTORY_DAYS, 0 keeps everything)
+DEFAULT_RETENTION_DAYS = 180
+# Entries kept at most, oldest dropped first (INTERACTIVE_FEEDBACK_HISTORY_MAX_ENTRIES, 0 means no limit)
+DEFAULT_MAX_ENTRIES = 0
+# Entries written per transaction at most
+BATCH_SIZE = 256
+# Seconds the writer waits for more entries before committing a batch
+BATCH_WAIT = 0.2
+# Seconds between retention passes of a running writer
+PRUNE_INTERVAL = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    call TEXT,
+    tool TEXT NOT NULL,
+    client TEXT,
+    question TEXT NOT NULL,
+    options TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    seconds REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_ts ON entries (ts);
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5 (
+    question, answer, content='entries', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+    INSERT INTO entries_fts (rowid, question, answer) VALUES (new.id, new.question, new.answer);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+    INSERT INTO entries_fts (entries_fts, rowid, question, answer) VALUES ('delete', old.id, old.question, old.answer);
+END;
+"""
+
+COLUMNS = ("ts", "call", "tool", "client", "question", "options", "answer", "outcome", "seconds")
+
+_DURATION = re.compile(r"^(\d+(?:\.\d+)?)([smhdw])$")
+_DURATION_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+def connect(path: str) -> sqlite3.Connection:
+    """Open (and if needed create) the history database."""
+    db = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+    db.row_factory = sqlite3.Row
+    # Must precede the first table so freed pages can be returned by compaction
+    db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    db.execute("PRAGMA journal_mode = WAL")
+    # WAL makes NORMAL safe against corruption; at worst the last batch is lost on power failure
+    db.execute("PRAGMA synchronous = NORMAL")
+    db.executescript(SCHEMA)
+    return db
+
+def fts_query(text: str) -> str:
+    """Plain words to an FTS5 query matching all of them; a trailing * keeps prefix matching."""
+    terms = []
+    for word in text.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*")
+        if word:
+            terms.append('"' + word.replace('"', '""') + '"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+def parse_since(value: str, now: Optional[float] = None) -> float:
+    """A time bound as a duration back from now ("90m", "7d") or a Unix timestamp."""
+    match = _DURATION.match(value.strip().lower())
+    if match:
+        return (now if now is not None else time.time()) - float(match.group(1)) * _DURATION_SECONDS[match.group(2)]
+    return float(value)
+
+def entry_from_row(row: sqlite3.Row) -> Dict:
+    entry = dict(row)
+    entry["options"] = json.loads(entry["options"])
+    return entry
+
+class FeedbackHistory:
+    """The history database: queued, batched writes on a writer thread, and queries."""
+
+    def __init__(self, path: Optional[str], retention_days: float = DEFAULT_RETENTION_DAYS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.retention_days = retention_days
+        self.max_entries = max_entries
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    @classmethod
+    def from_env(cls, environ) -> "FeedbackHistory":
+        path = environ.get("INTERACTIVE_FEEDBACK_HISTORY", "").strip()
+        return cls(
+            path=os.path.expanduser(path) if path else None,
+            retention_days=float(environ.get("INTERACTIVE_FEEDBACK_HISTORY_DAYS", DEFAULT_RETENTION_DAYS)),
+            max_entries=int(environ.get("INTERACTIVE_FEEDBACK_HISTORY_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    # ---------- writing ----------
+
+    def record(self, tool: str, question: str, options: Optional[List[str]], answer: str, outcome: str,
+               seconds: float, call: Optional[str] = None, client: Optional[str] = None):
+        """Queue one answered (or unanswered) question; returns without touching the database."""
+        if not self.enabled:
+            return
+        self._start_writer()
+        self._queue.put((time.time(), call, tool, client, question,
+                         json.dumps(list(options or []), ensure_ascii=False), answer, outcome, round(seconds, 3)))
+
+    def _start_writer(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._write_loop, name="feedback-history", daemon=True)
+                self._thread.start()
+
+    def _write_loop(self):
+        try:
+            db = connect(self.path)
+        except sqlite3.Error as e:
+            # History must never break a feedback call; drop entries from now on
+            print(f"⚠️  Feedback history disabled: {e}", file=sys.stderr, flush=True)
+            self.path = None
+            self._drain()
+            return
+        self._apply_retention(db)
+        next_prune = time.monotonic() + PRUNE_INTERVAL
+        stopping = False
+        while not stopping:
+            batch, stopping = self._take_batch(max(next_prune - time.monotonic(), 0))
+            if batch:
+                self._insert(db, batch)
+            for _ in range(len(batch) + stopping):
+                self._queue.task_done()
+            if time.monotonic() >= next_prune:
+                self._apply_retention(db)
+                next_prune = time.monotonic() + PRUNE_INTERVAL
+        db.close()
+
+    def _take_batch(self, timeout: float):
+        """Wait up to timeout for an entry, then take what else arrives within BATCH_WAIT.
+
+        Returns (entries, whether close() asked the writer to stop).
+        """
+        batch = []
+        try:
+            item = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return batch, False
+        deadline = time.monotonic() + BATCH_WAIT
+        while item is not None:
+            batch.append(item)
+            if len(batch) >= BATCH_SIZE:
+                return batch, False
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                return batch, False
+        return batch, True
+
+    def _insert(self, db: sqlite3.Connection, batch: List[tuple]):
+        # search() relies on ids and timestamps growing together. Entries queued by
+        # another server process sharing the file, or after the clock stepped back,
+        # could otherwise arrive out of order, so a timestamp is never lower than the
+        # newest one already written (the write lock is held while it is read).
+        placeholders = ", ".join(["max(?, coalesce((SELECT max(ts) FROM entries), 0))"] + ["?"] * (len(COLUMNS) - 1))
+        try:
+            with db:
+                db.execute("BEGIN IMMEDIATE")
+                db.executemany(f"INSERT INTO entries ({', '.join(COLUMNS)}) VALUES ({placeholders})", batch)
+        except sqlite3.Error as e:
+            print(f"⚠️  Could not write {len(batch)} feedback history entries: {e}", file=sys.stderr, flush=True)
+
+    def _drain(self):
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+            self._queue.task_done()
+
+    def flush(self):
+        """Wait until every queued entry has been written."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self, timeout: float = 5):
+        """Write what is queued and stop the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    # ---------- retention ----------
+
+    def _apply_retention(self, db: sqlite3.Connection):
+        try:
+            removed = self.prune(db)
+        except sqlite3.Error as e:
+            # Busy with a CLI prune, say; the next pass catches up
+            print(f"⚠️  Feedback history retention pass failed: {e}", file=sys.stderr, flush=True)
+            return
+        if removed:
+            print(f"🗑️  Removed {removed} old feedback history entries", file=sys.stderr, flush=True)
+
+    def prune(self, db: Optional[sqlite3.Connection] = None, now: Optional[float] = None) -> int:
+        """Drop entries past the retention policy and compact the database; returns how many went."""
+        db = db or self._reader()
+        removed = 0
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            if self.retention_days > 0:
+                cutoff = (now if now is not None else time.time()) - self.retention_days * 86400
+                removed += db.execute("DELETE FROM entries WHERE ts < ?", (cutoff,)).rowcount
+            if self.max_entries > 0:
+                # Ids grow with time, so the newest max_entries are the highest ids
+                removed += db.execute("DELETE FROM entries WHERE id <= (SELECT id FROM entries ORDER BY id DESC "
+                                      "LIMIT 1 OFFSET ?)", (self.max_entries,)).rowcount
+        if removed:
+            # Merge the full-text index's segments, give freed pages back and shrink the WAL
+            db.execute("INSERT INTO entries_fts (entries_fts) VALUES ('optimize')")
+            # The pragma frees one page per step; executescript runs it to completion
+            db.executescript("PRAGMA incremental_vacuum;")
+            db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return removed
+
+    # ---------- queries ----------
+
+    def _reader(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = connect(self.path)
+        return self._db
+
+    def _first_id_since(self, ts: float) -> Optional[int]:
+        """Id of the first entry at or after ts, found through the ts index."""
+        row = self._reader().execute("SELECT id FROM entries WHERE ts >= ? ORDER BY ts LIMIT 1", (ts,)).fetchone()
+        return row[0] if row else None
+
+    def search(self, text: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None,
+               limit: int = 20) -> List[Dict]:
+        """Newest entries first, optionally matching all words of text and within [since, until)."""
+        # Entries are appended in time order (see _insert), so a time range is a range of ids. Both the
+        # table and the full-text index then walk ids backwards and stop after limit rows,
+        # however many entries match.
+        low, high = 0, None
+        if since is not None:
+            low = self._first_id_since(since)
+            if low is None:
+                return []
+        if until is not None:
+            high = self._first_id_since(until)
+        where, params = ["rowid >= ?"], [low]
+        if high is not None:
+            where.append("rowid < ?")
+            params.append(high)
+        query = fts_query(text or "")
+        if query:
+            where.insert(0, "entries_fts MATCH ?")
+            params.insert(0, query)
+            sql = ("SELECT * FROM entries WHERE id IN (SELECT rowid FROM entries_fts WHERE " + " AND ".join(where) +
+                   " ORDER BY rowid DESC LIMIT ?) ORDER BY id DESC")
+        else:
+            sql = "SELECT * FROM entries WHERE " + " AND ".join(where) + " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        return [entry_from_row(row) for row in self._reader().execute(sql, params)]
+
+    def stats(self) -> Dict:
+        row = self._reader().execute("SELECT COUNT(*) AS entries, MIN(ts) AS oldest, MAX(ts) AS newest FROM entries").fetchone()
+        stats = dict(row)
+        stats["outcomes"] = {outcome: count for outcome, count in self._reader().execute(
+            "SELECT outcome, COUNT(*) FROM entries GROUP BY outcome ORDER BY outcome")}
+        return stats
+
+def load_history() -> FeedbackHistory:
+    """The history configured by INTERACTIVE_FEEDBACK_HISTORY* (off unless a file is named)."""
+    try:
+        history = FeedbackHistory.from_env(os.environ)
+    except ValueError as e:
+        print(f"⚠️  Feedback history disabled: {e}", file=sys.stderr, flush=True)
+        return FeedbackHistory(None)
+    # Write whatever is still queued when the server exits
+    atexit.register(history.close)
+    return history
+
+def format_entry(entry: Dict, width: int = 60) -> str:
+    def preview(text):
+        text = " ".join(text.split())
+        return text if len(text) <= width else text[:width - 1] + "…"
+    when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["ts"]))
+    client = f" [{entry['client']}]" if entry["client"] else ""
+    return f"{when} {entry['outcome']:<9} {entry['seconds']:>7.1f}s{client}  {preview(entry['question'])}  →  {preview(entry['answer'])}"
+
+def print_entries(entries: Iterable[Dict], as_json: bool):
+    for entry in entries:
+        print(json.dumps(entry, ensure_ascii=False) if as_json else format_entry(entry))
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Query the interactive feedback history")
+    parser.add_argument("--db", default=os.environ.get("INTERACTIVE_FEEDBACK_HISTORY"),
+                        help="History database (default: INTERACTIVE_FEEDBACK_HISTORY)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("search", "Entries whose question or answer contains all the words"),
+                            ("recent", "The newest entries")):
+        command = commands.add_parser(name, help=help_text)
+        if name == "search":
+            command.add_argument("text", help="Words to look for; end one with * to match a prefix")
+        command.add_argument("--since", help="Only entries since then: a duration like 90m, 7d, or a Unix time")
+        command.add_argument("--until", help="Only entries before then, in the same form")
+        command.add_argument("--limit", type=int, default=20)
+        command.add_argument("--json", action="store_true", help="One JSON object per line")
+    commands.add_parser("stats", help="Entry count, time span and outcomes")
+    commands.add_parser("prune", help="Apply the retention policy now and compact the database")
+    args = parser.parse_args(argv)
+
+    if not args.db:
+        parser.error("no history database: pass --db or set INTERACTIVE_FEEDBACK_HISTORY")
+    if not os.path.exists(os.path.expanduser(args.db)):
+        parser.error(f"no history database at {args.db}")
+    environ = dict(os.environ, INTERACTIVE_FEEDBACK_HISTORY=args.db)
+    history = FeedbackHistory.from_env(environ)
+    try:
+        if args.command in ("search", "recent"):
+            now = time.time()
+            since = parse_since(args.since, now) if args.since else None
+            until = parse_since(args.until, now) if args.until else None
+            print_entries(history.search(getattr(args, "text", None), since, until, args.limit), args.json)
+        elif args.command == "stats":
+            print(json.dumps(history.stats(), ensure_ascii=False, indent=2))
+        else:
+            print(f"Removed {history.prune()} entries")
+    except sqlite3.OperationalError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    finally:
+        history.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
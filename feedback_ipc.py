@@ -0,0 +1,177 @@
+# Interactive Feedback MCP result channel
+# Framed messages from a feedback child process (feedback_web.py / feedback_ui.py)
+# back to server.py over the child's stdout pipe, replacing the temp-file round trip.
+#
+# Each frame is a 4-byte big-endian length followed by a UTF-8 JSON object with a
+# "type" of "progress", "result" or "error". A child sends any number of progress
+# frames and then exactly one result or error frame.
+#
+# A web child sends a "finished" progress frame with "tab_open" just before its
+# result, so server.py can tell the next child whether a tab will reconnect.
+#
+# The question travels the other way as a single "request" frame on the child's
+# stdin, so prompts of any size avoid the command line length limit.
+import os
+import sys
+import json
+import struct
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+FRAME_HEADER = struct.Struct(">I")
+# Sanity limit so a corrupted header can't make the reader allocate gigabytes
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+# Set to "1" by server.py when the previous web child finished with its page still
+# open: the next child waits briefly for that tab to reconnect instead of opening another
+TAB_OPEN_ENV = "INTERACTIVE_FEEDBACK_TAB_OPEN"
+
+class FrameError(ValueError):
+    """The channel carried something that isn't a valid frame."""
+
+def encode_frame(message: Dict[str, Any]) -> bytes:
+    payload = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+def decode_payload(payload: bytes) -> Dict[str, Any]:
+    try:
+        message = json.loads(payload.decode("utf-8"))
+    except ValueError as e:
+        raise FrameError(f"invalid frame payload: {e}") from e
+    if not isinstance(message, dict) or "type" not in message:
+        raise FrameError("frame is missing its type")
+    return message
+
+def _check_size(size: int):
+    if size > MAX_FRAME_SIZE:
+        raise FrameError(f"frame of {size} bytes exceeds the {MAX_FRAME_SIZE} byte limit")
+
+def encode_request(prompt: str, predefined_options: Optional[List[str]] = None,
+                   questions: Optional[List[Dict[str, Any]]] = None) -> bytes:
+    request = {"type": "request", "prompt": prompt, "predefined_options": predefined_options or []}
+    if questions:
+        request["questions"] = questions
+    return encode_frame(request)
+
+def parse_options(options: Any) -> Optional[List[str]]:
+    """Validate a decoded options list; None when there are no options."""
+    if options is None:
+        return None
+    if not isinstance(options, list) or not all(isinstance(option, str) for option in options):
+        raise FrameError("predefined options must be a list of strings")
+    return options or None
+
+def parse_questions(questions: Any) -> Optional[List[Dict[str, Any]]]:
+    """Validate a decoded batch of {"prompt", "predefined_options"} questions; None when absent."""
+    if not questions:
+        return None
+    if not isinstance(questions, list) or not all(isinstance(q, dict) for q in questions):
+        raise FrameError("questions must be a list of objects")
+    parsed = []
+    for question in questions:
+        prompt = question.get("prompt")
+        if not isinstance(prompt, str):
+            raise FrameError("every question needs a prompt")
+        parsed.append({"prompt": prompt, "predefined_options": parse_options(question.get("predefined_options")) or []})
+    return parsed
+
+def read_request(stream) -> Tuple[str, Optional[List[str]], Optional[List[Dict[str, Any]]]]:
+    """Read the question a parent sent with encode_request(), returning (prompt, options, questions)."""
+    frame = next(read_frames(stream), None)
+    if frame is None or frame["type"] != "request":
+        raise FrameError("expected a request frame on stdin")
+    return (frame.get("prompt", ""), parse_options(frame.get("predefined_options")),
+            parse_questions(frame.get("questions")))
+
+def _read_exact(stream, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+def read_frames(stream) -> Iterator[Dict[str, Any]]:
+    """Yield frames from a binary stream (e.g. a child's stdout pipe) as they arrive."""
+    while True:
+        header = _read_exact(stream, FRAME_HEADER.size)
+        if not header:
+            return
+        if len(header) < FRAME_HEADER.size:
+            raise FrameError("truncated frame header")
+        (size,) = FRAME_HEADER.unpack(header)
+        _check_size(size)
+        payload = _read_exact(stream, size)
+        if len(payload) < size:
+            raise FrameError("truncated frame")
+        yield decode_payload(payload)
+
+async def read_frame(reader) -> Optional[Dict[str, Any]]:
+    """Read one frame from an asyncio.StreamReader; None at end of stream."""
+    # Only the parent reads asynchronously; keep asyncio out of the children's startup
+    import asyncio
+    try:
+        header = await reader.readexactly(FRAME_HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            raise FrameError("truncated frame header") from e
+        return None
+    (size,) = FRAME_HEADER.unpack(header)
+    _check_size(size)
+    try:
+        payload = await reader.readexactly(size)
+    except asyncio.IncompleteReadError as e:
+        raise FrameError("truncated frame") from e
+    return decode_payload(payload)
+
+class FrameWriter:
+    """Child side of the channel."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def send(self, message: Dict[str, Any]):
+        self.stream.write(encode_frame(message))
+        self.stream.flush()
+
+    def progress(self, stage: str, **fields: Any):
+        self.send({"type": "progress", "stage": stage, **fields})
+
+    def result(self, result: Dict[str, str]):
+        self.send({"type": "result", "result": result})
+
+    def error(self, message: str):
+        self.send({"type": "error", "message": message})
+
+def open_stdout_channel() -> FrameWriter:
+    """Take over stdout for frames and send everything else printed to stderr.
+
+    fd 1 itself is pointed at stderr, so stray output from libraries and from
+    processes we spawn (e.g. the browser) can't corrupt the frame stream.
+    """
+    sys.stdout.flush()
+    channel_fd = os.dup(1)
+    os.dup2(2, 1)
+    return FrameWriter(os.fdopen(channel_fd, "wb"))
+
+def frame_result(frame: Dict[str, Any]) -> Optional[Dict[str, str]]:
+    """The feedback result carried by a result or error frame; None for progress frames."""
+    kind = frame["type"]
+    if kind == "result":
+        return frame["result"]
+    if kind == "error":
+        return {"interactive_feedback": f"Error: {frame.get('message', 'Feedback collection failed')}"}
+    return None
+
+def result_from_frames(frames, on_progress=None) -> Dict[str, str]:
+    """Reduce a sequence of frames to the feedback result.
+
+    Raises FrameError when the child ended without a result or error frame.
+    """
+    for frame in frames:
+        result = frame_result(frame)
+        if result is not None:
+            return result
+        if on_progress is not None:
+            on_progress(frame)
+    raise FrameError("feedback process exited without sending a result")
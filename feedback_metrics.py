@@ -0,0 +1,198 @@
+# Interactive Feedback MCP metrics
+# Timing spans and Prometheus-style metrics for feedback calls. Each phase of a
+# call (backend selection, spawn, bind, browser open, first page view, submit,
+# result parse) is recorded as a span: appended as one JSON line to the file named
+# by INTERACTIVE_FEEDBACK_SPANS, and observed in a histogram: machine phases in
+# millisecond buckets, phases that include waiting for a person in buckets of
+# seconds to minutes. The web feedback server exposes the histograms and counters
+# at /metrics, together with a separate histogram of how long people take to answer.
+import os
+import json
+import time
+import uuid
+import bisect
+import threading
+import contextvars
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Upper bounds (seconds) of the phase latency buckets: spawn and bind are milliseconds
+PHASE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Upper bounds (seconds) of the human response time buckets
+RESPONSE_BUCKETS = (1, 2, 5, 10, 20, 30, 60, 120, 300, 600, 1800)
+# Phases whose duration includes a person reading or answering the question;
+# in PHASE_BUCKETS nearly all of them would land in +Inf
+WAIT_PHASES = frozenset({"first_view", "submit", "call", "timeout"})
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    "interactive_feedback_calls_total":
+        ("counter", "Feedback tool calls by tool and outcome", None),
+    "interactive_feedback_phase_seconds":
+        ("histogram", "Duration of the machine phases of a feedback call", PHASE_BUCKETS),
+    "interactive_feedback_wait_phase_seconds":
+        ("histogram", "Duration of the phases of a feedback call that include waiting for a person",
+         RESPONSE_BUCKETS),
+    "interactive_feedback_response_seconds":
+        ("histogram", "Time from the question being shown to the answer being submitted", RESPONSE_BUCKETS),
+    "interactive_feedback_http_requests_total":
+        ("counter", "Requests served by the web feedback server by method and status", None),
+    "interactive_feedback_sessions_pending":
+        ("gauge", "Questions waiting for an answer on the web feedback server", None),
+    "interactive_feedback_answer_cache_total":
+        ("counter", "Answer cache events by kind", None),
+    "interactive_feedback_answer_cache_entries":
+        ("gauge", "Answers held by the answer cache", None),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+# Passes the call id to a feedback subprocess, so its spans join the server's
+CALL_ENV = "INTERACTIVE_FEEDBACK_CALL"
+
+# Feedback call the current task or thread works for; spans carry it so phases can be joined up
+_current_call: contextvars.ContextVar = contextvars.ContextVar("interactive_feedback_call", default=None)
+# Label of the MCP client that made the call, when one server is shared by several clients
+_current_client: contextvars.ContextVar = contextvars.ContextVar("interactive_feedback_client", default=None)
+
+def start_call(client: Optional[str] = None) -> str:
+    """Give the current feedback call an id; asyncio.to_thread() passes it on to worker threads."""
+    call_id = uuid.uuid4().hex[:16]
+    _current_call.set(call_id)
+    _current_client.set(client)
+    return call_id
+
+def join_call(call_id: Optional[str]) -> Optional[str]:
+    """Continue a call started in another process (the server that spawned this one)."""
+    _current_call.set(call_id or None)
+    return call_id or None
+
+def current_call() -> Optional[str]:
+    return _current_call.get()
+
+def current_client() -> Optional[str]:
+    return _current_client.get()
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Iterable[float]):
+        self.buckets = tuple(buckets)
+        # One count per bucket plus +Inf; made cumulative when rendered
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class MetricsRegistry:
+    """Counters and histograms from METRICS, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        # Called at render time for gauges and counters kept elsewhere (e.g. the answer cache)
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(METRICS[name][2])
+            histogram.observe(value)
+
+    def add_collector(self, collector: Callable[[], Iterable[Sample]]):
+        self._collectors.append(collector)
+
+    def counter_value(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get((name, _labels(labels)), 0)
+
+    def histogram(self, name: str, **labels) -> Optional[Histogram]:
+        with self._lock:
+            return self._histograms.get((name, _labels(labels)))
+
+    def render(self, extra: Iterable[Sample] = ()) -> str:
+        samples: Dict[str, List[str]] = {name: [] for name in METRICS}
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                samples[name].append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                    cumulative += count
+                    le = _labels(dict(labels, le=bound if bound == "+Inf" else _format_value(bound)))
+                    samples[name].append(f"{name}_bucket{_format_labels(le)} {cumulative}")
+                samples[name].append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}")
+                samples[name].append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+            collectors = list(self._collectors)
+
+        extra = list(extra)
+        for collector in collectors:
+            extra.extend(collector())
+        for name, labels, value in extra:
+            samples[name].append(f"{name}{_format_labels(_labels(labels))} {_format_value(value)}")
+
+        lines = []
+        for name, (kind, help_text, _) in METRICS.items():
+            if samples[name]:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(samples[name])
+        return "\n".join(lines) + "\n"
+
+class SpanLog:
+    """Appends span records as JSON lines; one write per line, so processes can share a file."""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def write(self, record: Dict):
+        if not self.path:
+            return
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            try:
+                if self._file is None:
+                    self._file = open(self.path, "a", encoding="utf-8")
+                self._file.write(line)
+                self._file.flush()
+            except OSError:
+                # Tracing must never break a feedback call
+                self.path = None
+
+metrics = MetricsRegistry()
+span_log = SpanLog(os.environ.get("INTERACTIVE_FEEDBACK_SPANS"))
+
+def record_span(phase: str, seconds: float, call: Optional[str] = None, **fields) -> Dict:
+    """Record one phase of a feedback call; returns the span record."""
+    record = {"ts": round(time.time(), 6), "call": call or current_call(), "phase": phase,
+              "ms": round(seconds * 1000, 3), **fields}
+    name = "interactive_feedback_wait_phase_seconds" if phase in WAIT_PHASES else "interactive_feedback_phase_seconds"
+    metrics.observe(name, seconds, phase=phase)
+    span_log.write(record)
+    return record
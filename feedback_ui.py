@@ -6,15 +6,26 @@ import os
 import sys
 import json
 import argparse
+from collections import deque
 from typing import Optional, TypedDict, List
 
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QLabel, QLineEdit, QPushButton, QCheckBox, QTextEdit, QGroupBox,
-    QFrame
+    QLabel, QLineEdit, QPushButton, QTextEdit, QGroupBox,
+    QFrame, QListView, QScrollArea
 )
-from PySide6.QtCore import Qt, Signal, QObject, QTimer, QSettings
+from PySide6.QtCore import Qt, Signal, QObject, QTimer, QSettings, QAbstractListModel, QModelIndex
 from PySide6.QtGui import QTextCursor, QIcon, QKeyEvent, QPalette, QColor
+from PySide6.QtNetwork import QLocalServer, QLocalSocket
+
+from feedback_ipc import FrameWriter, open_stdout_channel, parse_options, read_request
+
+# Exit the GUI daemon after this many seconds without requests
+DAEMON_IDLE_TIMEOUT = 1800
+# Show a filter box above the option list from this many options on
+OPTION_FILTER_MIN = 10
+# Height of the option list, in rows, before it scrolls
+OPTION_VISIBLE_ROWS = 12
 
 class FeedbackResult(TypedDict):
     interactive_feedback: str
@@ -59,13 +70,85 @@ class FeedbackTextEdit(QTextEdit):
         else:
             super().keyPressEvent(event)
 
+class OptionListModel(QAbstractListModel):
+    """Checkable, filterable list of predefined options.
+
+    Check state is a set of option indices instead of one QCheckBox per option,
+    so thousands of options cost a list of strings, and QListView only paints
+    the rows on screen.
+    """
+
+    def __init__(self, options: List[str], parent=None):
+        super().__init__(parent)
+        self.options = options
+        self.checked = set()
+        # Option indices currently shown, in order
+        self.rows = list(range(len(options)))
+        self._lowered = None
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        option = self.rows[index.row()]
+        if role in (Qt.DisplayRole, Qt.ToolTipRole):
+            return self.options[option]
+        if role == Qt.CheckStateRole:
+            return Qt.Checked if option in self.checked else Qt.Unchecked
+        return None
+
+    def flags(self, index):
+        # Not ItemIsUserCheckable: toggle() handles clicks anywhere on the row
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+    def toggle(self, index):
+        if not index.isValid():
+            return
+        option = self.rows[index.row()]
+        if option in self.checked:
+            self.checked.remove(option)
+        else:
+            self.checked.add(option)
+        self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+
+    def set_filter(self, text: str):
+        needle = text.strip().lower()
+        self.beginResetModel()
+        if not needle:
+            self.rows = list(range(len(self.options)))
+        else:
+            if self._lowered is None:
+                self._lowered = [option.lower() for option in self.options]
+            self.rows = [i for i, option in enumerate(self._lowered) if needle in option]
+        self.endResetModel()
+
+    def selected_options(self) -> List[str]:
+        """Checked options in their original order, whatever the filter."""
+        return [self.options[i] for i in sorted(self.checked)]
+
+class OptionListView(QListView):
+    def keyPressEvent(self, event: QKeyEvent):
+        if event.key() == Qt.Key_Space and self.currentIndex().isValid():
+            self.model().toggle(self.currentIndex())
+        else:
+            super().keyPressEvent(event)
+
 class FeedbackUI(QMainWindow):
-    def __init__(self, prompt: str, predefined_options: Optional[List[str]] = None):
+    # Emitted once per request when the window is submitted or closed
+    feedback_finished = Signal(dict)
+
+    def __init__(self, prompt: str, predefined_options: Optional[List[str]] = None,
+                 questions: Optional[List[dict]] = None):
         super().__init__()
         self.prompt = prompt
         self.predefined_options = predefined_options or []
+        # Batch request: [{"prompt", "predefined_options"}], answered on one form
+        self.questions = questions or []
 
         self.feedback_result = None
+        self._finished = False
         
         self.setWindowTitle("Interactive Feedback MCP")
         script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -93,10 +176,28 @@ class FeedbackUI(QMainWindow):
 
         self._create_ui()
 
+    def load_request(self, prompt: str, predefined_options: Optional[List[str]] = None,
+                     questions: Optional[List[dict]] = None):
+        """Reuse this window for a new question (used by the GUI daemon)."""
+        self.prompt = prompt
+        self.predefined_options = predefined_options or []
+        self.questions = questions or []
+        self.feedback_result = None
+        self._finished = False
+        # setCentralWidget() disposes of the previous question's widgets
+        self._create_ui()
+
     def _create_ui(self):
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
         layout = QVBoxLayout(central_widget)
+        # One model and one text box per question; a single question is a batch of one
+        self.option_models = []
+        self.feedback_texts = []
+
+        if self.questions:
+            self._create_batch_ui(layout)
+            return
 
         # Feedback section
         self.feedback_group = QGroupBox("Feedback")
@@ -108,33 +209,10 @@ class FeedbackUI(QMainWindow):
         feedback_layout.addWidget(self.description_label)
 
         # Add predefined options if any
-        self.option_checkboxes = []
-        if self.predefined_options and len(self.predefined_options) > 0:
-            options_frame = QFrame()
-            options_layout = QVBoxLayout(options_frame)
-            options_layout.setContentsMargins(0, 10, 0, 10)
-            
-            for option in self.predefined_options:
-                checkbox = QCheckBox(option)
-                self.option_checkboxes.append(checkbox)
-                options_layout.addWidget(checkbox)
-            
-            feedback_layout.addWidget(options_frame)
-            
-            # Add a separator
-            separator = QFrame()
-            separator.setFrameShape(QFrame.HLine)
-            separator.setFrameShadow(QFrame.Sunken)
-            feedback_layout.addWidget(separator)
+        self.option_model = self._add_option_list(feedback_layout, self.predefined_options)
 
         # Free-form text feedback
-        self.feedback_text = FeedbackTextEdit()
-        font_metrics = self.feedback_text.fontMetrics()
-        row_height = font_metrics.height()
-        # Calculate height for 5 lines + some padding for margins
-        padding = self.feedback_text.contentsMargins().top() + self.feedback_text.contentsMargins().bottom() + 5 # 5 is extra vertical padding
-        self.feedback_text.setMinimumHeight(5 * row_height + padding)
-
+        self.feedback_text = self._create_text_edit()
         self.feedback_text.setPlaceholderText("Enter your feedback here (Ctrl+Enter to submit)")
         submit_button = QPushButton("&Send Feedback")
         submit_button.clicked.connect(self._submit_feedback)
@@ -148,33 +226,107 @@ class FeedbackUI(QMainWindow):
         # Add widgets
         layout.addWidget(self.feedback_group)
 
-    def _submit_feedback(self):
-        feedback_text = self.feedback_text.toPlainText().strip()
-        selected_options = []
-        
-        # Get selected predefined options if any
-        if self.option_checkboxes:
-            for i, checkbox in enumerate(self.option_checkboxes):
-                if checkbox.isChecked():
-                    selected_options.append(self.predefined_options[i])
-        
+    def _create_batch_ui(self, layout: QVBoxLayout):
+        """One group per question in a scroll area, with a single submit button."""
+        questions_widget = QWidget()
+        questions_layout = QVBoxLayout(questions_widget)
+        for i, question in enumerate(self.questions):
+            group = QGroupBox(f"Question {i + 1} of {len(self.questions)}")
+            group_layout = QVBoxLayout(group)
+            label = QLabel(question.get("prompt", ""))
+            label.setWordWrap(True)
+            group_layout.addWidget(label)
+            self._add_option_list(group_layout, question.get("predefined_options") or [])
+            text_edit = self._create_text_edit()
+            text_edit.setPlaceholderText("Your answer to this question (Ctrl+Enter to submit all)")
+            group_layout.addWidget(text_edit)
+            questions_layout.addWidget(group)
+        questions_layout.addStretch()
+
+        scroll_area = QScrollArea()
+        scroll_area.setWidgetResizable(True)
+        scroll_area.setWidget(questions_widget)
+        submit_button = QPushButton(f"&Send {len(self.questions)} Answers")
+        submit_button.clicked.connect(self._submit_feedback)
+        layout.addWidget(scroll_area)
+        layout.addWidget(submit_button)
+
+    def _add_option_list(self, layout: QVBoxLayout, options: List[str]) -> Optional[OptionListModel]:
+        if not options:
+            self.option_models.append(None)
+            return None
+        options_frame = QFrame()
+        options_layout = QVBoxLayout(options_frame)
+        options_layout.setContentsMargins(0, 10, 0, 10)
+
+        option_model = OptionListModel(options, self)
+        if len(options) >= OPTION_FILTER_MIN:
+            option_filter = QLineEdit()
+            option_filter.setPlaceholderText(f"Filter {len(options)} options")
+            option_filter.setClearButtonEnabled(True)
+            option_filter.textChanged.connect(option_model.set_filter)
+            options_layout.addWidget(option_filter)
+
+        option_list = OptionListView()
+        # Uniform rows let the view lay out any number of options without measuring each one
+        option_list.setUniformItemSizes(True)
+        option_list.setModel(option_model)
+        option_list.clicked.connect(option_model.toggle)
+        visible_rows = min(len(options), OPTION_VISIBLE_ROWS)
+        row_height = option_list.sizeHintForRow(0)
+        option_list.setFixedHeight(visible_rows * row_height + 2 * option_list.frameWidth())
+        options_layout.addWidget(option_list)
+
+        layout.addWidget(options_frame)
+
+        # Add a separator
+        separator = QFrame()
+        separator.setFrameShape(QFrame.HLine)
+        separator.setFrameShadow(QFrame.Sunken)
+        layout.addWidget(separator)
+        self.option_models.append(option_model)
+        return option_model
+
+    def _create_text_edit(self) -> FeedbackTextEdit:
+        text_edit = FeedbackTextEdit()
+        font_metrics = text_edit.fontMetrics()
+        row_height = font_metrics.height()
+        # Calculate height for 5 lines + some padding for margins
+        padding = text_edit.contentsMargins().top() + text_edit.contentsMargins().bottom() + 5 # 5 is extra vertical padding
+        text_edit.setMinimumHeight(5 * row_height + padding)
+        self.feedback_texts.append(text_edit)
+        return text_edit
+
+    @staticmethod
+    def _combine(option_model: Optional[OptionListModel], text_edit: FeedbackTextEdit) -> str:
+        feedback_text = text_edit.toPlainText().strip()
+        selected_options = option_model.selected_options() if option_model else []
+
         # Combine selected options and feedback text
         final_feedback_parts = []
-        
+
         # Add selected options
         if selected_options:
             final_feedback_parts.append("; ".join(selected_options))
-        
+
         # Add user's text feedback
         if feedback_text:
             final_feedback_parts.append(feedback_text)
-            
+
         # Join with a newline if both parts exist
-        final_feedback = "\n\n".join(final_feedback_parts)
-            
-        self.feedback_result = FeedbackResult(
-            interactive_feedback=final_feedback,
-        )
+        return "\n\n".join(final_feedback_parts)
+
+    def _submit_feedback(self):
+        answers = [self._combine(model, text) for model, text in zip(self.option_models, self.feedback_texts)]
+        if self.questions:
+            self.feedback_result = {"answers": [
+                {"message": question.get("prompt", ""), "interactive_feedback": answer}
+                for question, answer in zip(self.questions, answers)
+            ]}
+        else:
+            self.feedback_result = FeedbackResult(
+                interactive_feedback=answers[0],
+            )
         self.close()
 
     def closeEvent(self, event):
@@ -186,6 +338,10 @@ class FeedbackUI(QMainWindow):
 
         super().closeEvent(event)
 
+        if not self._finished:
+            self._finished = True
+            self.feedback_finished.emit(dict(self.feedback_result or FeedbackResult(interactive_feedback="")))
+
     def run(self) -> FeedbackResult:
         self.show()
         QApplication.instance().exec()
@@ -195,13 +351,131 @@ class FeedbackUI(QMainWindow):
 
         return self.feedback_result
 
-def feedback_ui(prompt: str, predefined_options: Optional[List[str]] = None, output_file: Optional[str] = None) -> Optional[FeedbackResult]:
+class FeedbackDaemon(QObject):
+    """Resident GUI process serving feedback requests over a local socket.
+
+    Keeps one QApplication (palette and style already applied) and one
+    FeedbackUI window alive between questions, so a question only costs
+    loading new content into the existing window. Each client connection
+    sends one JSON line {"prompt": ..., "predefined_options": [...]} and
+    receives one JSON line with the FeedbackResult. Requests are shown one
+    at a time in arrival order.
+    """
+
+    def __init__(self, socket_path: str, idle_timeout: int = DAEMON_IDLE_TIMEOUT):
+        super().__init__()
+        self.socket_path = socket_path
+        self.app = QApplication.instance() or QApplication()
+        self.app.setQuitOnLastWindowClosed(False)
+        self.app.setPalette(get_dark_mode_palette(self.app))
+        self.app.setStyle("Fusion")
+
+        self.window = FeedbackUI("")
+        self.window.feedback_finished.connect(self._on_feedback_finished)
+
+        self.pending: deque = deque()
+        self.current: Optional[QLocalSocket] = None
+        self.buffers: dict = {}
+
+        self.idle_timer = QTimer(self)
+        self.idle_timer.setSingleShot(True)
+        self.idle_timer.setInterval(idle_timeout * 1000)
+        self.idle_timer.timeout.connect(self.app.quit)
+
+        self.server = QLocalServer(self)
+        self.server.newConnection.connect(self._on_new_connection)
+
+    def listen(self) -> bool:
+        # Another daemon already owns the socket: let it serve the requests
+        probe = QLocalSocket()
+        probe.connectToServer(self.socket_path)
+        if probe.waitForConnected(200):
+            probe.disconnectFromServer()
+            return False
+        # Otherwise the socket file is stale (e.g. a crashed daemon)
+        QLocalServer.removeServer(self.socket_path)
+        if not self.server.listen(self.socket_path):
+            print(f"Failed to listen on {self.socket_path}: {self.server.errorString()}", file=sys.stderr)
+            return False
+        self.idle_timer.start()
+        return True
+
+    def run(self) -> int:
+        if not self.listen():
+            return 1
+        try:
+            return self.app.exec()
+        finally:
+            self.server.close()
+
+    def _on_new_connection(self):
+        while self.server.hasPendingConnections():
+            conn = self.server.nextPendingConnection()
+            self.buffers[conn] = b""
+            conn.readyRead.connect(lambda conn=conn: self._on_ready_read(conn))
+            conn.disconnected.connect(lambda conn=conn: self._on_disconnected(conn))
+
+    def _on_ready_read(self, conn: QLocalSocket):
+        self.buffers[conn] = self.buffers.get(conn, b"") + bytes(conn.readAll())
+        if b"\n" not in self.buffers[conn]:
+            return
+        line = self.buffers.pop(conn).split(b"\n", 1)[0]
+        try:
+            request = json.loads(line.decode("utf-8"))
+        except ValueError:
+            conn.disconnectFromServer()
+            return
+        self.pending.append((conn, request))
+        self.idle_timer.stop()
+        self._show_next()
+
+    def _on_disconnected(self, conn: QLocalSocket):
+        self.buffers.pop(conn, None)
+        # The requester gave up (e.g. the MCP call was cancelled)
+        self.pending = deque((c, r) for c, r in self.pending if c is not conn)
+        if conn is self.current:
+            self.current = None
+            self.window.hide()
+            self._show_next()
+        conn.deleteLater()
+
+    def _show_next(self):
+        if self.current is not None:
+            return
+        if not self.pending:
+            self.idle_timer.start()
+            return
+        self.current, request = self.pending.popleft()
+        self.window.load_request(request.get("prompt", ""), request.get("predefined_options") or None,
+                                 request.get("questions") or None)
+        self.window.show()
+        self.window.raise_()
+        self.window.activateWindow()
+
+    def _on_feedback_finished(self, result: dict):
+        conn, self.current = self.current, None
+        if conn is not None and conn.state() == QLocalSocket.ConnectedState:
+            conn.write(json.dumps(result).encode("utf-8") + b"\n")
+            conn.flush()
+            conn.disconnectFromServer()
+        # Emitted from closeEvent: showing the next question right away would be
+        # undone when the close completes and hides the window
+        QTimer.singleShot(0, self._show_next)
+
+def feedback_ui(prompt: str, predefined_options: Optional[List[str]] = None, output_file: Optional[str] = None,
+                channel: Optional[FrameWriter] = None, questions: Optional[List[dict]] = None) -> Optional[FeedbackResult]:
     app = QApplication.instance() or QApplication()
     app.setPalette(get_dark_mode_palette(app))
     app.setStyle("Fusion")
-    ui = FeedbackUI(prompt, predefined_options)
+    ui = FeedbackUI(prompt, predefined_options, questions)
+    if channel:
+        channel.progress("waiting")
     result = ui.run()
 
+    if channel:
+        channel.result(result)
+        return None
+
     if output_file and result:
         # Ensure the directory exists
         os.makedirs(os.path.dirname(output_file) if os.path.dirname(output_file) else ".", exist_ok=True)
@@ -214,14 +488,41 @@ def feedback_ui(prompt: str, predefined_options: Optional[List[str]] = None, out
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run the feedback UI")
-    parser.add_argument("--prompt", default="I implemented the changes you requested.", help="The prompt to show to the user")
+    parser.add_argument("--prompt", help="The prompt to show to the user (with --ipc it is read from stdin when omitted)")
     parser.add_argument("--predefined-options", default="", help="Pipe-separated list of predefined options (|||)")
+    parser.add_argument("--predefined-options-json", help="Predefined options as a JSON list (options may contain any text)")
     parser.add_argument("--output-file", help="Path to save the feedback result as JSON")
+    parser.add_argument("--ipc", action="store_true", help="Exchange the question and result as frames on stdin/stdout (used by server.py)")
+    parser.add_argument("--daemon", action="store_true", help="Stay resident and serve requests over --socket")
+    parser.add_argument("--socket", help="Local socket path for --daemon mode")
+    parser.add_argument("--idle-timeout", type=int, default=DAEMON_IDLE_TIMEOUT, help="Seconds without requests before the daemon exits")
     args = parser.parse_args()
 
-    predefined_options = [opt for opt in args.predefined_options.split("|||") if opt] if args.predefined_options else None
-    
-    result = feedback_ui(args.prompt, predefined_options, args.output_file)
+    if args.daemon:
+        if not args.socket:
+            parser.error("--daemon requires --socket")
+        sys.exit(FeedbackDaemon(args.socket, args.idle_timeout).run())
+
+    # With --ipc stdout carries only frames; everything else printed goes to stderr
+    channel = open_stdout_channel() if args.ipc else None
+
+    try:
+        if channel and args.prompt is None:
+            # The question arrives on stdin, free of the command line length limit
+            prompt, predefined_options, questions = read_request(sys.stdin.buffer)
+        else:
+            prompt = args.prompt if args.prompt is not None else "I implemented the changes you requested."
+            if args.predefined_options_json is not None:
+                predefined_options = parse_options(json.loads(args.predefined_options_json))
+            else:
+                predefined_options = [opt for opt in args.predefined_options.split("|||") if opt] if args.predefined_options else None
+            questions = None
+        result = feedback_ui(prompt, predefined_options, args.output_file, channel, questions)
+    except Exception as e:
+        if not channel:
+            raise
+        channel.error(str(e))
+        sys.exit(1)
     if result:
         print(f"\nFeedback received:\n{result['interactive_feedback']}")
     sys.exit(0)
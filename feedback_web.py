@@ -9,501 +9,1249 @@ import threading
 import time
 import webbrowser
 import tempfile
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import uuid
+import queue
+import select
+import socket
+import gzip
+import hashlib
+import html
+import re
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeoutError
+from html.parser import HTMLParser
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from urllib.parse import parse_qs, urlparse
-from typing import Optional, List, Dict
+from typing import Callable, Optional, List, Dict
 
-class FeedbackHandler(BaseHTTPRequestHandler):
-    def __init__(self, prompt, predefined_options, result_container, *args, **kwargs):
+from feedback_attachments import Attachment, AttachmentStore, PREVIEW_TYPES, content_type_for
+from feedback_form import FormError, FormTooLarge, parse_form
+from feedback_ipc import TAB_OPEN_ENV, open_stdout_channel, parse_options, read_request
+from feedback_metrics import CALL_ENV, current_call, current_client, join_call, metrics, record_span
+
+# 可选依赖：安装后在服务端渲染 Markdown 并高亮代码（pip install markdown pygments）
+try:
+    import markdown as markdown_lib
+except ImportError:
+    markdown_lib = None
+
+try:
+    from pygments.formatters import HtmlFormatter
+except ImportError:
+    HtmlFormatter = None
+
+# 没有设置 INTERACTIVE_FEEDBACK_TIMEOUT（或设置无效）时等待用户反馈的超时时间（秒）
+DEFAULT_FEEDBACK_TIMEOUT = 300
+
+def load_feedback_timeout() -> float:
+    """INTERACTIVE_FEEDBACK_TIMEOUT（秒）；不是正数时给出警告并使用默认值"""
+    value = os.environ.get("INTERACTIVE_FEEDBACK_TIMEOUT")
+    if value is None:
+        return float(DEFAULT_FEEDBACK_TIMEOUT)
+    try:
+        timeout = float(value)
+    except ValueError:
+        timeout = float("nan")
+    if not (0 < timeout < float("inf")):
+        print(f"⚠️  INTERACTIVE_FEEDBACK_TIMEOUT={value!r} 不是有效的秒数，改用 {DEFAULT_FEEDBACK_TIMEOUT} 秒",
+              file=sys.stderr, flush=True)
+        return float(DEFAULT_FEEDBACK_TIMEOUT)
+    return timeout
+
+# 等待用户反馈的超时时间（秒），server.py 启动子进程时按每次调用的超时设置
+FEEDBACK_TIMEOUT = load_feedback_timeout()
+# 问题队列中每个问题显示的提示字符数
+QUEUE_PREVIEW_CHARS = 200
+# SSE 连接的保活间隔（秒）
+SSE_KEEPALIVE_INTERVAL = 15
+# 单个连接的读写超时（秒），也是 keep-alive 空闲连接的最长保留时间
+CONNECTION_TIMEOUT = 30
+# 同时处理的连接上限，超出的连接直接返回 503
+MAX_CONNECTIONS = 64
+# 默认绑定的固定端口：链接地址在多次提问之间保持不变，旧标签页能重连，SSH 端口转发可以提前配好
+DEFAULT_PORT = 8765
+# 固定端口被占用时依次尝试后面的几个端口，仍不行才改用随机端口
+PORT_FALLBACK_ATTEMPTS = 10
+# 子进程模式下，上一个问题结束时页面还开着：新服务器在打开新标签页前等它重连的最长时间（秒），
+# 略长于页面的 1 秒重连间隔
+TAB_RECONNECT_WAIT = 1.5
+# 等旧标签页重连时，配置的端口被占用（多半是上一个子进程还没退出）要先重试的时间（秒），
+# 旧标签页只会重连到这个端口
+PORT_RELEASE_WAIT = 1.0
+# 提交内容（请求体）的大小上限（字节），超出返回 413
+MAX_BODY_SIZE = int(os.environ.get("INTERACTIVE_FEEDBACK_MAX_BODY_SIZE", 64 * 1024 * 1024))
+
+# 页面外壳、样式和脚本所在目录
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+# 页面外壳引用的静态资源
+STATIC_FILES = [
+    ('app.css', 'text/css; charset=utf-8'),
+    ('markdown.js', 'application/javascript; charset=utf-8'),
+    ('app.js', 'application/javascript; charset=utf-8'),
+]
+# 超过该大小的动态响应才进行 gzip 压缩
+GZIP_MIN_SIZE = 1024
+# 服务端 Markdown 渲染结果的缓存条目数
+MARKDOWN_CACHE_SIZE = 128
+# 页面关闭或断线后等待它回来（如刷新）的时间（秒），之后它正在看的问题按“已关闭”结束
+DISMISS_GRACE = 1.5
+# 刷新中的页面已重新请求问题页面、但脚本还没登记时，最多再等它的时间（秒）
+RELOAD_WAIT = 10
+# 用户没有作答就关闭了反馈页面时的结果，与超时的空反馈区分开
+DISMISSED_RESULT = {"interactive_feedback": "", "status": "dismissed"}
+# 请求的 Host 只能是这些本机名字，防止 DNS 重绑定：恶意网页把自己的域名解析到 127.0.0.1 后
+# 就能以同源身份读取问题、提交回答
+LOCAL_HOSTNAMES = ('localhost', '127.0.0.1', '[::1]')
+# 页面标识：页面加载时随机生成，用于跟踪哪个页面正在看哪个问题
+_CLIENT_ID = re.compile(r"[0-9A-Za-z-]{1,64}")
+
+# 超过该长度（字符）的提示不放进问题 JSON，由页面分块流式获取并增量渲染
+PROMPT_INLINE_LIMIT = 64 * 1024
+# 流式发送提示时每块的大小（字节）
+PROMPT_CHUNK_SIZE = 64 * 1024
+
+class StaticAsset:
+    """启动后只构建一次的静态资源：预先计算好 ETag 和 gzip 压缩后的内容"""
+
+    def __init__(self, body: bytes, content_type: str, cache_control: str):
+        self.body = body
+        self.gzip_body = gzip.compress(body, compresslevel=9, mtime=0)
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        self.content_type = content_type
+        self.cache_control = cache_control
+
+    @property
+    def version(self) -> str:
+        return self.etag.strip('"')
+
+def load_static_assets() -> Dict[str, StaticAsset]:
+    """读取 static 目录，返回 URL 路径到资源的映射"""
+    def read(name):
+        with open(os.path.join(STATIC_DIR, name), 'rb') as f:
+            return f.read()
+
+    # 样式和脚本（包括内置的 Markdown 渲染器）的 URL 带内容版本号，可以长期缓存；
+    # 外壳每次用 ETag 协商
+    immutable = 'public, max-age=31536000, immutable'
+    assets = {}
+    for name, content_type in STATIC_FILES:
+        assets['/static/' + name] = StaticAsset(read(name), content_type, immutable)
+    # 代码高亮样式由 Pygments 生成，未安装时为空
+    highlight_css = HtmlFormatter().get_style_defs('.codehilite') if HtmlFormatter else ''
+    assets['/static/highlight.css'] = StaticAsset(highlight_css.encode('utf-8'), 'text/css; charset=utf-8', immutable)
+
+    shell = read('index.html').decode('utf-8')
+    for path, asset in assets.items():
+        name = path[len('/static/'):]
+        shell = shell.replace('{{' + name + '}}', f"{path}?v={asset.version}")
+    assets['/'] = StaticAsset(shell.encode('utf-8'), 'text/html; charset=utf-8', 'no-cache')
+    return assets
+
+_static_assets: Optional[Dict[str, StaticAsset]] = None
+_static_assets_lock = threading.Lock()
+
+def get_static_assets() -> Dict[str, StaticAsset]:
+    global _static_assets
+    with _static_assets_lock:
+        if _static_assets is None:
+            _static_assets = load_static_assets()
+        return _static_assets
+
+class _HtmlSanitizer(HTMLParser):
+    """只保留 Markdown 会生成的标签和属性，其余标签丢弃、文本转义"""
+
+    ALLOWED_TAGS = {
+        'a', 'b', 'blockquote', 'br', 'code', 'del', 'div', 'em', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+        'hr', 'i', 'li', 'ol', 'p', 'pre', 'span', 'strong', 'table', 'tbody', 'td', 'th', 'thead',
+        'tr', 'ul',
+    }
+    ALLOWED_ATTRS = {
+        'a': {'href', 'title'},
+        'code': {'class'},
+        'div': {'class'},
+        'ol': {'start'},
+        'pre': {'class'},
+        'span': {'class'},
+        'td': {'style', 'align'},
+        'th': {'style', 'align'},
+    }
+    VOID_TAGS = {'br', 'hr'}
+    # 这些标签连同内容一起丢弃
+    DROP_CONTENT_TAGS = {'script', 'style', 'iframe', 'object', 'template'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self.open_tags: List[str] = []
+        self.dropping = 0
+
+    @staticmethod
+    def _safe_attr(name: str, value: str) -> bool:
+        if name == 'href':
+            scheme = value.strip().split(':', 1)[0].lower() if ':' in value else ''
+            return scheme in ('', 'http', 'https', 'mailto') and not value.strip().startswith('//')
+        if name == 'style':
+            return re.fullmatch(r'text-align:\s*(left|right|center);?', value.strip()) is not None
+        return True
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.DROP_CONTENT_TAGS:
+            self.dropping += 1
+            return
+        if self.dropping or tag not in self.ALLOWED_TAGS:
+            return
+        allowed = self.ALLOWED_ATTRS.get(tag, set())
+        rendered = ''.join(
+            f' {name}="{html.escape(value or "", quote=True)}"'
+            for name, value in attrs
+            if name in allowed and self._safe_attr(name, value or '')
+        )
+        if tag == 'a':
+            # 提示里的链接在新标签页打开，当前页面（和它显示的问题）保持不动
+            rendered += ' target="_blank" rel="noopener noreferrer"'
+        self.parts.append(f'<{tag}{rendered}>')
+        if tag not in self.VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in self.VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self.DROP_CONTENT_TAGS:
+            self.dropping = max(0, self.dropping - 1)
+            return
+        if self.dropping or tag not in self.open_tags:
+            return
+        # 补齐中间未闭合的标签，保证输出结构完整
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.parts.append(f'</{open_tag}>')
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.parts.append(html.escape(data, quote=False))
+
+    def result(self) -> str:
+        self.close()
+        return ''.join(self.parts) + ''.join(f'</{tag}>' for tag in reversed(self.open_tags))
+
+def sanitize_html(markup: str) -> str:
+    """清理渲染结果，防止提示中的原始 HTML 注入页面"""
+    sanitizer = _HtmlSanitizer()
+    sanitizer.feed(markup)
+    return sanitizer.result()
+
+class MarkdownCache:
+    """以提示内容哈希为键的 LRU 缓存，重复或刷新的问题无需再次解析"""
+
+    def __init__(self, max_size: int = MARKDOWN_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(prompt: str) -> str:
+        return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            rendered = self._entries.get(key)
+            if rendered is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return rendered
+
+    def put(self, key: str, rendered: str):
+        with self._lock:
+            self._entries[key] = rendered
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+_markdown_cache = MarkdownCache()
+
+def server_markdown_enabled() -> bool:
+    """安装了 markdown 库且未通过 INTERACTIVE_FEEDBACK_SERVER_MARKDOWN=0 关闭时启用"""
+    if markdown_lib is None:
+        return False
+    return os.environ.get('INTERACTIVE_FEEDBACK_SERVER_MARKDOWN', '1').lower() not in ('0', 'false', 'off')
+
+def render_markdown(prompt: str) -> Optional[str]:
+    """在服务端把提示渲染为清理过的 HTML；不可用时返回 None，由浏览器端渲染"""
+    if not server_markdown_enabled():
+        return None
+    key = MarkdownCache.key(prompt)
+    rendered = _markdown_cache.get(key)
+    if rendered is None:
+        rendered = sanitize_html(markdown_lib.markdown(
+            prompt,
+            extensions=['fenced_code', 'tables', 'sane_lists', 'codehilite'],
+            extension_configs={'codehilite': {'guess_lang': False}},
+        ))
+        _markdown_cache.put(key, rendered)
+    return rendered
+
+class FeedbackSession:
+    """一个待回答的问题：提示、预定义选项以及最终结果
+
+    批量提问时 questions 为 [{"prompt", "predefined_options"}, ...]，
+    所有问题在同一个页面里回答，结果为 {"answers": [...]}。
+    """
+
+    def __init__(self, prompt: str, predefined_options: Optional[List[str]] = None,
+                 questions: Optional[List[Dict]] = None):
+        self.id = uuid.uuid4().hex
         self.prompt = prompt
         self.predefined_options = predefined_options or []
-        self.result_container = result_container
+        self.questions = questions or None
+        self.created_at = time.time()
+        # 计时用的单调时钟：页面首次获取问题、提交的耗时都从这里算起
+        self.started = time.perf_counter()
+        self.first_viewed: Optional[float] = None
+        # 最近一次请求本问题页面外壳的时间（单调时钟），用于识别正在刷新的页面
+        self.shell_loaded: Optional[float] = None
+        # 所属的工具调用，写入计时记录以便与 server.py 的各阶段关联
+        self.call_id = current_call()
+        # 提问的 MCP 客户端（共享 HTTP 传输时多个 IDE 共用一个服务器），页面据此区分问题来源
+        self.client = current_client()
+        # 提交时由请求处理线程设置结果，等待方立即被唤醒
+        self.future: Future = Future()
+        self._prompt_bytes: Optional[bytes] = None
+        # 本问题已上传的附件（附件 ID -> 附件），提交时按 ID 引用
+        self.attachments: Dict[str, Attachment] = {}
+        # 正在显示本问题的页面标识，由 SessionRegistry 维护
+        self.viewers = set()
+
+    @property
+    def prompt_bytes(self) -> bytes:
+        """UTF-8 编码后的提示，只编码一次，供流式发送复用"""
+        if self._prompt_bytes is None:
+            self._prompt_bytes = self.prompt.encode('utf-8')
+        return self._prompt_bytes
+
+    @property
+    def completed(self) -> bool:
+        return self.future.done()
+
+    @property
+    def end_reason(self) -> str:
+        """answered、dismissed（页面关闭），未完成就被关闭时为 closed（超时或调用取消）"""
+        if not self.completed or self.future.cancelled():
+            return 'closed'
+        return 'dismissed' if self.future.result().get('status') == 'dismissed' else 'answered'
+
+    def complete(self, feedback: str):
+        self.resolve({"interactive_feedback": feedback})
+
+    def resolve(self, result: Dict) -> bool:
+        """设置结果；重复提交时保留第一次的结果并返回 False"""
+        try:
+            self.future.set_result(result)
+        except InvalidStateError:
+            return False
+        return True
+
+    def dismiss(self) -> bool:
+        """显示本问题的页面都已关闭：以 dismissed 结果结束，不再等到超时"""
+        return self.resolve(dict(DISMISSED_RESULT))
+
+    def reload_wait(self) -> float:
+        """页面外壳刚被重新请求（页面正在刷新）时，还应等新页面登记的秒数"""
+        if self.shell_loaded is None:
+            return 0.0
+        return max(self.shell_loaded + RELOAD_WAIT - time.monotonic(), 0.0)
+
+    def record_view(self):
+        """页面第一次获取问题时记录 first_view 阶段"""
+        if self.first_viewed is None:
+            self.first_viewed = time.perf_counter()
+            record_span('first_view', self.first_viewed - self.started, call=self.call_id, session=self.id)
+
+    def record_submit(self):
+        """记录从提问到提交的耗时，以及用户作答耗时（从页面显示问题算起）"""
+        now = time.perf_counter()
+        record_span('submit', now - self.started, call=self.call_id, session=self.id)
+        metrics.observe('interactive_feedback_response_seconds', now - (self.first_viewed or self.started))
+
+class EventBroadcaster:
+    """把会话变化推送给所有已连接的页面（Server-Sent Events）"""
+
+    def __init__(self):
+        self._clients: List[queue.Queue] = []
+        self._lock = threading.Lock()
+        self._connected = threading.Condition()
+
+    def subscribe(self) -> queue.Queue:
+        client = queue.Queue()
+        with self._lock:
+            self._clients.append(client)
+        with self._connected:
+            self._connected.notify_all()
+        return client
+
+    def unsubscribe(self, client: queue.Queue):
+        with self._lock:
+            if client in self._clients:
+                self._clients.remove(client)
+
+    def client_count(self) -> int:
+        with self._lock:
+            return len(self._clients)
+
+    def wait_for_client(self, timeout: float) -> bool:
+        """等待至少一个页面连上，返回是否有页面连接"""
+        deadline = time.monotonic() + timeout
+        while not self.client_count():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            with self._connected:
+                self._connected.wait(remaining)
+        return True
+
+    def publish(self, event: str, data: Dict):
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            client.put((event, data))
+
+    def close(self):
+        """通知所有 SSE 连接结束"""
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            client.put(None)
+
+class FeedbackHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keep-alive：页面、脚本和接口请求复用同一个连接
+    protocol_version = 'HTTP/1.1'
+    # 空闲或卡住的连接超时后关闭，不会一直占用处理线程
+    timeout = CONNECTION_TIMEOUT
+
+    def __init__(self, sessions, events, *args, **kwargs):
+        self.sessions = sessions
+        self.events = events
+        self.session = None
         super().__init__(*args, **kwargs)
 
-    def do_GET(self):
-        if self.path == '/':
-            self.send_response(200)
-            self.send_header('Content-type', 'text/html; charset=utf-8')
-            self.end_headers()
-            
-            html = self.generate_html()
-            self.wfile.write(html.encode('utf-8'))
+    @property
+    def predefined_options(self):
+        return self.session.predefined_options
+
+    def _client_id(self) -> Optional[str]:
+        """请求所属页面的标识（?client=...），没有或格式不对时为 None"""
+        client_id = parse_qs(urlparse(self.path).query).get('client', [''])[0]
+        return client_id if _CLIENT_ID.fullmatch(client_id) else None
+
+    def _client_left(self, client_id: str):
+        """页面关闭或断线：宽限期过后仍没有回来，就结束它正在看的问题"""
+        timer = threading.Timer(DISMISS_GRACE, dismiss_abandoned, [self.sessions, self.events, client_id])
+        timer.daemon = True
+        timer.start()
+
+    def _resolve_session(self) -> Optional[str]:
+        """根据路径找到会话，返回去掉会话前缀后的剩余路径"""
+        path = urlparse(self.path).path
+        if path.startswith('/s/'):
+            session_id, _, rest = path[len('/s/'):].partition('/')
+            self.session = self.sessions.get(session_id)
+            return '/' + rest if self.session else None
+        return None
+
+    def _local_origin(self, value: str) -> bool:
+        """value 为 host[:port]：主机名是本机名字、端口是服务器绑定的端口"""
+        host, _, port = value.strip().lower().rpartition(':')
+        if not host or not port.isdigit():
+            host, port = value.strip().lower(), '80'
+        return host in LOCAL_HOSTNAMES and int(port) == self.server.server_address[1]
+
+    def _request_allowed(self, changes_state: bool) -> bool:
+        """拒绝 Host 不是本机的请求，以及来自其他网页（Origin 不是本页面）的修改请求"""
+        if not self._local_origin(self.headers.get('Host', '')):
+            allowed = False
+        elif changes_state and 'Origin' in self.headers:
+            origin = self.headers['Origin']
+            allowed = origin.startswith('http://') and self._local_origin(origin[len('http://'):])
         else:
-            self.send_response(404)
-            self.end_headers()
+            allowed = True
+        if not allowed:
+            # 请求体（如果有）没有读取，连接不能继续复用
+            self.close_connection = True
+            self._send_empty(403)
+        return allowed
 
-    def do_POST(self):
-        if self.path == '/submit':
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            
-            # 解析表单数据
-            data = parse_qs(post_data.decode('utf-8'))
-            
-            # 处理选择的选项
-            selected_options = []
-            for i, option in enumerate(self.predefined_options):
-                if f'option_{i}' in data:
-                    selected_options.append(option)
-            
-            # 获取自由文本
-            user_text = data.get('feedback_text', [''])[0].strip()
-            
-            # 组合结果
-            final_feedback_parts = []
-            if selected_options:
-                final_feedback_parts.append("; ".join(selected_options))
-            if user_text:
-                final_feedback_parts.append(user_text)
-            
-            final_feedback = "\n\n".join(final_feedback_parts)
-            
-            # 保存结果
-            self.result_container['feedback'] = final_feedback
-            self.result_container['completed'] = True
-            
-            # 发送成功页面
-            self.send_response(200)
-            self.send_header('Content-type', 'text/html; charset=utf-8')
+    def _accepts_gzip(self) -> bool:
+        return 'gzip' in self.headers.get('Accept-Encoding', '')
+
+    def _send_body(self, body: bytes, content_type: str, status: int = 200):
+        self.send_response(status)
+        self.send_header('Content-type', content_type)
+        self.send_header('Cache-Control', 'no-store')
+        if len(body) >= GZIP_MIN_SIZE:
+            self.send_header('Vary', 'Accept-Encoding')
+            if self._accepts_gzip():
+                body = gzip.compress(body, compresslevel=6)
+                self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_empty(self, status: int):
+        # keep-alive 连接上必须给出长度，浏览器才知道响应已结束
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def _send_json(self, data, status: int = 200):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self._send_body(body, 'application/json; charset=utf-8', status)
+
+    def _send_asset(self, asset: StaticAsset):
+        if self.headers.get('If-None-Match') == asset.etag:
+            self.send_response(304)
+            self.send_header('Content-Length', '0')
+            self.send_header('ETag', asset.etag)
+            self.send_header('Cache-Control', asset.cache_control)
             self.end_headers()
-            
-            success_html = """
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <meta charset="UTF-8">
-                <title>反馈已提交</title>
-                <style>
-                    body { 
-                        font-family: Arial, sans-serif; 
-                        max-width: 500px; 
-                        margin: 80px auto; 
-                        padding: 20px; 
-                        background-color: #f5f5f5;
-                    }
-                    .container {
-                        background: white;
-                        padding: 40px;
-                        border-radius: 12px;
-                        border: 1px solid #ddd;
-                        text-align: center;
-                    }
-                    .success-icon {
-                        font-size: 64px;
-                        margin-bottom: 20px;
-                    }
-                    .success-title {
-                        color: #155724;
-                        font-size: 24px;
-                        font-weight: 600;
-                        margin-bottom: 15px;
-                    }
-                    .success-message {
-                        color: #666;
-                        font-size: 16px;
-                        line-height: 1.5;
-                        margin-bottom: 30px;
-                    }
-                    .close-instruction {
-                        background: #e3f2fd;
-                        border: 1px solid #bbdefb;
-                        border-radius: 8px;
-                        padding: 20px;
-                        margin: 20px 0;
-                    }
-                    .close-instruction h4 {
-                        margin: 0 0 10px 0;
-                        color: #1976d2;
-                        font-size: 16px;
-                    }
-                    .close-instruction p {
-                        margin: 5px 0;
-                        color: #555;
-                        font-size: 14px;
-                    }
-                    .keyboard-shortcut {
-                        background: #e9ecef;
-                        padding: 3px 8px;
-                        border-radius: 4px;
-                        font-family: monospace;
-                        font-weight: bold;
-                    }
-                    .footer-note {
-                        color: #999;
-                        font-size: 12px;
-                        margin-top: 30px;
-                        font-style: italic;
-                    }
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="success-icon">✅</div>
-                    <div class="success-title">反馈已成功提交！</div>
-                    <div class="success-message">
-                        现在可以关闭此页面，返回到 Cursor 继续工作。
-                    </div>
-                    
-                    <div class="close-instruction">
-                        <h4>💡 如何关闭此页面</h4>
-                        <p>• 键盘快捷键：<span class="keyboard-shortcut">Ctrl + W</span> (Windows/Linux) 或 <span class="keyboard-shortcut">Cmd + W</span> (Mac)</p>
-                        <p>• 点击浏览器标签页上的 ✕ 按钮</p>
-                        <p>• 或直接切换回 Cursor 继续工作</p>
-                    </div>
-                    
-                    <div class="footer-note">
-                        此页面可以安全关闭，不会影响您的工作流程
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
-            self.wfile.write(success_html.encode('utf-8'))
+            return
+        body = asset.body
+        self.send_response(200)
+        self.send_header('Content-type', asset.content_type)
+        self.send_header('ETag', asset.etag)
+        self.send_header('Cache-Control', asset.cache_control)
+        self.send_header('Vary', 'Accept-Encoding')
+        if self._accepts_gzip():
+            body = asset.gzip_body
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if not self._request_allowed(changes_state=False):
+            return
+        path = urlparse(self.path).path
+        assets = get_static_assets()
+        if path == '/' or (path.startswith('/s/') and path.endswith('/')):
+            # 问题队列和问题页面共用同一个静态外壳，内容由脚本按需获取
+            session = self.sessions.get(path[len('/s/'):-1]) if path != '/' else None
+            if session is not None:
+                # 页面正在（重新）加载这个问题：新页面登记之前不把问题当作没人看
+                session.shell_loaded = time.monotonic()
+            self._send_asset(assets['/'])
+        elif path in assets:
+            self._send_asset(assets[path])
+        elif path == '/api/sessions':
+            client_id = self._client_id()
+            if client_id:
+                # 页面回到了问题队列，不再显示某个问题
+                self.sessions.view(client_id, None)
+            self._send_json(self.sessions.pending_summaries())
+        elif path == '/metrics':
+            # Prometheus 文本格式：计数器、各阶段耗时和用户作答耗时的直方图
+            pending = [('interactive_feedback_sessions_pending', {}, self.sessions.pending_count())]
+            self._send_body(metrics.render(pending).encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8')
+        elif path.startswith('/api/sessions/'):
+            session_id, _, rest = path[len('/api/sessions/'):].partition('/')
+            session = self.sessions.get(session_id)
+            if session is None:
+                self._send_json({'error': 'not found'}, 404)
+            elif rest == 'prompt':
+                self._send_chunked(session.prompt_bytes, 'text/plain; charset=utf-8')
+            elif rest:
+                self._send_empty(404)
+            else:
+                session.record_view()
+                client_id = self._client_id()
+                if client_id:
+                    self.sessions.view(client_id, session)
+                self._send_json(self._question_payload(session))
+        elif path.startswith('/attachments/'):
+            self._send_attachment(path[len('/attachments/'):])
+        elif path == '/events':
+            self._serve_events()
         else:
-            self.send_response(404)
+            self._send_empty(404)
+
+    def _question_payload(self, session: FeedbackSession) -> Dict:
+        payload = {
+            'id': session.id,
+            'options': session.predefined_options,
+            # 页面提交前据此检查大小，避免上传到一半才被拒绝
+            'max_body_size': self.server.max_body_size,
+        }
+        if session.client:
+            payload['client'] = session.client
+        if session.questions:
+            # 批量提问：每个问题的提示都直接放进 JSON，不走流式获取
+            payload['questions'] = [self._batch_question(q) for q in session.questions]
+            return payload
+        if len(session.prompt) > PROMPT_INLINE_LIMIT:
+            # 大提示不重复塞进 JSON，页面从 prompt_url 流式获取
+            payload['prompt_url'] = f'/api/sessions/{session.id}/prompt'
+            payload['prompt_size'] = len(session.prompt_bytes)
+            return payload
+        payload['prompt'] = session.prompt
+        rendered = render_markdown(session.prompt)
+        if rendered is not None:
+            payload['html'] = rendered
+        return payload
+
+    @staticmethod
+    def _batch_question(question: Dict) -> Dict:
+        item = {'prompt': question['prompt'], 'options': question['predefined_options']}
+        rendered = render_markdown(question['prompt'])
+        if rendered is not None:
+            item['html'] = rendered
+        return item
+
+    def _write_chunk(self, data: bytes):
+        if data:
+            self.wfile.write(b'%x\r\n' % len(data))
+            self.wfile.write(data)
+            self.wfile.write(b'\r\n')
+
+    def _send_chunked(self, body: bytes, content_type: str):
+        """以 chunked 编码分块发送，浏览器收到第一块即可开始渲染"""
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Cache-Control', 'no-store')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Vary', 'Accept-Encoding')
+        compressor = None
+        if self._accepts_gzip():
+            # 每块单独 flush，压缩后也能逐块解出
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+            self.send_header('Content-Encoding', 'gzip')
+        self.end_headers()
+
+        view = memoryview(body)
+        for start in range(0, len(view), PROMPT_CHUNK_SIZE):
+            chunk = view[start:start + PROMPT_CHUNK_SIZE]
+            if compressor:
+                chunk = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            self._write_chunk(chunk)
+        if compressor:
+            self._write_chunk(compressor.flush())
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _client_disconnected(self) -> bool:
+        """SSE 连接上客户端不会再发送数据，可读即表示连接已关闭"""
+        readable, _, _ = select.select([self.connection], [], [], 0)
+        return bool(readable) and not self.connection.recv(1, socket.MSG_PEEK)
+
+    def _send_attachment(self, attachment_id: str):
+        path = self.server.attachments.path_for(attachment_id)
+        if path is None:
+            self._send_empty(404)
+            return
+        # 附件按内容寻址，ID 不变内容就不变，可以永久缓存
+        etag = f'"{attachment_id}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('Content-Length', '0')
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        content_type = content_type_for(attachment_id)
+        with open(path, 'rb') as f:
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(os.fstat(f.fileno()).st_size))
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'private, max-age=31536000, immutable')
+            # 上传的内容不可信：禁止类型嗅探和脚本执行，非图片一律作为下载
+            self.send_header('X-Content-Type-Options', 'nosniff')
+            self.send_header('Content-Security-Policy', "default-src 'none'; sandbox")
+            if content_type not in PREVIEW_TYPES:
+                self.send_header('Content-Disposition', 'attachment')
             self.end_headers()
+            # 零拷贝：由内核（sendfile）直接把文件写入 socket，不经过 Python 缓冲区
+            self.connection.sendfile(f)
+
+    def _serve_events(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        # 事件流没有长度，结束后关闭连接
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        client = self.events.subscribe()
+        # 事件流连接同时是页面的存活信号：断开即视为页面可能已关闭
+        client_id = self._client_id()
+        if client_id:
+            self.sessions.connect(client_id)
+        idle = 0.0
+        try:
+            # 断线后浏览器 1 秒内重连
+            self.wfile.write(b'retry: 1000\n\n')
+            while True:
+                try:
+                    item = client.get(timeout=1)
+                except queue.Empty:
+                    if self._client_disconnected():
+                        break
+                    idle += 1
+                    if idle >= SSE_KEEPALIVE_INTERVAL:
+                        self.wfile.write(b': keepalive\n\n')
+                        idle = 0.0
+                    continue
+                if item is None:
+                    break
+                event, data = item
+                message = f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+                self.wfile.write(message.encode('utf-8'))
+        except (BrokenPipeError, ConnectionResetError, OSError):
+            pass
+        finally:
+            self.events.unsubscribe(client)
+            if client_id and self.sessions.disconnect(client_id):
+                self._client_left(client_id)
+
+    def do_POST(self):
+        if not self._request_allowed(changes_state=True):
+            return
+        path = urlparse(self.path).path
+        if path.startswith('/api/clients/') and path.endswith('/gone'):
+            # 页面 pagehide 时发出的 beacon：不必等事件流断开就能知道页面走了
+            self.close_connection = True
+            client_id = path[len('/api/clients/'):-len('/gone')]
+            if _CLIENT_ID.fullmatch(client_id):
+                self.sessions.leave(client_id)
+                self._client_left(client_id)
+            self._send_empty(204)
+            return
+
+        action = self._resolve_session()
+        if action not in ('/submit', '/attachments'):
+            # 请求体没有读取，连接不能继续复用
+            self.close_connection = True
+            self._send_empty(404)
+            return
+
+        # 流式解析表单：大段文本按块读取，超过阈值的字段写入临时文件
+        content_length = self.headers.get('Content-Length')
+        if content_length is None:
+            self.close_connection = True
+            self._send_empty(411)
+            return
+        parse_started = time.perf_counter()
+        try:
+            form = parse_form(self.rfile, self.headers.get('Content-Type'), int(content_length),
+                              self.server.max_body_size)
+        except FormTooLarge:
+            self.close_connection = True
+            self._send_json({'status': 'error', 'error': 'too_large',
+                             'max_size': self.server.max_body_size}, 413)
+            return
+        except (FormError, ValueError):
+            self.close_connection = True
+            self._send_empty(400)
+            return
+
+        if action == '/attachments':
+            with form:
+                self._store_attachments(form)
+            return
+
+        with form:
+            # 附件只能引用本问题上传过的 ID，按提交顺序去重
+            attachment_ids = dict.fromkeys(field.read_text() for field in form.fields.get('attachment', []))
+            attachments = [self.session.attachments[i] for i in attachment_ids if i in self.session.attachments]
 
-    def generate_html(self):
-        options_html = ""
-        if self.predefined_options:
-            options_html = "<h3>可选选项：</h3>"
-            for i, option in enumerate(self.predefined_options):
-                options_html += f"""
-                <label>
-                    <input type="checkbox" name="option_{i}" value="1"> {option}
-                </label>
-                """
-
-        # 安全地转义prompt内容
-        prompt_escaped = json.dumps(self.prompt)
-
-        html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <title>Interactive Feedback</title>
-            <script src="https://cdn.jsdelivr.net/npm/marked/marked.min.js"></script>
-            <style>
-                body {{
-                    font-family: Arial, sans-serif;
-                    font-size: 13px;
-                    max-width: 800px;
-                    margin: 15px auto;
-                    padding: 15px;
-                    background-color: #f5f5f5;
-                }}
-                .container {{
-                    background: white;
-                    padding: 20px;
-                    border: 1px solid #ddd;
-                }}
-                .prompt {{
-                    background: #e3f2fd;
-                    padding: 15px;
-                    margin-bottom: 20px;
-                    border-left: 4px solid #2196f3;
-                    line-height: 1.3;
-                    font-size: 13px;
-                }}
-                
-                /* Markdown 样式 */
-                .prompt h1, .prompt h2, .prompt h3, .prompt h4, .prompt h5, .prompt h6 {{
-                    margin-top: 0;
-                    margin-bottom: 8px;
-                    font-weight: 600;
-                    line-height: 1.2;
-                }}
-                .prompt h1 {{ font-size: 1.6em; border-bottom: 1px solid #eaecef; padding-bottom: 8px; }}
-                .prompt h2 {{ font-size: 1.3em; border-bottom: 1px solid #eaecef; padding-bottom: 6px; }}
-                .prompt h3 {{ font-size: 1.1em; }}
-                .prompt h4 {{ font-size: 1em; }}
-                .prompt h5 {{ font-size: 0.9em; }}
-                .prompt h6 {{ font-size: 0.85em; color: #6a737d; }}
-                
-                .prompt p {{
-                    margin-bottom: 8px;
-                }}
-                
-                .prompt ul, .prompt ol {{
-                    padding-left: 25px;
-                    margin-bottom: 8px;
-                    margin-top: 4px;
-                }}
-                
-                .prompt li {{
-                    margin-bottom: 1px;
-                    line-height: 1.3;
-                }}
-                
-                .prompt strong {{
-                    font-weight: 600;
-                }}
-                
-                .prompt em {{
-                    font-style: italic;
-                }}
-                
-                .prompt code {{
-                    background-color: rgba(27,31,35,0.05);
-                    font-size: 85%;
-                    margin: 0;
-                    padding: 0.2em 0.4em;
-                    font-family: "SFMono-Regular", Consolas, "Liberation Mono", Menlo, monospace;
-                }}
-                
-                .prompt pre {{
-                    background-color: #f6f8fa;
-                    font-size: 12px;
-                    line-height: 1.3;
-                    overflow: auto;
-                    padding: 10px;
-                    margin-bottom: 8px;
-                }}
-                
-                .prompt pre code {{
-                    background-color: transparent;
-                    border: 0;
-                    display: inline;
-                    line-height: inherit;
-                    margin: 0;
-                    max-width: auto;
-                    overflow: visible;
-                    padding: 0;
-                    word-wrap: normal;
-                }}
-                
-                .prompt blockquote {{
-                    border-left: 4px solid #dfe2e5;
-                    color: #6a737d;
-                    padding: 0 16px;
-                    margin: 0 0 16px 0;
-                }}
-                
-                .prompt table {{
-                    border-collapse: collapse;
-                    border-spacing: 0;
-                    width: 100%;
-                    margin-bottom: 16px;
-                }}
-                
-                .prompt table th, .prompt table td {{
-                    border: 1px solid #dfe2e5;
-                    padding: 6px 13px;
-                }}
-                
-                .prompt table th {{
-                    background-color: #f6f8fa;
-                    font-weight: 600;
-                }}
-                
-                textarea {{
-                    width: 100%;
-                    min-height: 100px;
-                    padding: 8px;
-                    border: 1px solid #ddd;
-                    font-size: 14px;
-                    resize: vertical;
-                }}
-                button {{
-                    background: #4caf50;
-                    color: white;
-                    padding: 8px 16px;
-                    border: none;
-                    cursor: pointer;
-                    font-size: 13px;
-                    margin-top: 12px;
-                }}
-                button:hover {{
-                    background: #45a049;
-                }}
-                .cancel-btn {{
-                    background: #f44336;
-                    margin-left: 8px;
-                }}
-                .cancel-btn:hover {{
-                    background: #da190b;
-                }}
-                h1 {{
-                    color: #333;
-                    text-align: center;
-                    margin-bottom: 20px;
-                    font-size: 20px;
-                }}
-                h3 {{
-                    font-size: 14px;
-                    margin-bottom: 8px;
-                }}
-                label {{
-                    cursor: pointer;
-                    font-size: 13px;
-                    display: block;
-                    margin: 6px 0;
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h1>📝 Interactive Feedback</h1>
-                
-                <div class="prompt" id="promptContainer">
-                    <div id="promptContent"></div>
-                </div>
-                
-                <form method="post" action="/submit">
-                    {options_html}
-                    
-                    <h3>您的反馈：</h3>
-                    <textarea name="feedback_text" placeholder="请在此输入您的详细反馈...&#10;&#10;💡 提示：按 Ctrl+Enter 快速提交"></textarea>
-                    
-                    <div>
-                        <button type="submit">✅ 提交反馈</button>
-                        <button type="button" class="cancel-btn" onclick="submitEmpty()">❌ 取消</button>
-                    </div>
-                </form>
-            </div>
-            
-            <script>
-                // 渲染 Markdown 内容
-                function renderMarkdown() {{
-                    const promptText = {prompt_escaped};
-                    const promptContainer = document.getElementById('promptContent');
-                    
-                    // 先显示原始内容作为备用
-                    promptContainer.innerHTML = '<strong>提示：</strong> ' + promptText.replace(/\\n/g, '<br>');
-                    
-                    // 检查marked库是否可用
-                    if (typeof marked !== 'undefined') {{
-                        try {{
-                            // 使用 marked 库解析 Markdown
-                            const htmlContent = marked.parse(promptText);
-                            promptContainer.innerHTML = '<strong>提示：</strong><br>' + htmlContent;
-                            console.log('Markdown渲染成功');
-                        }} catch (error) {{
-                            console.warn('Markdown parsing failed:', error);
-                            // 保持原始文本显示
-                        }}
-                    }} else {{
-                        console.warn('marked库未加载，使用原始文本显示');
-                    }}
-                }}
-                
-                function submitEmpty() {{
-                    if (confirm('确定要取消吗？这将提交空反馈。')) {{
-                        var form = document.querySelector('form');
-                        var textarea = document.querySelector('textarea');
-                        var checkboxes = document.querySelectorAll('input[type="checkbox"]');
-                        
-                        // 清空所有输入
-                        textarea.value = '';
-                        checkboxes.forEach(cb => cb.checked = false);
-                        
-                        form.submit();
-                    }}
-                }}
-                
-                // 页面加载完成后初始化
-                document.addEventListener('DOMContentLoaded', function() {{
-                    renderMarkdown();
-                    
-                    // 添加Ctrl+Enter快捷键提交反馈
-                    const textarea = document.querySelector('textarea');
-                    textarea.addEventListener('keydown', function(e) {{
-                        if (e.ctrlKey && e.key === 'Enter') {{
-                            e.preventDefault();
-                            document.querySelector('form').submit();
-                        }}
-                    }});
-                    
-                    // 暂时移除自动聚焦，避免干扰中文输入法
-                    // textarea.focus();
-                }});
-            </script>
-        </body>
-        </html>
-        """
-        return html
+            if self.session.questions:
+                # 批量提问：字段名带问题序号前缀，如 q0.option_1、q2.feedback_text
+                result = {'answers': [
+                    {'message': question['prompt'],
+                     'interactive_feedback': self._read_answer(form, question['predefined_options'], f'q{j}.')}
+                    for j, question in enumerate(self.session.questions)
+                ]}
+                if attachments:
+                    result['attachments'] = [a.describe() for a in attachments]
+            else:
+                final_feedback = self._read_answer(form, self.predefined_options)
+                if attachments:
+                    # 附件以文件路径交给 AI，而不是把文件内容塞进反馈文本
+                    attachment_lines = "\n".join(f"- {a.describe()}" for a in attachments)
+                    final_feedback = "\n\n".join(filter(None, [final_feedback, "Attachments:\n" + attachment_lines]))
+                result = {'interactive_feedback': final_feedback}
+        record_span('parse', time.perf_counter() - parse_started, call=self.session.call_id,
+                    session=self.session.id, bytes=int(content_length))
+
+        # 页面据此显示成功提示和剩余问题数
+        pending = sum(1 for s in self.sessions.pending() if s is not self.session)
+        # 先写完响应再唤醒等待方：独立进程模式下等待方拿到结果后进程会立即退出
+        self._send_json({'status': 'ok', 'pending': pending})
+        self.wfile.flush()
+
+        # 保存结果；先记录提交耗时再唤醒等待方，计时记录才排在整个调用的 call 之前
+        if not self.session.completed:
+            self.session.record_submit()
+        self.session.resolve(result)
+        self.events.publish('session_completed', {'id': self.session.id, 'reason': 'answered'})
+
+    @staticmethod
+    def _read_answer(form, options: List[str], prefix: str = '') -> str:
+        """一个问题的回答：选中的选项和自由文本"""
+        # 处理选择的选项
+        selected_options = []
+        for i, option in enumerate(options):
+            if f'{prefix}option_{i}' in form:
+                selected_options.append(option)
+
+        # 获取自由文本
+        user_text = form.get_text(f'{prefix}feedback_text').strip()
+
+        # 组合结果
+        final_feedback_parts = []
+        if selected_options:
+            final_feedback_parts.append("; ".join(selected_options))
+        if user_text:
+            final_feedback_parts.append(user_text)
+
+        return "\n\n".join(final_feedback_parts)
+
+    def _store_attachments(self, form):
+        stored = []
+        for field in form.files():
+            try:
+                attachment = self.server.attachments.put(field.open(), field.filename, field.content_type)
+            except OSError as e:
+                print(f"⚠️  附件保存失败: {e}", file=sys.stderr, flush=True)
+                self._send_json({'status': 'error', 'error': 'store_failed'}, 500)
+                return
+            # 同一内容重复上传时沿用第一次的文件名
+            attachment = self.session.attachments.setdefault(attachment.id, attachment)
+            stored.append({
+                'id': attachment.id,
+                'name': attachment.filename,
+                'size': attachment.size,
+                'content_type': attachment.content_type,
+                'url': f'/attachments/{attachment.id}',
+                'preview': attachment.previewable,
+            })
+        self._send_json({'attachments': stored})
+
+    def log_request(self, code='-', size='-'):
+        # 不输出访问日志，只按方法和状态码计数（见 /metrics）
+        metrics.inc('interactive_feedback_http_requests_total', method=self.command or '-',
+                    code=str(int(code)) if isinstance(code, int) else str(code))
 
     def log_message(self, format, *args):
         # 禁用日志输出
         pass
 
-def create_handler(prompt, predefined_options, result_container):
+def dismiss_abandoned(sessions: 'SessionRegistry', events: EventBroadcaster, client_id: str):
+    for session in sessions.abandoned(client_id):
+        dismiss_unviewed(events, session)
+
+def dismiss_unviewed(events: EventBroadcaster, session: FeedbackSession):
+    """没有页面显示的问题按 dismissed 结束；页面正在刷新时，等新页面加载完再判断"""
+    wait = session.reload_wait()
+    if wait > 0:
+        timer = threading.Timer(wait, dismiss_unviewed, [events, session])
+        timer.daemon = True
+        timer.start()
+        return
+    if not session.viewers and session.dismiss():
+        print("🚪 反馈页面已关闭，问题按 dismissed 结束", file=sys.stderr, flush=True)
+        events.publish('session_completed', {'id': session.id, 'reason': 'dismissed'})
+
+class SessionRegistry:
+    """线程安全的会话表，由请求处理线程和调用方共享
+
+    同时跟踪页面（client_id）：每个页面的事件流连接数、已通过 beacon 离开的页面，
+    以及每个问题正被哪些页面显示，用于在页面关闭时尽早结束问题。
+    """
+
+    def __init__(self):
+        self._sessions: Dict[str, FeedbackSession] = {}
+        self._lock = threading.Lock()
+        self._connections: Dict[str, int] = {}
+        self._gone = set()
+
+    def add(self, session: FeedbackSession):
+        with self._lock:
+            self._sessions[session.id] = session
+
+    def get(self, session_id: str) -> Optional[FeedbackSession]:
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def remove(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def pending(self) -> List[FeedbackSession]:
+        """按创建时间排序的待回答会话"""
+        with self._lock:
+            pending = [s for s in self._sessions.values() if not s.completed]
+        return sorted(pending, key=lambda s: s.created_at)
+
+    def pending_count(self) -> int:
+        return len(self.pending())
+
+    def view(self, client_id: str, session: Optional[FeedbackSession]):
+        """页面现在显示 session（None 表示问题队列），一个页面同时只显示一个问题"""
+        with self._lock:
+            self._gone.discard(client_id)
+            for other in self._sessions.values():
+                other.viewers.discard(client_id)
+            if session is not None:
+                session.viewers.add(client_id)
+
+    def connect(self, client_id: str):
+        with self._lock:
+            self._gone.discard(client_id)
+            self._connections[client_id] = self._connections.get(client_id, 0) + 1
+
+    def disconnect(self, client_id: str) -> bool:
+        """事件流断开，返回该页面是否已没有任何连接"""
+        with self._lock:
+            count = self._connections.get(client_id, 0) - 1
+            if count > 0:
+                self._connections[client_id] = count
+                return False
+            self._connections.pop(client_id, None)
+            return True
+
+    def leave(self, client_id: str):
+        with self._lock:
+            self._gone.add(client_id)
+
+    def abandoned(self, client_id: str) -> List[FeedbackSession]:
+        """页面离开后没有回来：不再算作查看者，返回因此无人显示的未回答问题"""
+        with self._lock:
+            if self._connections.get(client_id) and client_id not in self._gone:
+                # 断线后已重新连上
+                return []
+            self._gone.discard(client_id)
+            abandoned = []
+            for session in self._sessions.values():
+                if client_id in session.viewers:
+                    session.viewers.discard(client_id)
+                    if not session.viewers and not session.completed:
+                        abandoned.append(session)
+            return abandoned
+
+    @staticmethod
+    def summary(session: FeedbackSession) -> Dict:
+        """问题队列页面使用的精简信息，只包含提示的开头部分"""
+        return {
+            'id': session.id,
+            'preview': session.prompt[:QUEUE_PREVIEW_CHARS],
+            'options': len(session.predefined_options),
+            'questions': len(session.questions) if session.questions else 1,
+            'client': session.client,
+            'created_at': session.created_at,
+        }
+
+    def pending_summaries(self) -> List[Dict]:
+        return [self.summary(s) for s in self.pending()]
+
+class FeedbackHTTPServer(ThreadingHTTPServer):
+    """每个连接一个线程，并限制同时处理的连接数
+
+    超出上限的连接在接受线程里直接收到 503 并被关闭，
+    不会排队等待，也不会拖慢已有连接上的请求。
+    """
+
+    REJECT_RESPONSE = (b'HTTP/1.1 503 Service Unavailable\r\n'
+                       b'Content-Length: 0\r\nConnection: close\r\nRetry-After: 1\r\n\r\n')
+
+    def __init__(self, server_address, handler_class, max_connections: int = MAX_CONNECTIONS,
+                 max_body_size: int = MAX_BODY_SIZE, attachments: Optional[AttachmentStore] = None):
+        if os.name == 'nt':
+            # Windows 上 SO_REUSEADDR 允许抢占正在监听的端口，改用独占绑定
+            self.allow_reuse_address = False
+        super().__init__(server_address, handler_class)
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self.max_body_size = max_body_size
+        self.attachments = attachments or AttachmentStore()
+
+    def server_bind(self):
+        # 其他平台上 allow_reuse_address（SO_REUSEADDR）让刚关闭的端口（TIME_WAIT）能立即重新绑定
+        if os.name == 'nt':
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_EXCLUSIVEADDRUSE, 1)
+        super().server_bind()
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            try:
+                request.sendall(self.REJECT_RESPONSE)
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        try:
+            super().process_request(request, client_address)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._slots.release()
+
+def create_handler(sessions, events):
     def handler(*args, **kwargs):
-        return FeedbackHandler(prompt, predefined_options, result_container, *args, **kwargs)
+        return FeedbackHandler(sessions, events, *args, **kwargs)
     return handler
 
-def get_user_input_web(prompt: str, predefined_options: Optional[List[str]] = None) -> Dict[str, str]:
-    """通过 Web 界面获取用户输入"""
-    result_container = {'feedback': '', 'completed': False}
-    
-    # 创建 HTTP 服务器
-    handler = create_handler(prompt, predefined_options, result_container)
-    server = HTTPServer(('localhost', 0), handler)  # 使用随机端口
-    port = server.server_address[1]
-    
-    # 在后台启动服务器
-    server_thread = threading.Thread(target=server.serve_forever)
-    server_thread.daemon = True
-    server_thread.start()
-    
-    url = f"http://localhost:{port}"
-    print(f"🌐 请在浏览器中打开以下链接提供反馈：", flush=True)
-    print(f"   {url}", flush=True)
-    print(f"📱 或者扫描二维码（如果支持）", flush=True)
-    
-    # 尝试自动打开浏览器
+def feedback_port() -> int:
+    """反馈服务器的端口：INTERACTIVE_FEEDBACK_PORT，默认 DEFAULT_PORT，0 表示每次随机"""
+    try:
+        port = int(os.environ.get("INTERACTIVE_FEEDBACK_PORT", DEFAULT_PORT))
+    except ValueError:
+        port = -1
+    if not 0 <= port <= 65535:
+        print("⚠️  INTERACTIVE_FEEDBACK_PORT 不是有效端口（0-65535），改用随机端口", file=sys.stderr, flush=True)
+        return 0
+    return port
+
+def open_browser(url: str):
+    """尝试自动打开浏览器，失败时提示手动打开"""
     try:
         webbrowser.open(url)
-        print("✅ 已尝试自动打开浏览器", flush=True)
+        print("✅ 已尝试自动打开浏览器", file=sys.stderr, flush=True)
     except:
-        print("⚠️  无法自动打开浏览器，请手动复制链接", flush=True)
-    
-    # 等待用户完成
-    print("⏳ 等待用户反馈...", flush=True)
-    timeout = 300  # 5分钟超时
-    start_time = time.time()
-    
-    while not result_container['completed']:
-        if time.time() - start_time > timeout:
-            print("⏰ 超时，返回空反馈", flush=True)
-            break
-        time.sleep(1)
-    
-    server.shutdown()
-    server.server_close()
-    
-    return {"interactive_feedback": result_container['feedback']}
+        print("⚠️  无法自动打开浏览器，请手动复制链接", file=sys.stderr, flush=True)
+
+class FeedbackWebServer:
+    """常驻的反馈 HTTP 服务器
+
+    只绑定一次端口、启动一个服务线程，之后每个问题注册为一个会话，
+    调用方在同一进程内通过 Future 拿到结果，不再为每个问题启动新进程。
+    """
+
+    def __init__(self, host: str = 'localhost', port: int = 0, max_connections: int = MAX_CONNECTIONS,
+                 max_body_size: int = MAX_BODY_SIZE, attachment_dir: Optional[str] = None,
+                 reconnect_tabs: bool = False):
+        self.host = host
+        self.port = port
+        # 只有绑定到了配置的固定端口，旧标签页才会重连到这里
+        self.requested_port = port
+        # 之前在这个端口上的服务器（上一个问题的子进程）结束时还有页面开着，它会重连过来
+        self.reconnect_tabs = reconnect_tabs
+        self._tabs_may_reconnect = False
+        self.max_connections = max_connections
+        self.max_body_size = max_body_size
+        self.attachments = AttachmentStore(attachment_dir)
+        self.sessions = SessionRegistry()
+        self.events = EventBroadcaster()
+        self._httpd: Optional[FeedbackHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._started_at = 0.0
+
+    def start(self):
+        if self._httpd is not None:
+            return
+        self._httpd = self._bind()
+        self.port = self._httpd.server_address[1]
+        self._started_at = time.monotonic()
+        self._tabs_may_reconnect = self.reconnect_tabs and self.port == self.requested_port
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def _bind(self) -> FeedbackHTTPServer:
+        """绑定配置的端口；被占用时依次尝试后面几个端口，最后退回随机端口"""
+        def bind(port):
+            # 多线程服务器：长连接的 SSE 请求或卡住的连接不会阻塞其他请求
+            return FeedbackHTTPServer((self.host, port), create_handler(self.sessions, self.events),
+                                      self.max_connections, self.max_body_size, self.attachments)
+
+        if not 0 < self.port <= 65535:
+            # 0 表示随机端口；超出范围的端口同样改用随机端口
+            return bind(0)
+        if self.reconnect_tabs:
+            deadline = time.monotonic() + PORT_RELEASE_WAIT
+            while time.monotonic() < deadline:
+                try:
+                    return bind(self.port)
+                except OSError:
+                    time.sleep(0.05)
+        last_port = min(self.port + PORT_FALLBACK_ATTEMPTS, 65536) - 1
+        last_error: Optional[OSError] = None
+        for port in range(self.port, last_port + 1):
+            try:
+                httpd = bind(port)
+            except OSError as e:
+                last_error = e
+                continue
+            if port != self.port:
+                print(f"⚠️  端口 {self.port} 已被占用，改用端口 {port}", file=sys.stderr, flush=True)
+            return httpd
+        print(f"⚠️  端口 {self.port}-{last_port} 都不可用（{last_error}），改用随机端口", file=sys.stderr, flush=True)
+        return bind(0)
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def session_url(self, session: FeedbackSession) -> str:
+        return f"{self.url}/s/{session.id}/"
+
+    def create_session(self, prompt: str, predefined_options: Optional[List[str]] = None,
+                       questions: Optional[List[Dict]] = None) -> FeedbackSession:
+        session = FeedbackSession(prompt, predefined_options, questions)
+        self.sessions.add(session)
+        return session
+
+    def close_session(self, session: FeedbackSession):
+        self.sessions.remove(session.id)
+        self.events.publish('session_closed', {'id': session.id, 'reason': session.end_reason})
+
+    def open_session(self, prompt: str, predefined_options: Optional[List[str]] = None,
+                     questions: Optional[List[Dict]] = None) -> FeedbackSession:
+        """注册一个问题并打开浏览器，立即返回会话，由调用方等待 session.future"""
+        self.start()
+        session = self.create_session(prompt, predefined_options, questions)
+        self.show_session(session)
+        return session
+
+    def show_session(self, session: FeedbackSession):
+        """打印链接，把问题推送给已打开的页面，没有页面时打开浏览器（可能短暂阻塞）"""
+        url = self.session_url(session)
+        print(f"🌐 请在浏览器中打开以下链接提供反馈：", file=sys.stderr, flush=True)
+        print(f"   {url}", file=sys.stderr, flush=True)
+        self.events.publish('session_created', self.sessions.summary(session))
+        if not self.events.client_count() and self._just_started():
+            # 上一个问题的页面还开着：它会在一秒左右自动重连到固定端口，
+            # 连上后通过 session_created 接着显示新问题，不必再开新标签页
+            self.events.wait_for_client(self._started_at + TAB_RECONNECT_WAIT - time.monotonic())
+            if self.events.client_count():
+                self.events.publish('session_created', self.sessions.summary(session))
+        if self.sessions.get(session.id) is None:
+            # 等待期间问题已被撤回（调用取消或超时）
+            return
+        if self.events.client_count():
+            # 已有打开的页面，通过 SSE 推送新问题，不再新开标签页
+            print("📨 已推送到已打开的反馈页面", file=sys.stderr, flush=True)
+        else:
+            started = time.perf_counter()
+            open_browser(url)
+            record_span('browser_open', time.perf_counter() - started, call=session.call_id, session=session.id)
+        print("⏳ 等待用户反馈...", file=sys.stderr, flush=True)
+
+    def _just_started(self) -> bool:
+        """刚在上一个问题的页面还开着的固定端口上启动：旧标签页可能正在重连"""
+        return self._tabs_may_reconnect and time.monotonic() - self._started_at < TAB_RECONNECT_WAIT
+
+    def shutdown(self, wait: bool = True):
+        """停止服务器；wait=False 时在后台线程中完成，不拖慢结果返回"""
+        if self._httpd is None:
+            return
+        httpd = self._httpd
+        self._httpd = None
+        self._thread = None
+        self.events.close()
+
+        def stop():
+            # serve_forever 最多要等一个轮询周期才会退出
+            httpd.shutdown()
+            httpd.server_close()
+
+        if wait:
+            stop()
+        else:
+            threading.Thread(target=stop, daemon=True).start()
+
+def get_user_input_web(prompt: str, predefined_options: Optional[List[str]] = None,
+                       on_waiting: Optional[Callable[[str], None]] = None,
+                       questions: Optional[List[Dict]] = None, timeout: float = FEEDBACK_TIMEOUT,
+                       reconnect_tabs: bool = False, on_finished: Optional[Callable[[bool], None]] = None) -> Dict:
+    """通过 Web 界面获取用户输入，on_waiting 在页面就绪后以链接地址调用
+
+    reconnect_tabs 表示上一个问题的页面还开着、会重连到同一端口；
+    on_finished 在问题结束时以“页面是否还开着”调用，供下一个问题使用。
+    """
+    # 创建 HTTP 服务器（默认固定端口，见 feedback_port），提交后由 Future 立即唤醒，无需轮询
+    server = FeedbackWebServer(port=feedback_port(), reconnect_tabs=reconnect_tabs)
+    try:
+        session = server.open_session(prompt, predefined_options, questions)
+        if on_waiting is not None:
+            on_waiting(server.session_url(session))
+        try:
+            result = session.future.result(timeout=timeout)
+        except FutureTimeoutError:
+            print("⏰ 超时，返回空反馈", file=sys.stderr, flush=True)
+            result = {"interactive_feedback": ""}
+        if on_finished is not None:
+            on_finished(server.events.client_count() > 0)
+        return result
+    finally:
+        server.shutdown(wait=False)
 
 def main():
     parser = argparse.ArgumentParser(description="Interactive Feedback Web Tool")
-    parser.add_argument("--prompt", required=True, help="The feedback prompt")
-    parser.add_argument("--output-file", required=True, help="Output JSON file path")
+    parser.add_argument("--prompt", help="The feedback prompt (with --ipc it is read from stdin when omitted)")
+    parser.add_argument("--output-file", help="Output JSON file path")
+    parser.add_argument("--ipc", action="store_true", help="Exchange the question and result as frames on stdin/stdout (used by server.py)")
     parser.add_argument("--predefined-options", default="", help="Predefined options separated by |||")
+    parser.add_argument("--predefined-options-json", help="Predefined options as a JSON list (options may contain any text)")
     
     args = parser.parse_args()
-    
-    # 解析预定义选项
-    predefined_options = None
-    if args.predefined_options.strip():
-        predefined_options = [opt.strip() for opt in args.predefined_options.split("|||") if opt.strip()]
+    if not args.ipc and not args.output_file:
+        parser.error("one of --output-file or --ipc is required")
+    if not args.ipc and args.prompt is None:
+        parser.error("--prompt is required without --ipc")
+
+    # 结果通道：stdout 只用于传输帧，其余输出改到 stderr
+    channel = open_stdout_channel() if args.ipc else None
+    # 由 server.py 启动时沿用它的调用 ID，本进程写出的计时记录能与服务端的各阶段关联
+    join_call(os.environ.get(CALL_ENV))
     
     try:
+        if args.prompt is None:
+            # 问题通过 stdin 传入，不受命令行长度限制
+            prompt, predefined_options, questions = read_request(sys.stdin.buffer)
+        else:
+            prompt = args.prompt
+            questions = None
+            # 解析预定义选项
+            predefined_options = None
+            if args.predefined_options_json is not None:
+                predefined_options = parse_options(json.loads(args.predefined_options_json))
+            elif args.predefined_options.strip():
+                predefined_options = [opt.strip() for opt in args.predefined_options.split("|||") if opt.strip()]
+
         # 获取用户反馈
-        result = get_user_input_web(args.prompt, predefined_options)
+        on_waiting = (lambda url: channel.progress("waiting", url=url)) if channel else None
+        # 告诉 server.py 页面是否还开着，下一个子进程据此等旧标签页重连，而不是再开一个
+        on_finished = (lambda tab_open: channel.progress("finished", tab_open=tab_open)) if channel else None
+        result = get_user_input_web(prompt, predefined_options, on_waiting, questions,
+                                    reconnect_tabs=os.environ.get(TAB_OPEN_ENV) == "1", on_finished=on_finished)
         
         # 保存结果
-        with open(args.output_file, 'w', encoding='utf-8') as f:
-            json.dump(result, f, ensure_ascii=False, indent=2)
-        
-        print(f"\n💾 结果已保存到: {args.output_file}")
+        if channel:
+            channel.result(result)
+        else:
+            with open(args.output_file, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+            print(f"\n💾 结果已保存到: {args.output_file}")
         
     except Exception as e:
-        print(f"\n❌ 错误: {e}")
-        # 确保即使出错也创建输出文件
-        with open(args.output_file, 'w', encoding='utf-8') as f:
-            json.dump({"interactive_feedback": ""}, f)
+        print(f"\n❌ 错误: {e}", file=sys.stderr)
+        if channel:
+            channel.error(str(e))
+        else:
+            # 确保即使出错也创建输出文件
+            with open(args.output_file, 'w', encoding='utf-8') as f:
+                json.dump({"interactive_feedback": ""}, f)
         sys.exit(1)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main() 
@@ -5,106 +5,655 @@
 import os
 import sys
 import json
+import math
+import time
+import socket
+import asyncio
+import argparse
 import tempfile
+import threading
 import subprocess
-from typing import Dict, List, Optional
+import importlib.util
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
 
-from fastmcp import FastMCP
-from pydantic import Field
+from fastmcp import Context, FastMCP
+from pydantic import BaseModel, Field
+
+from feedback_cache import AnswerCache, resolve_reuse, reuse_option
+from feedback_history import load_history
+from feedback_ipc import TAB_OPEN_ENV, FrameError, encode_request, frame_result, read_frame
+from feedback_metrics import CALL_ENV, current_call, current_client, metrics, record_span, start_call
 
 # Initialize FastMCP server
 mcp = FastMCP("Interactive Feedback MCP")
 
-def launch_feedback_ui(summary: str, predefinedOptions: list[str] | None = None) -> dict[str, str]:
-    # Create a temporary file for the feedback result
-    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
-        output_file = tmp.name
+def load_answer_cache() -> AnswerCache:
+    """The answer cache configured by INTERACTIVE_FEEDBACK_ANSWER_CACHE* (off unless opted in)."""
+    try:
+        return AnswerCache.from_env(os.environ)
+    except ValueError as e:
+        print(f"⚠️  Answer cache disabled: {e}", file=sys.stderr, flush=True)
+        return AnswerCache()
+
+answer_cache = load_answer_cache()
+
+def answer_cache_samples():
+    """Answer cache counters for /metrics, read at scrape time."""
+    if not answer_cache.enabled:
+        return
+    stats = answer_cache.stats()
+    for kind in ("hits", "misses", "expired", "evicted", "reused"):
+        yield "interactive_feedback_answer_cache_total", {"kind": kind}, stats[kind]
+    yield "interactive_feedback_answer_cache_entries", {}, stats["entries"]
+
+metrics.add_collector(answer_cache_samples)
+
+# Searchable record of questions and answers (INTERACTIVE_FEEDBACK_HISTORY, off by default)
+history = load_history()
+
+# Long-lived in-process web feedback server, shared by every tool call
+_feedback_server = None
+_feedback_server_lock = threading.Lock()
+
+def get_feedback_server():
+    """Return the shared in-process feedback web server, starting it on first use."""
+    global _feedback_server
+    # feedback_web (http.server, markdown, ...) is only imported once web feedback is needed
+    with _feedback_server_lock:
+        if _feedback_server is None:
+            from feedback_web import FeedbackWebServer, feedback_port
+            # A fixed port (INTERACTIVE_FEEDBACK_PORT) keeps the page URL stable across restarts
+            server = FeedbackWebServer(port=feedback_port())
+            server.start()
+            _feedback_server = server
+    return _feedback_server
+
+def use_inprocess_web() -> bool:
+    """Whether web feedback is served by the in-process server (default) or a subprocess."""
+    return os.environ.get('INTERACTIVE_FEEDBACK_WEB_MODE', 'inprocess').lower() == 'inprocess'
+
+def report_timing(phase: str, started: float, **fields):
+    """Record how long a phase of a feedback call took as a span (see feedback_metrics).
+
+    With INTERACTIVE_FEEDBACK_TIMINGS=1 the span is also logged to stderr,
+    where test/bench_e2e_latency.py reads it.
+    """
+    record = record_span(phase, time.perf_counter() - started, **fields)
+    if os.environ.get('INTERACTIVE_FEEDBACK_TIMINGS') != '1':
+        return
+    print(f"⏱ {json.dumps(record)}", file=sys.stderr, flush=True)
+
+def call_outcome(result: Dict[str, Any]) -> str:
+    """answered, dismissed (the feedback page was closed), empty (timeout or closed window) or error."""
+    if result.get("status") == "dismissed":
+        return "dismissed"
+    if "answers" in result:
+        if result.get("error"):
+            return "error"
+        return "answered" if any(a.get("interactive_feedback") for a in result["answers"]) else "empty"
+    feedback = result.get("interactive_feedback", "")
+    if feedback.startswith("Error:"):
+        return "error"
+    return "answered" if feedback else "empty"
+
+def report_call(tool: str, started: float, result: Dict[str, Any], questions: List[Dict[str, Any]]):
+    """Time and count a finished tool call, and queue its questions and answers for the history."""
+    seconds = time.perf_counter() - started
+    outcome = call_outcome(result)
+    client = current_client()
+    report_timing("call", started, tool=tool, outcome=outcome, **({"client": client} if client else {}))
+    metrics.inc("interactive_feedback_calls_total", tool=tool, outcome=outcome)
+    if history.enabled:
+        answers = result["answers"] if "answers" in result else [result]
+        for question, answer in zip(questions, answers):
+            history.record(tool, question["prompt"], question["predefined_options"],
+                           answer.get("interactive_feedback", ""), outcome, seconds,
+                           call=current_call(), client=client)
+
+def shared_session(ctx: Optional[Context]) -> Optional[str]:
+    """The MCP session id of a call over a shared (HTTP or SSE) transport; None over stdio."""
+    if ctx is None or ctx.transport in (None, "stdio"):
+        return None
+    try:
+        return ctx.session_id
+    except RuntimeError:
+        return None
+
+def client_label(ctx: Optional[Context], session_id: Optional[str]) -> Optional[str]:
+    """How the feedback page names the client of a shared session, e.g. "cursor · 3f9a2c"."""
+    if session_id is None:
+        return None
+    try:
+        params = ctx.session.client_params
+    except RuntimeError:
+        params = None
+    # client_info in current MCP SDKs, clientInfo in older ones
+    info = getattr(params, "client_info", None) or getattr(params, "clientInfo", None)
+    return f"{getattr(info, 'name', None) or 'client'} · {session_id[:6]}"
+
+# Seconds to wait for an answer when a call doesn't say (INTERACTIVE_FEEDBACK_TIMEOUT overrides)
+DEFAULT_FEEDBACK_TIMEOUT = 300
+# Extra seconds a feedback subprocess waits past the call's own deadline, so the server decides
+CHILD_TIMEOUT_GRACE = 5
+# Seconds between progress notifications while waiting, so clients don't time the call out
+PROGRESS_INTERVAL = 10
+
+# Whether the last web feedback subprocess finished with its page still open;
+# the next one then waits for that tab to reconnect instead of opening another
+_web_tab_open = False
+
+@lru_cache(maxsize=None)
+def parse_feedback_timeout(value: Optional[str]) -> float:
+    """INTERACTIVE_FEEDBACK_TIMEOUT as seconds; a malformed value warns once and uses the default."""
+    if value is None:
+        return float(DEFAULT_FEEDBACK_TIMEOUT)
+    try:
+        timeout = float(value)
+    except ValueError:
+        timeout = math.nan
+    if not (math.isfinite(timeout) and timeout > 0):
+        print(f"⚠️  INTERACTIVE_FEEDBACK_TIMEOUT={value!r} is not a positive number of seconds, "
+              f"using {DEFAULT_FEEDBACK_TIMEOUT}", file=sys.stderr, flush=True)
+        return float(DEFAULT_FEEDBACK_TIMEOUT)
+    return timeout
+
+def feedback_timeout(requested: Optional[float] = None) -> float:
+    """The call's timeout: as requested, else INTERACTIVE_FEEDBACK_TIMEOUT, else 300 seconds."""
+    if isinstance(requested, (int, float)) and requested > 0:
+        return float(requested)
+    return parse_feedback_timeout(os.environ.get('INTERACTIVE_FEEDBACK_TIMEOUT'))
+
+def child_env(timeout: float) -> dict:
+    env = {**os.environ, 'INTERACTIVE_FEEDBACK_TIMEOUT': str(timeout + CHILD_TIMEOUT_GRACE)}
+    # The child's spans (first_view, parse, submit) carry this call's id
+    env.pop(CALL_ENV, None)
+    if current_call():
+        env[CALL_ENV] = current_call()
+    env.pop(TAB_OPEN_ENV, None)
+    if _web_tab_open:
+        env[TAB_OPEN_ENV] = "1"
+    return env
+
+async def wait_with_progress(ctx: Optional[Context], waiter, timeout: float):
+    """Await waiter, sending an MCP progress notification every PROGRESS_INTERVAL seconds.
 
+    If the call is cancelled (notifications/cancelled), waiter is cancelled too and
+    this returns only once its cleanup has run, so the question's session, socket
+    or child process is gone by then.
+    """
+    task = asyncio.ensure_future(waiter)
+    started = time.monotonic()
     try:
-        # Get the path to the feedback script relative to this script
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        feedback_web_path = os.path.join(script_dir, "feedback_web.py")
-        feedback_ui_path = os.path.join(script_dir, "feedback_ui.py")
-        
-        # Check environment preference and availability
-        ui_preference = os.environ.get('INTERACTIVE_FEEDBACK_UI', 'auto').lower()
-        has_display = os.environ.get('DISPLAY') is not None
-        
-        # Check if PySide6 is available for GUI
-        has_pyside6 = False
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=PROGRESS_INTERVAL)
+            if done:
+                return task.result()
+            if ctx is None:
+                continue
+            elapsed = time.monotonic() - started
+            try:
+                await ctx.report_progress(elapsed, timeout, f"Waiting for the user's answer ({elapsed:.0f}s of {timeout:.0f}s)")
+            except Exception as e:
+                # Progress is best effort; the answer still matters
+                print(f"⚠️ Could not report progress: {e}", file=sys.stderr, flush=True)
+    finally:
+        if not task.done():
+            task.cancel()
+            await asyncio.wait({task})
+
+# How long to wait for a freshly spawned GUI daemon to accept connections
+GUI_DAEMON_START_TIMEOUT = 10
+
+def use_gui_daemon() -> bool:
+    """Whether GUI feedback goes through the resident Qt daemon (default) or a subprocess per question."""
+    if sys.platform == 'win32':
+        return False
+    return os.environ.get('INTERACTIVE_FEEDBACK_GUI_MODE', 'daemon').lower() == 'daemon'
+
+def gui_daemon_socket_path() -> str:
+    default = os.path.join(tempfile.gettempdir(), f"interactive-feedback-gui-{os.getuid()}.sock")
+    return os.environ.get('INTERACTIVE_FEEDBACK_GUI_SOCKET', default)
+
+def spawn_gui_daemon(script_path: str):
+    """Start feedback_ui.py as a detached daemon; it exits on its own after an idle period."""
+    cmd = [sys.executable, script_path, "--daemon", "--socket", gui_daemon_socket_path()]
+    idle_timeout = os.environ.get('INTERACTIVE_FEEDBACK_GUI_IDLE_TIMEOUT')
+    if idle_timeout:
+        cmd.extend(["--idle-timeout", idle_timeout])
+    subprocess.Popen(
+        cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+def ensure_gui_daemon(script_path: str):
+    """Spawn the GUI daemon unless one is already listening."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
         try:
-            import PySide6
-            has_pyside6 = True
-        except ImportError:
+            sock.connect(gui_daemon_socket_path())
+            return
+        except OSError:
             pass
-        
-        # Determine which interface to use
-        script_path = None
-        interface_type = "unknown"
-        
-        if ui_preference == 'web' and os.path.exists(feedback_web_path):
-            script_path = feedback_web_path
-            interface_type = "web"
-        elif ui_preference == 'gui' and has_display and has_pyside6 and os.path.exists(feedback_ui_path):
-            script_path = feedback_ui_path
-            interface_type = "gui"
-        elif ui_preference == 'auto':
-            # Auto-select based on environment
-            if os.path.exists(feedback_web_path):
-                script_path = feedback_web_path
-                interface_type = "web"
-            elif has_display and has_pyside6 and os.path.exists(feedback_ui_path):
-                script_path = feedback_ui_path
-                interface_type = "gui"
-        
+    spawn_gui_daemon(script_path)
+
+def encode_gui_request(summary: str, predefinedOptions: list[str] | None, questions: list[dict] | None = None) -> bytes:
+    request = {"prompt": summary, "predefined_options": predefinedOptions or []}
+    if questions:
+        request["questions"] = questions
+    return json.dumps(request).encode('utf-8') + b"\n"
+
+def decode_gui_response(line: bytes) -> dict[str, str]:
+    if not line:
+        raise ConnectionError("GUI daemon closed the connection without an answer")
+    return json.loads(line.decode('utf-8'))
+
+async def open_gui_daemon_connection(script_path: str):
+    path = gui_daemon_socket_path()
+    # Answers can be long; raise the default 64 KiB line limit
+    limit = 16 * 1024 * 1024
+    try:
+        return await asyncio.open_unix_connection(path, limit=limit)
+    except OSError:
+        spawn_gui_daemon(script_path)
+    deadline = time.monotonic() + GUI_DAEMON_START_TIMEOUT
+    while True:
+        try:
+            return await asyncio.open_unix_connection(path, limit=limit)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.05)
+
+async def launch_feedback_gui_daemon_async(script_path: str, summary: str, predefinedOptions: list[str] | None = None,
+                                           questions: list[dict] | None = None) -> dict:
+    started = time.perf_counter()
+    reader, writer = await open_gui_daemon_connection(script_path)
+    report_timing("spawn", started, backend="gui-daemon")
+    try:
+        print("🚀 Sending question to GUI feedback daemon...", file=sys.stderr, flush=True)
+        started = time.perf_counter()
+        writer.write(encode_gui_request(summary, predefinedOptions, questions))
+        await writer.drain()
+        report_timing("bind", started)
+        return decode_gui_response(await reader.readline())
+    finally:
+        # Closing the connection also withdraws the question if we were cancelled
+        writer.close()
+
+@lru_cache(maxsize=None)
+def detect_feedback_backends() -> tuple[Optional[str], Optional[str]]:
+    """Locate the web and GUI feedback scripts once, returning (web_path, gui_path).
+
+    gui_path is None when PySide6 is not installed; it is looked up with
+    find_spec() so the check doesn't load Qt into this process.
+    """
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    feedback_web_path = os.path.join(script_dir, "feedback_web.py")
+    feedback_ui_path = os.path.join(script_dir, "feedback_ui.py")
+
+    has_pyside6 = importlib.util.find_spec("PySide6") is not None
+
+    web_path = feedback_web_path if os.path.exists(feedback_web_path) else None
+    gui_path = feedback_ui_path if has_pyside6 and os.path.exists(feedback_ui_path) else None
+    return web_path, gui_path
+
+def select_feedback_interface() -> tuple[Optional[str], str]:
+    """Pick the feedback script to run, returning (script_path, interface_type)."""
+    web_path, gui_path = detect_feedback_backends()
+
+    # Check environment preference and availability
+    ui_preference = os.environ.get('INTERACTIVE_FEEDBACK_UI', 'auto').lower()
+    has_display = os.environ.get('DISPLAY') is not None
+
+    if ui_preference == 'web' and web_path:
+        return web_path, "web"
+    elif ui_preference == 'gui' and has_display and gui_path:
+        return gui_path, "gui"
+    elif ui_preference == 'auto':
+        # Auto-select based on environment
+        if web_path:
+            return web_path, "web"
+        elif has_display and gui_path:
+            return gui_path, "gui"
+    return None, "unknown"
+
+def build_feedback_command(script_path: str) -> list[str]:
+    # --ipc: the question arrives as a request frame on stdin (no argv size limit)
+    # and the child reports progress and its result as frames on stdout
+    return [sys.executable, script_path, "--ipc"]
+
+def log_progress(frame: dict):
+    if frame.get("url"):
+        print(f"🌐 Feedback page: {frame['url']}", file=sys.stderr, flush=True)
+    else:
+        print(f"⏳ Feedback interface: {frame.get('stage')}", file=sys.stderr, flush=True)
+
+def feedback_failed(returncode: int | None, stderr: str) -> dict[str, str]:
+    """Result for a child that exited without sending a result frame."""
+    print(f"❌ Feedback script failed (exit code {returncode}): {stderr}", file=sys.stderr, flush=True)
+    return {"interactive_feedback": "Error: Feedback collection failed"}
+
+async def launch_feedback_web_inprocess_async(summary: str, predefinedOptions: list[str] | None = None,
+                                              questions: list[dict] | None = None) -> dict:
+    started = time.perf_counter()
+    server = get_feedback_server()
+    report_timing("spawn", started, backend="inprocess")
+    print("🚀 Registering question with in-process web feedback server...", file=sys.stderr, flush=True)
+    started = time.perf_counter()
+    session = server.create_session(summary, predefinedOptions, questions)
+    try:
+        # Opening the browser (or waiting for an old tab to reconnect) may briefly block,
+        # keep it off the event loop; the session is closed even if we're cancelled meanwhile
+        await asyncio.to_thread(server.show_session, session)
+        report_timing("bind", started, url=server.session_url(session))
+        # The deadline is enforced by launch_feedback_ui_async; cancelling closes the session
+        return await asyncio.wrap_future(session.future)
+    finally:
+        server.close_session(session)
+
+def launch_feedback_ui(summary: str, predefinedOptions: list[str] | None = None,
+                       questions: list[dict] | None = None, timeout: Optional[float] = None) -> dict:
+    """Blocking launch_feedback_ui_async, for callers without an event loop."""
+    return asyncio.run(launch_feedback_ui_async(summary, predefinedOptions, questions, timeout))
+
+async def launch_feedback_ui_async(summary: str, predefinedOptions: list[str] | None = None,
+                                   questions: list[dict] | None = None, timeout: Optional[float] = None) -> dict:
+    """Ask the user through the selected backend; waits for the answer without holding a worker thread.
+
+    With questions (a batch), every backend shows them as one form and answers
+    with {"answers": [...]}; errors still come back as {"interactive_feedback": "Error: ..."}.
+    After timeout seconds (see feedback_timeout) the question is withdrawn and the
+    answer is empty.
+    """
+    timeout = feedback_timeout(timeout)
+    started = time.perf_counter()
+    try:
+        # On timeout or cancellation the backend's cleanup (close the session or the
+        # daemon connection, kill the child) has run by the time this returns
+        return await asyncio.wait_for(ask_feedback_backend(summary, predefinedOptions, questions, timeout), timeout)
+    except asyncio.TimeoutError:
+        report_timing("timeout", started, timeout=timeout)
+        print("⏰ Feedback timed out, returning empty feedback", file=sys.stderr, flush=True)
+        return {"interactive_feedback": ""}
+
+async def ask_feedback_backend(summary: str, predefinedOptions: list[str] | None, questions: list[dict] | None,
+                               timeout: float) -> dict:
+    global _web_tab_open
+    process = None
+    stderr_task = None
+    answered = False
+    try:
+        started = time.perf_counter()
+        script_path, interface_type = select_feedback_interface()
+        report_timing("select", started, interface=interface_type)
+
         if not script_path:
             return {"interactive_feedback": "Error: No suitable feedback interface found"}
-        
-        # Prepare command arguments
-        cmd = [sys.executable, script_path, "--prompt", summary, "--output-file", output_file]
-        
-        if predefinedOptions:
-            options_str = "|||".join(predefinedOptions)
-            cmd.extend(["--predefined-options", options_str])
-        
-        print(f"🚀 Launching {interface_type} feedback interface...", flush=True)
-        
-        # Run the feedback script
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.returncode != 0:
-            print(f"❌ Feedback script failed: {result.stderr}", flush=True)
-            return {"interactive_feedback": "Error: Feedback collection failed"}
-        
-        # Read the result
-        if os.path.exists(output_file):
-            with open(output_file, 'r', encoding='utf-8') as f:
-                feedback_result = json.load(f)
-            return feedback_result
-        else:
-            return {"interactive_feedback": "Error: No feedback file generated"}
-    
+
+        if interface_type == "web" and use_inprocess_web():
+            try:
+                return await launch_feedback_web_inprocess_async(summary, predefinedOptions, questions)
+            except OSError as e:
+                print(f"⚠️ In-process web server unavailable ({e}), using subprocess", file=sys.stderr, flush=True)
+
+        if interface_type == "gui" and use_gui_daemon():
+            try:
+                return await launch_feedback_gui_daemon_async(script_path, summary, predefinedOptions, questions)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ GUI feedback daemon unavailable ({e}), using subprocess", file=sys.stderr, flush=True)
+
+        cmd = build_feedback_command(script_path)
+
+        print(f"🚀 Launching {interface_type} feedback interface...", file=sys.stderr, flush=True)
+
+        started = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            *cmd, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            env=child_env(timeout),
+        )
+        report_timing("spawn", started, backend=f"{interface_type}-subprocess")
+        started = time.perf_counter()
+        # Drain stderr alongside the frames so a chatty child can't block on a full pipe
+        stderr_task = asyncio.ensure_future(process.stderr.read())
+        try:
+            process.stdin.write(encode_request(summary, predefinedOptions, questions))
+            await process.stdin.drain()
+            process.stdin.close()
+        except (BrokenPipeError, ConnectionResetError):
+            # The child died before reading its question; its stderr says why
+            pass
+        try:
+            while (frame := await read_frame(process.stdout)) is not None:
+                result = frame_result(frame)
+                if result is not None:
+                    # Return right away; the child finishes shutting down on its own
+                    answered = True
+                    return result
+                if frame.get("stage") == "finished":
+                    # Sent just before the result: is the child's feedback page still open?
+                    _web_tab_open = bool(frame.get("tab_open"))
+                    continue
+                if frame.get("stage") == "waiting":
+                    # Child is up and its interface is ready to answer
+                    report_timing("bind", started, **({"url": frame["url"]} if frame.get("url") else {}))
+                log_progress(frame)
+        except FrameError as e:
+            print(f"⚠️ Bad frame from feedback process: {e}", file=sys.stderr, flush=True)
+
+        await process.wait()
+        return feedback_failed(process.returncode, (await stderr_task).decode('utf-8', errors='replace'))
+
     except Exception as e:
-        print(f"❌ Error in launch_feedback_ui: {e}", flush=True)
+        print(f"❌ Error in launch_feedback_ui_async: {e}", file=sys.stderr, flush=True)
         return {"interactive_feedback": f"Error: {str(e)}"}
-    
+
     finally:
-        # Clean up temporary file
-        if os.path.exists(output_file):
-            try:
-                os.unlink(output_file)
-            except:
-                pass
+        # Don't leave the child behind if we were cancelled while waiting
+        if process is not None and process.returncode is None and not answered:
+            process.kill()
+            # Reap it now, so its port and pipes are released before a cancel completes
+            await asyncio.shield(process.wait())
+        if stderr_task is not None and not answered:
+            stderr_task.cancel()
 
 @mcp.tool()
-def interactive_feedback(
+async def interactive_feedback(
     message: str = Field(description="The specific question for the user"),
     predefined_options: list = Field(default=None, description="Predefined options for the user to choose from (optional)"),
+    timeout_seconds: Optional[float] = Field(default=None, description="Seconds to wait for the answer before giving up with an empty answer (optional, default 300)"),
+    ctx: Optional[Context] = None,
 ) -> Dict[str, str]:
     """Request interactive feedback from the user"""
-    predefined_options_list = predefined_options if isinstance(predefined_options, list) else None
-    return launch_feedback_ui(message, predefined_options_list)
+    # Options travel as a JSON list end to end; coerce stray numbers etc. to text
+    predefined_options_list = [str(option) for option in predefined_options] if isinstance(predefined_options, list) else None
+    timeout = feedback_timeout(timeout_seconds)
+    session_id = shared_session(ctx)
+    start_call(client_label(ctx, session_id))
+    started = time.perf_counter()
+    if answer_cache.enabled:
+        waiter = ask_with_answer_cache(message, predefined_options_list, timeout, scope=session_id)
+    else:
+        waiter = launch_feedback_ui_async(message, predefined_options_list, timeout=timeout)
+    result = await wait_with_progress(ctx, waiter, timeout)
+    report_call("interactive_feedback", started, result,
+                [{"prompt": message, "predefined_options": predefined_options_list or []}])
+    return result
+
+async def ask_with_answer_cache(message: str, predefined_options: Optional[List[str]] = None,
+                                timeout: Optional[float] = None, scope: Optional[str] = None) -> Dict[str, str]:
+    """Answer a repeated question from the cache (auto) or offer the previous answer (suggest).
+
+    scope keeps the answers of each client of a shared server apart (see shared_session).
+    """
+    started = time.perf_counter()
+    previous = answer_cache.get(message, predefined_options, scope)
+    stats = answer_cache.stats()
+    print(f"🗂️  Answer cache {'hit' if previous is not None else 'miss'}: "
+          f"{stats['hits']}/{stats['lookups']} hits ({stats['hit_rate']:.0%})", file=sys.stderr, flush=True)
+
+    if previous is not None and answer_cache.mode == 'auto':
+        report_timing("cache", started, outcome="hit")
+        return {"interactive_feedback": previous}
+
+    if previous is None:
+        result = await launch_feedback_ui_async(message, predefined_options, timeout=timeout)
+    else:
+        # The previous answer is one click away, ahead of the question's own options
+        option = reuse_option(previous)
+        result = await launch_feedback_ui_async(message, [option] + (predefined_options or []), timeout=timeout)
+        feedback, reused = resolve_reuse(result.get("interactive_feedback", ""), option, previous)
+        if reused:
+            answer_cache.record_reuse()
+        result = dict(result, interactive_feedback=feedback)
+
+    answer_cache.put(message, predefined_options, result.get("interactive_feedback", ""), scope)
+    return result
+
+class BatchQuestion(BaseModel):
+    message: str = Field(description="The question for the user")
+    predefined_options: Optional[List[str]] = Field(default=None, description="Predefined options for this question (optional)")
+
+def batch_answers(questions: List[Dict[str, Any]], result: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape a backend result as one answer per question, however the backend ended."""
+    answers = result.get("answers")
+    if isinstance(answers, list) and len(answers) == len(questions):
+        return result
+    # Timeout, closed window or error: every answer is empty, and the error is kept
+    batch = {"answers": [{"message": q["prompt"], "interactive_feedback": ""} for q in questions]}
+    error = result.get("interactive_feedback", "")
+    if error:
+        batch["error"] = error
+    if "status" in result:
+        batch["status"] = result["status"]
+    return batch
+
+@mcp.tool()
+async def interactive_feedback_batch(
+    questions: List[BatchQuestion] = Field(description="Questions to ask together; the user answers them all on one page"),
+    timeout_seconds: Optional[float] = Field(default=None, description="Seconds to wait for the answers before giving up with empty answers (optional, default 300)"),
+    ctx: Optional[Context] = None,
+) -> Dict[str, Any]:
+    """Ask the user several questions at once and get one answer per question, in order"""
+    batch = [{"prompt": q.message, "predefined_options": list(q.predefined_options or [])}
+             for q in questions]
+    if not batch:
+        return {"answers": []}
+    timeout = feedback_timeout(timeout_seconds)
+    start_call(client_label(ctx, shared_session(ctx)))
+    started = time.perf_counter()
+    # The first message stands in as the summary shown in queues and window titles
+    waiter = launch_feedback_ui_async(batch[0]["prompt"], None, batch, timeout=timeout)
+    result = batch_answers(batch, await wait_with_progress(ctx, waiter, timeout))
+    report_call("interactive_feedback_batch", started, result, batch)
+    return result
+
+def warm_up_backends():
+    """Start the feedback backend ahead of the first question."""
+    script_path, interface_type = select_feedback_interface()
+    # Start the shared web feedback server up front so the first question doesn't pay for it
+    if interface_type == "web" and use_inprocess_web():
+        try:
+            get_feedback_server()
+        except OSError as e:
+            print(f"⚠️ Could not start in-process web feedback server: {e}", file=sys.stderr, flush=True)
+    # Likewise warm up the Qt daemon when questions will be shown in the GUI
+    elif interface_type == "gui" and use_gui_daemon():
+        try:
+            ensure_gui_daemon(script_path)
+        except OSError as e:
+            print(f"⚠️ Could not start GUI feedback daemon: {e}", file=sys.stderr, flush=True)
+
+# MCP transports: stdio (one server per client, the default), or streamable HTTP / SSE,
+# where one long-running server answers the questions of every IDE window pointed at it
+TRANSPORTS = ("stdio", "http", "sse")
+DEFAULT_MCP_HOST = "127.0.0.1"
+# Outside the feedback page's ports (8765, falling back up to 8774), which the
+# warm-up thread may bind before the transport does
+DEFAULT_MCP_PORT = 8780
+
+# Host names that always reach this machine; a DNS rebinding page can't make its
+# own domain look like one of these
+LOCAL_HOSTNAMES = ("localhost", "127.0.0.1", "[::1]")
+# Listening on these accepts connections for any address, so any Host can be legitimate
+WILDCARD_HOSTS = ("", "0.0.0.0", "::", "[::]")
+
+def host_port(authority: str) -> tuple[str, Optional[int]]:
+    """Split a Host header (or an Origin without its scheme) into a lower-case host and port."""
+    host, _, port = authority.strip().lower().rpartition(":")
+    if not host or not port.isdigit():
+        # No port, or a bare IPv6 address such as [::1]
+        return authority.strip().lower(), None
+    return host, int(port)
+
+class LocalOriginGuard:
+    """ASGI middleware that blocks DNS rebinding on the shared HTTP / SSE transport.
+
+    A web page can point its own domain at 127.0.0.1 and then call this server as
+    a same-origin peer. Requests must therefore name this server in Host, and
+    browser requests (the ones that carry Origin) must come from one of its hosts.
+    Rejected requests get 403 before they reach the MCP session manager.
+    """
+
+    def __init__(self, app, host: str, port: int):
+        self.app = app
+        self.port = port
+        self.check_host = host.lower() not in WILDCARD_HOSTS
+        bracketed = f"[{host}]" if ":" in host and not host.startswith("[") else host
+        self.hosts = set(LOCAL_HOSTNAMES) | {bracketed.lower()}
+
+    def host_allowed(self, authority: str) -> bool:
+        host, port = host_port(authority)
+        return host in self.hosts and (port or 80) == self.port
+
+    def origin_allowed(self, origin: str, authority: str) -> bool:
+        scheme, _, rest = origin.partition("://")
+        if scheme not in ("http", "https"):
+            return False
+        if self.check_host:
+            return self.host_allowed(rest)
+        # Listening on every address: only the page's own origin may call
+        return host_port(rest) == host_port(authority)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            headers = {name.decode("latin-1"): value.decode("latin-1") for name, value in scope["headers"]}
+            authority = headers.get("host", "")
+            allowed = not self.check_host or self.host_allowed(authority)
+            if allowed and "origin" in headers:
+                allowed = self.origin_allowed(headers["origin"], authority)
+            if not allowed:
+                await send({"type": "http.response.start", "status": 403,
+                            "headers": [(b"content-type", b"text/plain"), (b"content-length", b"9")]})
+                await send({"type": "http.response.body", "body": b"Forbidden"})
+                return
+        await self.app(scope, receive, send)
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Interactive Feedback MCP server")
+    parser.add_argument("--transport", choices=TRANSPORTS,
+                        default=os.environ.get("INTERACTIVE_FEEDBACK_TRANSPORT", "stdio").strip().lower() or "stdio",
+                        help="stdio (default), or http / sse to share one server between many MCP clients")
+    parser.add_argument("--host", default=os.environ.get("INTERACTIVE_FEEDBACK_MCP_HOST", DEFAULT_MCP_HOST),
+                        help=f"Address the HTTP / SSE transport listens on (default {DEFAULT_MCP_HOST})")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("INTERACTIVE_FEEDBACK_MCP_PORT", DEFAULT_MCP_PORT)),
+                        help=f"Port of the HTTP / SSE transport (default {DEFAULT_MCP_PORT})")
+    parser.add_argument("--path", default=None,
+                        help="Endpoint path of the HTTP / SSE transport (default /mcp, or /sse for sse)")
+    return parser.parse_args(argv)
+
+def run(args: argparse.Namespace):
+    if args.transport == "stdio":
+        mcp.run(transport="stdio")
+        return
+    path = args.path or ("/sse" if args.transport == "sse" else "/mcp")
+    print(f"🔌 Serving MCP over {args.transport} at http://{args.host}:{args.port}{path}", file=sys.stderr, flush=True)
+    from starlette.middleware import Middleware
+    guard = Middleware(LocalOriginGuard, host=args.host, port=args.port)
+    # Stateful sessions: progress notifications and cancellation travel on each client's stream
+    mcp.run(transport=args.transport, host=args.host, port=args.port, path=path, middleware=[guard])
 
 if __name__ == "__main__":
-    # Run with stdio transport
-    mcp.run(transport="stdio")
+    args = parse_args()
+    # Warm up in the background so the MCP handshake isn't held up by it
+    threading.Thread(target=warm_up_backends, name="warm-up-backends", daemon=True).start()
+    run(args)
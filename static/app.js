@@ -0,0 +1,761 @@
+// Interactive Feedback 页面脚本
+// 页面外壳是静态的（可缓存），问题内容通过 /api/sessions 以 JSON 获取，
+// 新问题通过 /events（Server-Sent Events）推送到已打开的页面。
+(function() {
+    'use strict';
+
+    let currentView = null;
+    let currentSessionId = null;
+    // 已经提示过“已结束”的问题，避免随后的 session_closed 覆盖结束原因
+    let endedSessionId = null;
+    // 本页面的标识：服务端据此知道哪个问题正被显示，页面关闭后尽早结束该问题
+    const clientId = (window.crypto && crypto.randomUUID) ? crypto.randomUUID() :
+        Date.now().toString(36) + '-' + Math.random().toString(36).slice(2);
+    let maxBodySize = 0;
+    // 已上传的附件（服务端返回的描述）和仍在上传中的请求
+    let attachments = [];
+    let pendingUploads = [];
+
+    function $(id) {
+        return document.getElementById(id);
+    }
+
+    function showView(name) {
+        document.querySelectorAll('.view').forEach(function(view) {
+            view.classList.toggle('active', view.id === name);
+        });
+        currentView = name;
+    }
+
+    function showNotice(html) {
+        const notice = $('notice');
+        notice.innerHTML = html;
+        notice.style.display = 'block';
+    }
+
+    // ---------- 路由 ----------
+
+    function sessionIdFromPath(path) {
+        const match = path.match(/^\/s\/([0-9a-f]+)\/?$/);
+        return match ? match[1] : null;
+    }
+
+    function route() {
+        const sessionId = sessionIdFromPath(window.location.pathname);
+        if (sessionId) {
+            loadQuestion(sessionId);
+        } else {
+            loadQueue();
+        }
+    }
+
+    function navigate(path) {
+        window.history.pushState(null, '', path);
+        route();
+    }
+
+    // ---------- 问题队列 ----------
+
+    function renderQueue(sessions) {
+        const queue = $('queue');
+        document.title = sessions.length ? '(' + sessions.length + ') Interactive Feedback' : 'Interactive Feedback';
+        if (!sessions.length) {
+            queue.innerHTML = '<div class="empty">暂无待回答的问题</div>';
+            return;
+        }
+        queue.innerHTML = '';
+        sessions.forEach(function(session) {
+            const link = document.createElement('a');
+            link.className = 'question';
+            link.href = '/s/' + session.id + '/';
+            link.addEventListener('click', function(e) {
+                e.preventDefault();
+                navigate(link.getAttribute('href'));
+            });
+            const preview = document.createElement('div');
+            preview.className = 'preview';
+            preview.textContent = session.preview;
+            const meta = document.createElement('div');
+            meta.className = 'meta';
+            const created = new Date(session.created_at * 1000).toLocaleTimeString();
+            // 多个 IDE 共用一个服务器时标出提问的客户端
+            meta.textContent = created + (session.client ? ' · ' + session.client : '') +
+                (session.questions > 1 ? ' · ' + session.questions + ' 个问题' : '') +
+                (session.options ? ' · ' + session.options + ' 个选项' : '');
+            link.appendChild(preview);
+            link.appendChild(meta);
+            queue.appendChild(link);
+        });
+    }
+
+    function refreshQueue() {
+        fetch('/api/sessions?client=' + clientId)
+            .then(function(response) { return response.json(); })
+            .then(renderQueue)
+            .catch(function(error) { console.warn('刷新问题队列失败:', error); });
+    }
+
+    function loadQueue() {
+        currentSessionId = null;
+        showView('queueView');
+        refreshQueue();
+    }
+
+    // ---------- 单个问题 ----------
+
+    // 渲染 Markdown 内容；服务端已渲染（并清理）过时直接使用其结果
+    function renderMarkdown(promptContainer, promptText, renderedHtml) {
+
+        if (renderedHtml !== undefined) {
+            promptContainer.innerHTML = '<strong>提示：</strong><br>' + renderedHtml;
+            return;
+        }
+
+        // 先显示原始内容作为备用
+        promptContainer.innerHTML = '<strong>提示：</strong> ';
+        const fallback = document.createElement('span');
+        fallback.style.whiteSpace = 'pre-wrap';
+        fallback.textContent = promptText;
+        promptContainer.appendChild(fallback);
+
+        // 使用随项目分发的渲染器（static/markdown.js）解析 Markdown
+        if (typeof FeedbackMarkdown !== 'undefined') {
+            try {
+                const htmlContent = FeedbackMarkdown.parse(promptText);
+                promptContainer.innerHTML = '<strong>提示：</strong><br>' + htmlContent;
+            } catch (error) {
+                console.warn('Markdown parsing failed:', error);
+                // 保持原始文本显示
+            }
+        } else {
+            console.warn('Markdown 渲染器未加载，使用原始文本显示');
+        }
+    }
+
+    // 大提示分块流式获取，边接收边渲染，首屏不必等待全部内容
+    function streamPrompt(url, sessionId) {
+        const promptContainer = $('promptContent');
+        promptContainer.innerHTML = '<strong>提示：</strong><br>';
+        const target = document.createElement('div');
+        promptContainer.appendChild(target);
+
+        let stream;
+        if (typeof FeedbackMarkdown !== 'undefined') {
+            stream = FeedbackMarkdown.createStream(target);
+        } else {
+            // 渲染器未加载时按原始文本追加
+            target.style.whiteSpace = 'pre-wrap';
+            stream = {
+                push: function(text) { target.appendChild(document.createTextNode(text)); },
+                end: function() {}
+            };
+        }
+
+        fetch(url)
+            .then(function(response) {
+                if (!response.ok || !response.body) {
+                    throw new Error('HTTP ' + response.status);
+                }
+                const reader = response.body.getReader();
+                const decoder = new TextDecoder();
+                function pump() {
+                    return reader.read().then(function(result) {
+                        if (sessionId !== currentSessionId) {
+                            // 已切换到其他问题，不再继续接收
+                            reader.cancel();
+                            return;
+                        }
+                        if (result.done) {
+                            stream.push(decoder.decode());
+                            stream.end();
+                            return;
+                        }
+                        stream.push(decoder.decode(result.value, { stream: true }));
+                        return pump();
+                    });
+                }
+                return pump();
+            })
+            .catch(function(error) {
+                console.warn('获取提示内容失败:', error);
+                showNotice('❌ 提示内容加载失败，请刷新页面重试');
+            });
+    }
+
+    // ---------- 选项列表 ----------
+    // 选项可能多达上万个（文件名、测试名等），只渲染滚动窗口内的几十行，
+    // 勾选状态按原始下标保存在 Set 中，与 DOM 无关
+
+    const OPTION_ROW_HEIGHT = 30;
+    const OPTION_VISIBLE_ROWS = 12;
+    const OPTION_OVERSCAN = 6;
+    const OPTION_FILTER_MIN = 10;
+
+    // 单个问题时只有一个列表；批量提问时每个问题一个，prefix 为字段名前缀（如 "q2."）
+    let optionLists = [];
+
+    function createOptionList(container, options, prefix) {
+        container.innerHTML = '';
+        if (!options.length) {
+            return null;
+        }
+        const title = document.createElement('h3');
+        title.textContent = '可选选项：';
+        container.appendChild(title);
+
+        const list = {
+            prefix: prefix,
+            options: options,
+            lowered: null,
+            selected: new Set(),
+            visible: options.map(function(_, i) { return i; }),
+            viewport: document.createElement('div'),
+            spacer: document.createElement('div'),
+            rows: document.createElement('div'),
+            count: document.createElement('div')
+        };
+
+        if (options.length >= OPTION_FILTER_MIN) {
+            const filter = document.createElement('input');
+            filter.type = 'search';
+            filter.className = 'option-filter';
+            filter.placeholder = '筛选 ' + options.length + ' 个选项...';
+            filter.addEventListener('input', function() {
+                filterOptions(list, filter.value);
+            });
+            // 在筛选框里回车不应提交表单
+            filter.addEventListener('keydown', function(e) {
+                if (e.key === 'Enter') {
+                    e.preventDefault();
+                }
+            });
+            container.appendChild(filter);
+        }
+
+        list.viewport.className = 'option-list';
+        list.spacer.className = 'option-spacer';
+        list.rows.className = 'option-rows';
+        list.count.className = 'option-count';
+        list.spacer.appendChild(list.rows);
+        list.viewport.appendChild(list.spacer);
+        container.appendChild(list.viewport);
+        container.appendChild(list.count);
+
+        list.viewport.addEventListener('scroll', function() {
+            window.requestAnimationFrame(function() { renderOptionRows(list); });
+        });
+        list.rows.addEventListener('change', function(e) {
+            const index = Number(e.target.dataset.index);
+            if (e.target.checked) {
+                list.selected.add(index);
+            } else {
+                list.selected.delete(index);
+            }
+            updateOptionCount(list);
+        });
+
+        layoutOptions(list);
+        return list;
+    }
+
+    function renderOptions(options) {
+        const list = createOptionList($('options'), options, '');
+        optionLists = list ? [list] : [];
+    }
+
+    function filterOptions(list, query) {
+        const needle = query.trim().toLowerCase();
+        if (!needle) {
+            list.visible = list.options.map(function(_, i) { return i; });
+        } else {
+            if (!list.lowered) {
+                list.lowered = list.options.map(function(option) { return option.toLowerCase(); });
+            }
+            list.visible = [];
+            list.lowered.forEach(function(option, i) {
+                if (option.indexOf(needle) !== -1) {
+                    list.visible.push(i);
+                }
+            });
+        }
+        list.viewport.scrollTop = 0;
+        layoutOptions(list);
+    }
+
+    function layoutOptions(list) {
+        const rows = Math.max(1, Math.min(list.visible.length, OPTION_VISIBLE_ROWS));
+        list.viewport.style.height = rows * OPTION_ROW_HEIGHT + 'px';
+        list.spacer.style.height = list.visible.length * OPTION_ROW_HEIGHT + 'px';
+        renderOptionRows(list);
+        updateOptionCount(list);
+    }
+
+    function renderOptionRows(list) {
+        const first = Math.max(0, Math.floor(list.viewport.scrollTop / OPTION_ROW_HEIGHT) - OPTION_OVERSCAN);
+        const last = Math.min(list.visible.length, first + OPTION_VISIBLE_ROWS + 2 * OPTION_OVERSCAN);
+        const fragment = document.createDocumentFragment();
+        for (let row = first; row < last; row++) {
+            const index = list.visible[row];
+            const label = document.createElement('label');
+            const checkbox = document.createElement('input');
+            checkbox.type = 'checkbox';
+            checkbox.dataset.index = index;
+            checkbox.checked = list.selected.has(index);
+            label.title = list.options[index];
+            label.appendChild(checkbox);
+            label.appendChild(document.createTextNode(' ' + list.options[index]));
+            fragment.appendChild(label);
+        }
+        list.rows.style.transform = 'translateY(' + first * OPTION_ROW_HEIGHT + 'px)';
+        list.rows.replaceChildren(fragment);
+    }
+
+    function updateOptionCount(list) {
+        const parts = [];
+        if (list.visible.length !== list.options.length) {
+            parts.push('显示 ' + list.visible.length + ' / ' + list.options.length);
+        }
+        if (list.selected.size) {
+            parts.push('已选 ' + list.selected.size + ' 项');
+        }
+        list.count.textContent = parts.join(' · ');
+    }
+
+    function clearOptions() {
+        optionLists.forEach(function(list) {
+            list.selected.clear();
+            renderOptionRows(list);
+            updateOptionCount(list);
+        });
+    }
+
+    // ---------- 附件 ----------
+    // 选择后立即上传到 /s/<id>/attachments，服务端按内容哈希存储并返回附件 ID；
+    // 预览直接引用 /attachments/<id>，提交时只带 ID
+
+    function uploadAttachments(files) {
+        const sessionId = currentSessionId;
+        files = Array.from(files);
+        if (!sessionId || !files.length) {
+            return;
+        }
+        const total = files.reduce(function(sum, file) { return sum + file.size; }, 0);
+        if (maxBodySize && total > maxBodySize) {
+            showTooLarge();
+            return;
+        }
+        const body = new FormData();
+        files.forEach(function(file) {
+            body.append('file', file, file.name || 'screenshot.png');
+        });
+        const upload = fetch('/s/' + sessionId + '/attachments', { method: 'POST', body: body })
+            .then(function(response) {
+                if (response.status === 413) {
+                    showTooLarge();
+                    return null;
+                }
+                if (!response.ok) {
+                    throw new Error('HTTP ' + response.status);
+                }
+                return response.json();
+            })
+            .then(function(result) {
+                if (!result || sessionId !== currentSessionId) {
+                    return;
+                }
+                result.attachments.forEach(function(attachment) {
+                    if (!attachments.some(function(a) { return a.id === attachment.id; })) {
+                        attachments.push(attachment);
+                    }
+                });
+            })
+            .catch(function(error) {
+                console.warn('附件上传失败:', error);
+                showNotice('❌ 附件上传失败，请重试');
+            })
+            .then(function() {
+                pendingUploads = pendingUploads.filter(function(p) { return p !== upload; });
+                renderAttachments();
+            });
+        pendingUploads.push(upload);
+        renderAttachments();
+    }
+
+    function renderAttachments() {
+        const list = $('attachmentList');
+        list.textContent = '';
+        attachments.forEach(function(attachment, i) {
+            const item = document.createElement('div');
+            item.className = 'attachment';
+            if (attachment.preview) {
+                const image = document.createElement('img');
+                image.src = attachment.url;
+                image.alt = attachment.name;
+                image.loading = 'lazy';
+                item.appendChild(image);
+            }
+            const link = document.createElement('a');
+            link.href = attachment.url;
+            link.target = '_blank';
+            link.textContent = attachment.name + '（' + formatSize(attachment.size) + '）';
+            item.appendChild(link);
+            const remove = document.createElement('button');
+            remove.type = 'button';
+            remove.className = 'attachment-remove';
+            remove.textContent = '✕';
+            remove.title = '移除附件';
+            remove.addEventListener('click', function() {
+                attachments.splice(i, 1);
+                renderAttachments();
+            });
+            item.appendChild(remove);
+            list.appendChild(item);
+        });
+        if (pendingUploads.length) {
+            const uploading = document.createElement('div');
+            uploading.className = 'attachment-uploading';
+            uploading.textContent = '⏳ 正在上传附件...';
+            list.appendChild(uploading);
+        }
+    }
+
+    function clearAttachments() {
+        attachments = [];
+        pendingUploads = [];
+        renderAttachments();
+    }
+
+    function formatSize(bytes) {
+        if (bytes < 1024) {
+            return bytes + ' B';
+        }
+        if (bytes < 1024 * 1024) {
+            return (bytes / 1024).toFixed(1) + ' KB';
+        }
+        return (bytes / 1024 / 1024).toFixed(1) + ' MB';
+    }
+
+    // 批量提问：每个问题一个区块（提示、选项、反馈框），整页一次提交
+    function renderBatch(questions) {
+        const container = $('batchQuestions');
+        container.innerHTML = '';
+        optionLists = [];
+        questions.forEach(function(question, j) {
+            const block = document.createElement('div');
+            block.className = 'batch-question';
+            const title = document.createElement('h3');
+            title.textContent = '问题 ' + (j + 1) + ' / ' + questions.length;
+            const prompt = document.createElement('div');
+            prompt.className = 'prompt';
+            const content = document.createElement('div');
+            prompt.appendChild(content);
+            renderMarkdown(content, question.prompt, question.html);
+            const options = document.createElement('div');
+            const textarea = document.createElement('textarea');
+            textarea.name = 'q' + j + '.feedback_text';
+            textarea.placeholder = '您对此问题的反馈...';
+            block.appendChild(title);
+            block.appendChild(prompt);
+            block.appendChild(options);
+            block.appendChild(textarea);
+            container.appendChild(block);
+            const list = createOptionList(options, question.options, 'q' + j + '.');
+            if (list) {
+                optionLists.push(list);
+            }
+        });
+    }
+
+    function renderQuestion(session) {
+        currentSessionId = session.id;
+        maxBodySize = session.max_body_size || 0;
+        clearAttachments();
+        $('feedbackForm').reset();
+        $('notice').style.display = 'none';
+        $('questionClient').textContent = session.client ? '来自 ' + session.client : '';
+        $('questionClient').style.display = session.client ? '' : 'none';
+        const batch = Boolean(session.questions);
+        $('promptContainer').style.display = batch ? 'none' : '';
+        $('singleQuestion').style.display = batch ? 'none' : '';
+        // 隐藏的单问题输入框不参与提交
+        $('singleQuestion').querySelector('textarea').disabled = batch;
+        if (batch) {
+            renderBatch(session.questions);
+        } else {
+            $('batchQuestions').innerHTML = '';
+            if (session.prompt_url) {
+                streamPrompt(session.prompt_url, session.id);
+            } else {
+                renderMarkdown($('promptContent'), session.prompt, session.html);
+            }
+            renderOptions(session.options);
+        }
+        document.title = batch ? '(' + session.questions.length + ') Interactive Feedback' : 'Interactive Feedback';
+        showView('questionView');
+    }
+
+    function loadQuestion(sessionId) {
+        fetch('/api/sessions/' + sessionId + '?client=' + clientId)
+            .then(function(response) {
+                if (!response.ok) {
+                    throw new Error('HTTP ' + response.status);
+                }
+                return response.json();
+            })
+            .then(renderQuestion)
+            .catch(function() {
+                currentSessionId = null;
+                showView('missingView');
+            });
+    }
+
+    function submitFeedback() {
+        const sessionId = currentSessionId;
+        if (!sessionId) {
+            return;
+        }
+        if (pendingUploads.length) {
+            // 附件还在上传，等上传结束后再提交
+            showNotice('⏳ 正在等待附件上传完成...');
+            Promise.all(pendingUploads).then(function() {
+                if (sessionId === currentSessionId) {
+                    $('notice').style.display = 'none';
+                    submitFeedback();
+                }
+            });
+            return;
+        }
+        const body = new URLSearchParams(new FormData($('feedbackForm')));
+        optionLists.forEach(function(list) {
+            // 按原始下标提交，与筛选和滚动位置无关
+            Array.from(list.selected).sort(function(a, b) { return a - b; }).forEach(function(index) {
+                body.append(list.prefix + 'option_' + index, '1');
+            });
+        });
+        attachments.forEach(function(attachment) {
+            body.append('attachment', attachment.id);
+        });
+        if (maxBodySize && new Blob([body.toString()]).size > maxBodySize) {
+            showTooLarge();
+            return;
+        }
+        fetch('/s/' + sessionId + '/submit', { method: 'POST', body: body })
+            .then(function(response) {
+                if (response.status === 413) {
+                    showTooLarge();
+                    return null;
+                }
+                if (!response.ok) {
+                    throw new Error('HTTP ' + response.status);
+                }
+                return response.json();
+            })
+            .then(function(result) {
+                if (!result) {
+                    return;
+                }
+                window.history.replaceState(null, '', '/');
+                showSuccess(result.pending);
+            })
+            .catch(function(error) {
+                console.warn('提交失败:', error);
+                showNotice('❌ 提交失败，此问题可能已结束');
+            });
+    }
+
+    function showTooLarge() {
+        const limit = (maxBodySize / 1024 / 1024).toFixed(0);
+        showNotice('❌ 反馈内容过大' + (maxBodySize ? '（上限 ' + limit + ' MB）' : '') + '，请精简后再提交');
+    }
+
+    function submitEmpty() {
+        if (confirm('确定要取消吗？这将提交空反馈。')) {
+            // 清空所有输入
+            $('feedbackForm').reset();
+            clearOptions();
+            clearAttachments();
+            submitFeedback();
+        }
+    }
+
+    // ---------- 提交成功 ----------
+
+    function showSuccess(pending) {
+        currentSessionId = null;
+        const note = $('queueNote');
+        if (pending) {
+            note.innerHTML = '还有 <strong>' + pending + '</strong> 个问题等待回答，<a href="/">返回问题队列</a>';
+        } else {
+            note.innerHTML = '';
+        }
+        document.title = '反馈已提交';
+        showView('successView');
+    }
+
+    // ---------- 推送 ----------
+
+    function subscribeEvents(handlers, onReconnect, resubscribed) {
+        if (typeof EventSource === 'undefined') {
+            return;
+        }
+        let connected = Boolean(resubscribed);
+        const source = new EventSource('/events?client=' + clientId);
+        Object.keys(handlers).forEach(function(name) {
+            source.addEventListener(name, function(event) {
+                handlers[name](JSON.parse(event.data));
+            });
+        });
+        source.addEventListener('open', function() {
+            if (connected) {
+                onReconnect();
+            }
+            connected = true;
+        });
+        source.addEventListener('error', function() {
+            // 服务器重启（端口固定，地址不变）时浏览器可能放弃重连，这里自己重新订阅
+            if (source.readyState === EventSource.CLOSED) {
+                setTimeout(function() {
+                    subscribeEvents(handlers, onReconnect, true);
+                }, 1000);
+            }
+        });
+    }
+
+    // 重连后补上断线期间错过的变化；服务器可能已经换了一个进程，当前问题也许已不存在
+    function onReconnect() {
+        if (currentView === 'queueView') {
+            refreshQueue();
+        } else if (currentView === 'questionView' && currentSessionId) {
+            const sessionId = currentSessionId;
+            fetch('/api/sessions/' + sessionId + '?client=' + clientId)
+                .then(function(response) {
+                    if (response.status === 404 && sessionId === currentSessionId) {
+                        showEnded(null);
+                    }
+                })
+                .catch(function() {});
+        }
+    }
+
+    function onSessionCreated(session) {
+        if (currentView === 'successView' || currentView === 'missingView') {
+            // 保持此页面打开时，下一个问题会直接显示在这里
+            navigate('/s/' + session.id + '/');
+        } else if (currentView === 'queueView') {
+            refreshQueue();
+        } else if (currentView === 'questionView') {
+            // 正在回答时不跳转，只提示有新问题
+            showNotice('📨 有新的问题等待回答，<a href="/">查看问题队列</a>');
+        }
+    }
+
+    // 问题结束的原因：answered（在其他页面回答了）、dismissed（显示它的页面都关了）、
+    // closed（超时或调用被取消）；重连后才发现问题不在了时原因未知
+    const END_NOTICES = {
+        answered: '✅ 此问题已在其他页面回答，提交将不再生效',
+        dismissed: '🚪 此问题因反馈页面关闭而结束，提交将不再生效',
+        closed: '⏰ 此问题已超时或被撤回，提交将不再生效'
+    };
+
+    function showEnded(reason) {
+        showNotice(END_NOTICES[reason] || '⏰ 此问题已结束（已回答、超时或被撤回），提交将不再生效');
+    }
+
+    function onSessionEnded(session) {
+        if (currentView === 'queueView') {
+            refreshQueue();
+        } else if (currentView === 'questionView' && session.id === currentSessionId && endedSessionId !== session.id) {
+            // 回答后问题还会被关闭一次（session_closed），只显示第一个原因
+            endedSessionId = session.id;
+            showEnded(session.reason);
+        }
+    }
+
+    // 页面加载完成后初始化
+    document.addEventListener('DOMContentLoaded', function() {
+        const form = $('feedbackForm');
+        form.addEventListener('submit', function(e) {
+            e.preventDefault();
+            submitFeedback();
+        });
+        $('cancelButton').addEventListener('click', submitEmpty);
+
+        // 附件：按钮选择、拖放到页面或在输入框中粘贴截图
+        const attachmentInput = $('attachmentInput');
+        $('attachButton').addEventListener('click', function() {
+            attachmentInput.click();
+        });
+        attachmentInput.addEventListener('change', function() {
+            uploadAttachments(attachmentInput.files);
+            attachmentInput.value = '';
+        });
+        const questionView = $('questionView');
+        questionView.addEventListener('dragover', function(e) {
+            if (e.dataTransfer && Array.from(e.dataTransfer.types).indexOf('Files') !== -1) {
+                e.preventDefault();
+                questionView.classList.add('dragging');
+            }
+        });
+        questionView.addEventListener('dragleave', function(e) {
+            if (!questionView.contains(e.relatedTarget)) {
+                questionView.classList.remove('dragging');
+            }
+        });
+        questionView.addEventListener('drop', function(e) {
+            questionView.classList.remove('dragging');
+            if (e.dataTransfer && e.dataTransfer.files.length) {
+                e.preventDefault();
+                uploadAttachments(e.dataTransfer.files);
+            }
+        });
+
+        // 添加Ctrl+Enter快捷键提交反馈（批量提问时每个问题都有输入框，统一在表单上监听）
+        form.addEventListener('keydown', function(e) {
+            if (e.target.tagName === 'TEXTAREA' && e.ctrlKey && e.key === 'Enter') {
+                e.preventDefault();
+                submitFeedback();
+            }
+        });
+        form.addEventListener('paste', function(e) {
+            // 只拦截粘贴的文件（如截图），普通文本照常粘贴
+            if (e.target.tagName === 'TEXTAREA' && e.clipboardData && e.clipboardData.files.length) {
+                e.preventDefault();
+                uploadAttachments(e.clipboardData.files);
+            }
+        });
+
+        // 暂时移除自动聚焦，避免干扰中文输入法
+        // textarea.focus();
+
+        document.addEventListener('click', function(e) {
+            const link = e.target.closest('a[href="/"]');
+            if (link) {
+                e.preventDefault();
+                navigate('/');
+            }
+        });
+        window.addEventListener('popstate', route);
+
+        subscribeEvents({
+            session_created: onSessionCreated,
+            session_completed: onSessionEnded,
+            session_closed: onSessionEnded
+        }, onReconnect);
+
+        // 关闭或离开页面时告诉服务端，不必等事件流断开；刷新后的新页面会重新登记。
+        // 进入往返缓存（persisted）的页面还可能回来，不算离开
+        window.addEventListener('pagehide', function(e) {
+            if (!e.persisted && navigator.sendBeacon) {
+                navigator.sendBeacon('/api/clients/' + clientId + '/gone');
+            }
+        });
+        // 从往返缓存恢复时重新登记正在显示的问题（不重新渲染，保留已输入的内容）
+        window.addEventListener('pageshow', function(e) {
+            if (e.persisted && currentView === 'questionView' && currentSessionId) {
+                fetch('/api/sessions/' + currentSessionId + '?client=' + clientId).catch(function() {});
+            }
+        });
+
+        route();
+    });
+})();
@@ -0,0 +1,413 @@
+// Interactive Feedback 内置 Markdown 渲染器
+// 随项目一起分发，由反馈服务器从内存提供，首次渲染不依赖任何网络资源。
+// 支持标题、段落、强调、行内代码、代码块、引用、列表、表格、分隔线和链接；
+// 所有原始 HTML 都会被转义，链接只允许 http(s)/mailto/相对地址。
+(function(global) {
+    'use strict';
+
+    const FENCE = /^ {0,3}(`{3,}|~{3,})\s*([\w+#.-]*)/;
+    const HEADING = /^ {0,3}(#{1,6})\s+(.*?)(?:\s+#+)?\s*$/;
+    const HR = /^ {0,3}([-*_])(?:\s*\1){2,}\s*$/;
+    const QUOTE = /^ {0,3}> ?/;
+    const LIST_ITEM = /^( *)([-*+]|\d{1,9}[.)])(\s+|$)(.*)$/;
+    const TABLE_DIVIDER = /^\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$/;
+    const INDENTED_CODE = /^(?: {4}|\t)/;
+    // 链接在新标签页打开，当前页面（和它显示的问题）保持不动
+    const LINK_ATTRS = ' target="_blank" rel="noopener noreferrer"';
+
+    function escapeHtml(text) {
+        return text
+            .replace(/&/g, '&amp;')
+            .replace(/</g, '&lt;')
+            .replace(/>/g, '&gt;')
+            .replace(/"/g, '&quot;')
+            .replace(/'/g, '&#39;');
+    }
+
+    function safeUrl(url) {
+        const trimmed = url.trim();
+        if (/^(https?:|mailto:)/i.test(trimmed) || !/^[\w+.-]+:/.test(trimmed)) {
+            return trimmed;
+        }
+        return '#';
+    }
+
+    // ---------- 行内元素 ----------
+
+    function renderInline(text) {
+        const tokens = [];
+        function stash(html) {
+            tokens.push(html);
+            return '\u0000' + (tokens.length - 1) + '\u0000';
+        }
+
+        // 先取出行内代码，避免其中的符号被当作强调或链接
+        let out = text.replace(/(`+)([\s\S]*?[^`])\1(?!`)/g, function(_, ticks, code) {
+            return stash('<code>' + escapeHtml(code.trim()) + '</code>');
+        });
+
+        out = out.replace(/<(https?:\/\/[^\s>]+)>/g, function(_, url) {
+            return stash('<a href="' + escapeHtml(url) + '"' + LINK_ATTRS + '>' + escapeHtml(url) + '</a>');
+        });
+
+        out = escapeHtml(out);
+
+        // 图片按链接显示，避免加载外部资源
+        out = out.replace(/!?\[([^\]]*)\]\(((?:[^()\s]|\([^()\s]*\))+)(?:\s+&quot;[^)]*&quot;)?\)/g, function(_, label, url) {
+            return '<a href="' + safeUrl(url) + '"' + LINK_ATTRS + '>' + label + '</a>';
+        });
+
+        out = out
+            .replace(/(\*\*|__)(?=\S)([\s\S]*?\S)\1/g, '<strong>$2</strong>')
+            .replace(/\*(?=\S)([^*]*?\S)\*/g, '<em>$1</em>')
+            .replace(/(^|[^\w])_(?=\S)([^_]*?\S)_(?!\w)/g, '$1<em>$2</em>')
+            .replace(/~~(?=\S)([\s\S]*?\S)~~/g, '<del>$1</del>')
+            .replace(/ {2,}\n/g, '<br>\n');
+
+        return out.replace(/\u0000(\d+)\u0000/g, function(_, index) {
+            return tokens[Number(index)];
+        });
+    }
+
+    // ---------- 块级元素 ----------
+
+    function isBlockStart(line) {
+        return FENCE.test(line) || HEADING.test(line) || HR.test(line)
+            || QUOTE.test(line) || LIST_ITEM.test(line);
+    }
+
+    function splitRow(line) {
+        let row = line.trim();
+        if (row.startsWith('|')) {
+            row = row.slice(1);
+        }
+        if (row.endsWith('|') && !row.endsWith('\\|')) {
+            row = row.slice(0, -1);
+        }
+        return row.split(/(?<!\\)\|/).map(function(cell) {
+            return cell.trim().replace(/\\\|/g, '|');
+        });
+    }
+
+    function renderTable(header, divider, rows) {
+        const aligns = splitRow(divider).map(function(cell) {
+            if (/^:-+:$/.test(cell)) return 'center';
+            if (/-+:$/.test(cell)) return 'right';
+            if (/^:-+/.test(cell)) return 'left';
+            return null;
+        });
+        function cells(row, tag) {
+            return splitRow(row).map(function(cell, i) {
+                const align = aligns[i] ? ' style="text-align:' + aligns[i] + '"' : '';
+                return '<' + tag + align + '>' + renderInline(cell) + '</' + tag + '>';
+            }).join('');
+        }
+        let html = '<table><thead><tr>' + cells(header, 'th') + '</tr></thead>';
+        if (rows.length) {
+            html += '<tbody>' + rows.map(function(row) {
+                return '<tr>' + cells(row, 'td') + '</tr>';
+            }).join('') + '</tbody>';
+        }
+        return html + '</table>\n';
+    }
+
+    function renderList(lines, start) {
+        const first = lines[start].match(LIST_ITEM);
+        const indent = first[1].length;
+        const ordered = /\d/.test(first[2]);
+        const items = [];
+        let i = start;
+
+        while (i < lines.length) {
+            const match = lines[i].match(LIST_ITEM);
+            if (!match || match[1].length !== indent || /\d/.test(match[2]) !== ordered) {
+                break;
+            }
+            // 续行需要缩进到列表标记之后
+            const contentIndent = indent + match[2].length + Math.max(1, Math.min(match[3].length, 4));
+            const body = [match[4]];
+            i++;
+            while (i < lines.length) {
+                const line = lines[i];
+                if (line.trim() === '') {
+                    const next = lines[i + 1];
+                    if (next !== undefined && next.match(/^ */)[0].length >= contentIndent) {
+                        body.push('');
+                        i++;
+                        continue;
+                    }
+                    break;
+                }
+                const lineIndent = line.match(/^ */)[0].length;
+                if (lineIndent >= contentIndent) {
+                    body.push(line.slice(contentIndent));
+                } else if (lineIndent > indent && !LIST_ITEM.test(line)) {
+                    body.push(line.trim());
+                } else if (!isBlockStart(line) && lineIndent <= indent && body[body.length - 1] !== '') {
+                    // 懒惰续行：属于当前段落
+                    body.push(line.trim());
+                } else if (LIST_ITEM.test(line) && lineIndent > indent) {
+                    body.push(line.slice(Math.min(lineIndent, contentIndent)));
+                } else {
+                    break;
+                }
+                i++;
+            }
+            items.push(body);
+        }
+
+        const tag = ordered ? 'ol' : 'ul';
+        const startNumber = ordered ? parseInt(first[2], 10) : 1;
+        const startAttr = ordered && startNumber !== 1 ? ' start="' + startNumber + '"' : '';
+        const html = items.map(function(body) {
+            const inner = renderBlocks(body);
+            // 紧凑列表项不包 <p>
+            const tight = inner.match(/^<p>([\s\S]*?)<\/p>\n([\s\S]*)$/);
+            return '<li>' + (tight ? tight[1] + (tight[2] ? '\n' + tight[2] : '') : inner) + '</li>';
+        }).join('\n');
+        return { html: '<' + tag + startAttr + '>\n' + html + '\n</' + tag + '>\n', next: i };
+    }
+
+    function renderBlocks(lines) {
+        let html = '';
+        let i = 0;
+
+        while (i < lines.length) {
+            const line = lines[i];
+
+            if (line.trim() === '') {
+                i++;
+                continue;
+            }
+
+            const fence = line.match(FENCE);
+            if (fence) {
+                const marker = fence[1];
+                const code = [];
+                i++;
+                while (i < lines.length && !lines[i].trim().startsWith(marker)) {
+                    code.push(lines[i]);
+                    i++;
+                }
+                i++;
+                const lang = fence[2] ? ' class="language-' + escapeHtml(fence[2]) + '"' : '';
+                html += '<pre><code' + lang + '>' + escapeHtml(code.join('\n')) + '</code></pre>\n';
+                continue;
+            }
+
+            const heading = line.match(HEADING);
+            if (heading) {
+                const level = heading[1].length;
+                html += '<h' + level + '>' + renderInline(heading[2]) + '</h' + level + '>\n';
+                i++;
+                continue;
+            }
+
+            if (HR.test(line)) {
+                html += '<hr>\n';
+                i++;
+                continue;
+            }
+
+            if (QUOTE.test(line)) {
+                const quoted = [];
+                while (i < lines.length && lines[i].trim() !== '') {
+                    quoted.push(lines[i].replace(QUOTE, ''));
+                    i++;
+                }
+                html += '<blockquote>\n' + renderBlocks(quoted) + '</blockquote>\n';
+                continue;
+            }
+
+            if (LIST_ITEM.test(line)) {
+                const list = renderList(lines, i);
+                html += list.html;
+                i = list.next;
+                continue;
+            }
+
+            if (INDENTED_CODE.test(line)) {
+                const code = [];
+                while (i < lines.length && (INDENTED_CODE.test(lines[i]) || lines[i].trim() === '')) {
+                    code.push(lines[i].replace(INDENTED_CODE, ''));
+                    i++;
+                }
+                while (code.length && code[code.length - 1].trim() === '') {
+                    code.pop();
+                }
+                html += '<pre><code>' + escapeHtml(code.join('\n')) + '</code></pre>\n';
+                continue;
+            }
+
+            if (line.includes('|') && i + 1 < lines.length && TABLE_DIVIDER.test(lines[i + 1])
+                    && lines[i + 1].includes('-')) {
+                const header = line;
+                const divider = lines[i + 1];
+                const rows = [];
+                i += 2;
+                while (i < lines.length && lines[i].trim() !== '' && lines[i].includes('|')) {
+                    rows.push(lines[i]);
+                    i++;
+                }
+                html += renderTable(header, divider, rows);
+                continue;
+            }
+
+            // 段落：直到空行或新的块级元素
+            const paragraph = [line.replace(/^\s+/, '')];
+            i++;
+            while (i < lines.length && lines[i].trim() !== '' && !isBlockStart(lines[i])) {
+                const setext = lines[i].match(/^ {0,3}(=+|-+)\s*$/);
+                if (setext) {
+                    break;
+                }
+                paragraph.push(lines[i].replace(/^\s+/, ''));
+                i++;
+            }
+            const setext = i < lines.length ? lines[i].match(/^ {0,3}(=+|-+)\s*$/) : null;
+            if (setext) {
+                const level = setext[1][0] === '=' ? 1 : 2;
+                html += '<h' + level + '>' + renderInline(paragraph.join('\n')) + '</h' + level + '>\n';
+                i++;
+                continue;
+            }
+            html += '<p>' + renderInline(paragraph.join('\n')) + '</p>\n';
+        }
+        return html;
+    }
+
+    function parse(text) {
+        return renderBlocks(String(text).replace(/\r\n?/g, '\n').split('\n'));
+    }
+
+    // ---------- 增量渲染 ----------
+
+    // 没有空行时，积压超过该长度就在行边界处先渲染一部分
+    const STREAM_FORCE_FLUSH = 256 * 1024;
+
+    // 边接收边渲染：完整的段落立即渲染追加到 container，
+    // 代码块逐行以纯文本追加，几 MB 的提示也能很快显示首屏
+    function createStream(container) {
+        let pending = '';
+        // pending 中 [0, scanned) 已确认不含代码块起始行和空行，无需重复扫描
+        let scanned = 0;
+        let carry = '';
+        let code = null;
+        let codeLines = 0;
+        let marker = null;
+
+        function appendHtml(text) {
+            if (text.trim() !== '') {
+                container.insertAdjacentHTML('beforeend', parse(text));
+            }
+        }
+
+        function appendCode(lines) {
+            if (lines.length) {
+                const text = lines.map(function(line, i) { return (codeLines + i ? '\n' : '') + line; }).join('');
+                code.appendChild(document.createTextNode(text));
+                codeLines += lines.length;
+            }
+        }
+
+        function openFence(match) {
+            const pre = document.createElement('pre');
+            code = document.createElement('code');
+            if (match[2]) {
+                code.className = 'language-' + match[2];
+            }
+            codeLines = 0;
+            marker = match[1];
+            pre.appendChild(code);
+            container.appendChild(pre);
+        }
+
+        function completeLines(text, final) {
+            const lines = text.split('\n');
+            if (!final || lines[lines.length - 1] === '') {
+                lines.pop();
+            }
+            return lines;
+        }
+
+        function drain(final) {
+            for (;;) {
+                const end = final ? pending.length : pending.lastIndexOf('\n') + 1;
+
+                if (code) {
+                    // 代码块内：逐行追加，直到遇到结束标记（与 parse 的判断一致）
+                    const lines = completeLines(pending.slice(0, end), final);
+                    const stop = lines.findIndex(function(line) { return line.trim().startsWith(marker); });
+                    if (stop < 0) {
+                        appendCode(lines);
+                        pending = pending.slice(end);
+                        return;
+                    }
+                    appendCode(lines.slice(0, stop));
+                    code = null;
+                    pending = pending.slice(lines.slice(0, stop + 1).join('\n').length + 1);
+                    scanned = 0;
+                    continue;
+                }
+
+                if (end <= scanned) {
+                    return;
+                }
+                let offset = scanned;
+                let lastBlank = -1;
+                for (const line of completeLines(pending.slice(scanned, end), final)) {
+                    const fence = line.match(FENCE);
+                    if (fence) {
+                        appendHtml(pending.slice(0, offset));
+                        openFence(fence);
+                        pending = pending.slice(offset + line.length + 1);
+                        scanned = 0;
+                        lastBlank = -2;
+                        break;
+                    }
+                    if (line.trim() === '') {
+                        lastBlank = offset;
+                    }
+                    offset += line.length + 1;
+                }
+                if (lastBlank === -2) {
+                    continue;
+                }
+
+                if (final) {
+                    appendHtml(pending);
+                    pending = '';
+                } else if (lastBlank >= 0) {
+                    // 在最后一个空行处切分，保证段落、列表、表格完整
+                    appendHtml(pending.slice(0, lastBlank));
+                    pending = pending.slice(lastBlank);
+                    scanned = end - lastBlank;
+                } else if (end >= STREAM_FORCE_FLUSH) {
+                    appendHtml(pending.slice(0, end));
+                    pending = pending.slice(end);
+                    scanned = 0;
+                } else {
+                    scanned = end;
+                }
+                return;
+            }
+        }
+
+        return {
+            push: function(text) {
+                // \r\n 可能被拆在两块之间，末尾的 \r 留到下一块再处理
+                text = carry + text;
+                carry = text.endsWith('\r') ? '\r' : '';
+                pending += text.slice(0, text.length - carry.length).replace(/\r\n?/g, '\n');
+                drain(false);
+            },
+            end: function() {
+                pending += carry ? '\n' : '';
+                carry = '';
+                drain(true);
+            }
+        };
+    }
+
+    global.FeedbackMarkdown = { parse: parse, escapeHtml: escapeHtml, createStream: createStream };
+})(typeof window !== 'undefined' ? window : globalThis);
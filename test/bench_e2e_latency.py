@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+端到端延迟基准测试
+
+通过 stdio 驱动真实的 MCP 服务器（server.py）调用 interactive_feedback，
+由脚本化的 HTTP 客户端自动回答网页表单（GUI 后端经 test/bench_gui_responder.py 启动，
+窗口显示后自动回答），并按阶段统计 p50/p95/p99：
+
+  select     选择反馈后端（服务端计时）
+  spawn      启动/获取后端：子进程启动、常驻服务器或 GUI 守护进程连接（服务端计时）
+  bind       问题就绪：会话注册、子进程绑定端口并发出链接（服务端计时）
+  first_get  首次打开页面：页面外壳 + 问题 JSON（客户端计时，仅 Web）
+  submit     提交表单的往返时间（客户端计时，仅 Web）
+  result     提交完成到 tools/call 响应返回（GUI 后端包含自动回答本身）
+  total      从发送 tools/call 到收到响应
+
+用法：
+  python test/bench_e2e_latency.py --backend inprocess subprocess --iterations 50
+  python test/bench_e2e_latency.py --backend inprocess --max-p95-ms 200   # 超出预算时以非零状态退出
+"""
+
+import argparse
+import json
+import math
+import os
+import queue
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PHASES = ["select", "spawn", "bind", "first_get", "submit", "result", "total"]
+TIMING_PREFIX = "⏱ "
+ANSWER = "bench answer"
+
+# 各后端对应的环境变量
+BACKENDS = {
+    "inprocess": {"INTERACTIVE_FEEDBACK_UI": "web", "INTERACTIVE_FEEDBACK_WEB_MODE": "inprocess"},
+    "subprocess": {"INTERACTIVE_FEEDBACK_UI": "web", "INTERACTIVE_FEEDBACK_WEB_MODE": "subprocess"},
+    "gui": {"INTERACTIVE_FEEDBACK_UI": "gui", "INTERACTIVE_FEEDBACK_GUI_MODE": "daemon"},
+    "gui-subprocess": {"INTERACTIVE_FEEDBACK_UI": "gui", "INTERACTIVE_FEEDBACK_GUI_MODE": "subprocess"},
+}
+
+
+def percentile(values, p):
+    """最近秩法百分位数"""
+    ordered = sorted(values)
+    index = max(0, math.ceil(p / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+class McpClient:
+    """最小化的 stdio JSON-RPC 客户端，同时收集服务端 stderr 上的计时行"""
+
+    def __init__(self, command, env):
+        self.process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            cwd=ROOT, env=env, text=True, encoding="utf-8", bufsize=1,
+        )
+        self.responses = {}
+        self.response_ready = threading.Condition()
+        self.timings = queue.Queue()
+        self.next_id = 0
+        threading.Thread(target=self._read_stdout, daemon=True).start()
+        threading.Thread(target=self._read_stderr, daemon=True).start()
+
+    def _read_stdout(self):
+        for line in self.process.stdout:
+            message = json.loads(line)
+            if "id" in message:
+                with self.response_ready:
+                    self.responses[message["id"]] = message
+                    self.response_ready.notify_all()
+
+    def _read_stderr(self):
+        for line in self.process.stderr:
+            if line.startswith(TIMING_PREFIX):
+                self.timings.put(json.loads(line[len(TIMING_PREFIX):]))
+
+    def send(self, method, params=None, notify=False):
+        message = {"jsonrpc": "2.0", "method": method}
+        if params is not None:
+            message["params"] = params
+        if not notify:
+            self.next_id += 1
+            message["id"] = self.next_id
+        self.process.stdin.write(json.dumps(message) + "\n")
+        self.process.stdin.flush()
+        return message.get("id")
+
+    def wait_response(self, request_id, timeout=60):
+        with self.response_ready:
+            if not self.response_ready.wait_for(lambda: request_id in self.responses, timeout):
+                raise TimeoutError(f"no response to request {request_id}")
+            return self.responses.pop(request_id)
+
+    def initialize(self):
+        request_id = self.send("initialize", {
+            "protocolVersion": "2024-11-05",
+            "capabilities": {},
+            "clientInfo": {"name": "bench-e2e-latency", "version": "1.0.0"},
+        })
+        self.wait_response(request_id)
+        self.send("notifications/initialized", notify=True)
+
+    def close(self):
+        self.process.stdin.close()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+def answer_web_form(url, phases):
+    """模拟浏览器：打开页面、获取问题、提交表单"""
+    session_id = re.search(r"/s/([0-9a-f]+)/", url).group(1)
+    base = url.split("/s/")[0]
+
+    started = time.perf_counter()
+    with urllib.request.urlopen(url, timeout=10) as response:
+        response.read()
+    with urllib.request.urlopen(f"{base}/api/sessions/{session_id}", timeout=10) as response:
+        json.loads(response.read())
+    phases["first_get"] = (time.perf_counter() - started) * 1000
+
+    body = urllib.parse.urlencode({"option_0": "1", "feedback_text": ANSWER}).encode("utf-8")
+    started = time.perf_counter()
+    with urllib.request.urlopen(url + "submit", data=body, timeout=10) as response:
+        response.read()
+    phases["submit"] = (time.perf_counter() - started) * 1000
+
+
+def run_iteration(client, index):
+    phases = {}
+    started = time.perf_counter()
+    request_id = client.send("tools/call", {
+        "name": "interactive_feedback",
+        "arguments": {"message": f"Benchmark question {index}", "predefined_options": ["Yes", "No"]},
+    })
+
+    # 服务端在问题就绪（bind）时报告链接
+    url = None
+    while "bind" not in phases:
+        record = client.timings.get(timeout=30)
+        phases[record["phase"]] = record["ms"]
+        url = record.get("url", url)
+
+    if url:
+        answer_web_form(url, phases)
+    answered = time.perf_counter()
+
+    response = client.wait_response(request_id)
+    finished = time.perf_counter()
+    phases["result"] = (finished - answered) * 1000
+    phases["total"] = (finished - started) * 1000
+
+    if ANSWER not in json.dumps(response, ensure_ascii=False):
+        raise RuntimeError(f"unexpected tool response: {response}")
+    return phases
+
+
+def backend_env(backend, gui_socket):
+    env = dict(os.environ, **BACKENDS[backend])
+    env["INTERACTIVE_FEEDBACK_TIMINGS"] = "1"
+    # 不打开真实浏览器
+    env["BROWSER"] = "true"
+    if backend.startswith("gui"):
+        env.setdefault("QT_QPA_PLATFORM", "offscreen")
+        env.setdefault("DISPLAY", ":0")
+        env["BENCH_GUI_ANSWER"] = ANSWER
+        env["INTERACTIVE_FEEDBACK_GUI_SOCKET"] = gui_socket
+        env["INTERACTIVE_FEEDBACK_GUI_IDLE_TIMEOUT"] = "5"
+    return env
+
+
+def server_command(backend):
+    # GUI 后端没有脚本化的客户端可用，由包装脚本换上自动回答的窗口
+    if backend.startswith("gui"):
+        return [sys.executable, os.path.join(ROOT, "test", "bench_gui_responder.py"), "server"]
+    return [sys.executable, os.path.join(ROOT, "server.py")]
+
+
+def bench_backend(backend, iterations, warmup):
+    gui_socket = os.path.join(tempfile.gettempdir(), f"if-bench-{os.getpid()}-{backend}.sock")
+    client = McpClient(server_command(backend), backend_env(backend, gui_socket))
+    try:
+        client.initialize()
+        for i in range(warmup):
+            run_iteration(client, -1 - i)
+        return [run_iteration(client, i) for i in range(iterations)]
+    finally:
+        client.close()
+
+
+def report(backend, samples):
+    print(f"\n{backend}: {len(samples)} iterations")
+    print(f"  {'phase':<10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for phase in PHASES:
+        values = [s[phase] for s in samples if phase in s]
+        if values:
+            print(f"  {phase:<10} {percentile(values, 50):9.2f} {percentile(values, 95):9.2f} {percentile(values, 99):9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end latency benchmark for interactive_feedback")
+    parser.add_argument("--backend", nargs="+", choices=sorted(BACKENDS), default=["inprocess", "subprocess"])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2, help="Iterations run first and left out of the statistics")
+    parser.add_argument("--max-p95-ms", type=float, help="Fail if any backend's total p95 exceeds this")
+    parser.add_argument("--json", help="Write every sample to this file")
+    args = parser.parse_args()
+
+    results = {}
+    for backend in args.backend:
+        results[backend] = bench_backend(backend, args.iterations, args.warmup)
+        report(backend, results[backend])
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.max_p95_ms is not None:
+        slow = {b: percentile([s["total"] for s in samples], 95) for b, samples in results.items()}
+        slow = {b: p95 for b, p95 in slow.items() if p95 > args.max_p95_ms}
+        if slow:
+            for backend, p95 in slow.items():
+                print(f"❌ {backend}: total p95 {p95:.1f} ms exceeds {args.max_p95_ms:.1f} ms")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+端到端延迟基准测试的 GUI 自动应答器（仅供 test/bench_e2e_latency.py 使用）
+
+  python test/bench_gui_responder.py server [server.py 参数]
+      运行 server.py，把 GUI 后端脚本换成本文件
+  python test/bench_gui_responder.py --daemon --socket PATH | --ipc
+      代替 feedback_ui.py：窗口显示后立即用 BENCH_GUI_ANSWER 回答
+
+自动回答只存在于基准测试中，产品里的 FeedbackUI 不读取任何测试用的环境变量。
+"""
+
+import argparse
+import os
+import sys
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+ANSWER_ENV = "BENCH_GUI_ANSWER"
+
+
+def run_server(argv):
+    """与 server.py 的入口相同，只是 GUI 后端指向本文件"""
+    import server
+
+    web_path, _ = server.detect_feedback_backends()
+    server.detect_feedback_backends = lambda: (web_path, os.path.abspath(__file__))
+    args = server.parse_args(argv)
+    threading.Thread(target=server.warm_up_backends, name="warm-up-backends", daemon=True).start()
+    server.run(args)
+
+
+def run_gui(argv):
+    """与 feedback_ui.py 的 --daemon / --ipc 模式相同，只是窗口显示后自动回答"""
+    from PySide6.QtCore import QTimer
+
+    import feedback_ui
+    from feedback_ipc import open_stdout_channel, read_request
+
+    reply = os.environ.get(ANSWER_ENV, "")
+
+    class AutoAnswerUI(feedback_ui.FeedbackUI):
+        def showEvent(self, event):
+            super().showEvent(event)
+            QTimer.singleShot(0, self.answer)
+
+        def answer(self):
+            """在每个输入框里填上回答并提交"""
+            for text_edit in self.feedback_texts:
+                text_edit.setPlainText(reply)
+            self._submit_feedback()
+
+    # FeedbackDaemon 和 feedback_ui() 在调用时才查找 FeedbackUI
+    feedback_ui.FeedbackUI = AutoAnswerUI
+
+    parser = argparse.ArgumentParser(description="Auto-answering feedback UI for the latency benchmark")
+    parser.add_argument("--ipc", action="store_true")
+    parser.add_argument("--daemon", action="store_true")
+    parser.add_argument("--socket")
+    parser.add_argument("--idle-timeout", type=int, default=feedback_ui.DAEMON_IDLE_TIMEOUT)
+    args = parser.parse_args(argv)
+
+    if args.daemon:
+        return feedback_ui.FeedbackDaemon(args.socket, args.idle_timeout).run()
+    if not args.ipc:
+        parser.error("--daemon or --ipc is required")
+    channel = open_stdout_channel()
+    try:
+        prompt, predefined_options, questions = read_request(sys.stdin.buffer)
+        feedback_ui.feedback_ui(prompt, predefined_options, None, channel, questions)
+    except Exception as e:
+        channel.error(str(e))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["server"]:
+        run_server(sys.argv[2:])
+    else:
+        sys.exit(run_gui(sys.argv[1:]))
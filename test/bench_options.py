@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+大量预定义选项的基准测试
+
+  web  问题 JSON 的大小与获取耗时、勾选部分选项后提交的往返耗时
+  qt   FeedbackUI 构建并显示、筛选一次的耗时（offscreen 平台），
+       以及旧实现（每个选项一个 QCheckBox）作为对照
+
+用法：
+  python test/bench_options.py --count 10000
+  python test/bench_options.py --count 1000 10000 --backend web
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def timed(fn, repeat):
+    """返回 fn 多次运行耗时（毫秒）的中位数"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def make_options(count):
+    return [f"tests/unit/test_module_{i // 100}.py::test_case_{i}" for i in range(count)]
+
+
+def bench_web(count, repeat):
+    import feedback_web
+
+    options = make_options(count)
+    server = feedback_web.FeedbackWebServer()
+    server.start()
+    try:
+        results = {}
+        session = server.create_session("Which tests should be rerun?", options)
+        url = f"{server.url}/api/sessions/{session.id}"
+        size = 0
+
+        def fetch():
+            nonlocal size
+            with urllib.request.urlopen(url, timeout=10) as response:
+                data = response.read()
+            size = len(data)
+            json.loads(data)
+
+        results["get_question_ms"] = timed(fetch, repeat)
+        results["payload_kb"] = size / 1024
+
+        # 勾选十分之一的选项后提交
+        body = "&".join(f"option_{i}=1" for i in range(0, count, 10)) + "&feedback_text=ok"
+
+        def submit():
+            pending = server.create_session("Which tests should be rerun?", options)
+            with urllib.request.urlopen(server.session_url(pending) + "submit", data=body.encode(), timeout=10) as response:
+                response.read()
+            pending.future.result(timeout=5)
+
+        results["submit_ms"] = timed(submit, repeat)
+        return results
+    finally:
+        server.shutdown()
+
+
+def bench_qt(count, repeat):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtWidgets import QApplication, QCheckBox, QLineEdit, QVBoxLayout, QWidget
+    import feedback_ui
+
+    app = QApplication.instance() or QApplication([])
+    options = make_options(count)
+    results = {}
+
+    def build():
+        window = feedback_ui.FeedbackUI("Which tests should be rerun?", options)
+        window.show()
+        app.processEvents()
+        window._finished = True
+        window.close()
+
+    results["build_ms"] = timed(build, repeat)
+
+    window = feedback_ui.FeedbackUI("Which tests should be rerun?", options)
+    window.show()
+    app.processEvents()
+    line_edit = window.findChild(QLineEdit)
+
+    def apply_filter():
+        line_edit.setText("test_case_99")
+        app.processEvents()
+        line_edit.setText("")
+        app.processEvents()
+
+    results["filter_ms"] = timed(apply_filter, repeat) / 2
+    window._finished = True
+    window.close()
+
+    def build_checkboxes():
+        # 旧实现：每个选项一个 QCheckBox
+        widget = QWidget()
+        layout = QVBoxLayout(widget)
+        for option in options:
+            layout.addWidget(QCheckBox(option))
+        widget.show()
+        app.processEvents()
+        widget.close()
+        widget.deleteLater()
+
+    results["legacy_checkbox_build_ms"] = timed(build_checkboxes, max(1, repeat // 2))
+    return results
+
+
+BENCHES = {"web": bench_web, "qt": bench_qt}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark interactive_feedback with many predefined options")
+    parser.add_argument("--count", type=int, nargs="+", default=[10000])
+    parser.add_argument("--backend", nargs="+", choices=sorted(BENCHES), default=sorted(BENCHES))
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for backend in args.backend:
+        for count in args.count:
+            results = BENCHES[backend](count, args.repeat)
+            fields = "  ".join(f"{name}={value:.1f}" for name, value in results.items())
+            print(f"{backend:<4} {count:>7} options  {fields}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+回答缓存测试
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import feedback_cache
+from feedback_cache import AnswerCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_key_normalization_ttl_and_lru():
+    """问题和选项忽略大小写与空白；条目过期或被挤出后不再命中"""
+    clock = FakeClock()
+    cache = AnswerCache("auto", ttl=60, max_entries=2, clock=clock)
+    cache.put("Proceed with the  migration?", ["Yes", "No"], "Yes")
+    assert cache.get("proceed with the migration?\n", [" yes", "NO"]) == "Yes"
+    assert cache.get("Proceed with the migration?", ["No", "Yes"]) is None
+
+    cache.put("Deploy?", None, "Not yet")
+    assert cache.get("Proceed with the migration?", ["Yes", "No"]) == "Yes"
+    cache.put("Rollback?", None, "No")
+    assert cache.get("Deploy?", None) is None
+
+    clock.now += 61
+    assert cache.get("Rollback?", None) is None
+
+    for answer in ["", "   ", "Error: No suitable feedback interface found"]:
+        cache.put("Deploy?", None, answer)
+        assert cache.get("Deploy?", None) is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evicted"], stats["expired"]) == (2, 6, 1, 1)
+    assert stats["hit_rate"] == pytest.approx(2 / 8)
+
+
+@pytest.mark.parametrize("feedback, expected", [
+    ("{option}", ("Yes, run it", True)),
+    ("{option}; Also back up first", ("Yes, run it\n\nAlso back up first", True)),
+    ("{option}\n\nthanks", ("Yes, run it\n\nthanks", True)),
+    ("No", ("No", False)),
+])
+def test_resolve_reuse(feedback, expected):
+    option = feedback_cache.reuse_option("Yes, run it")
+    assert feedback_cache.resolve_reuse(feedback.format(option=option), option, "Yes, run it") == expected
+
+
+def test_server_cache_modes(monkeypatch):
+    """auto 模式命中时不再打开界面；suggest 模式把上次的回答作为第一个选项"""
+    server = pytest.importorskip("server")
+    asked = []
+
+    async def fake_launch(message, options=None, timeout=None):
+        asked.append(options)
+        return {"interactive_feedback": options[0] if options and options[0].startswith("↩") else "Yes"}
+
+    monkeypatch.setattr(server, "launch_feedback_ui_async", fake_launch)
+
+    monkeypatch.setattr(server, "answer_cache", AnswerCache("auto"))
+    for _ in range(3):
+        assert asyncio.run(server.ask_with_answer_cache("Proceed?", ["Yes", "No"])) == {"interactive_feedback": "Yes"}
+    assert len(asked) == 1
+    assert server.answer_cache.stats()["hits"] == 2
+
+    asked.clear()
+    monkeypatch.setattr(server, "answer_cache", AnswerCache("suggest"))
+    asyncio.run(server.ask_with_answer_cache("Proceed?", ["Yes", "No"]))
+    assert asyncio.run(server.ask_with_answer_cache("Proceed?", ["Yes", "No"])) == {"interactive_feedback": "Yes"}
+    assert asked[0] == ["Yes", "No"]
+    assert asked[1] == [feedback_cache.reuse_option("Yes"), "Yes", "No"]
+    assert server.answer_cache.stats()["reused"] == 1
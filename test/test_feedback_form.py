@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+流式表单解析测试
+"""
+
+import io
+import os
+import sys
+from urllib.parse import urlencode
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import feedback_form
+
+FIELDS = [("feedback_text", "héllo wörld & 100% +x=y\n" * 50), ("option_3", "1"), ("a b", "")]
+BOUNDARY = "----formBoundary7MA4YWxk"
+
+
+def parse(body, content_type=None, **kwargs):
+    return feedback_form.parse_form(io.BytesIO(body), content_type, len(body), **kwargs)
+
+
+def multipart_body(parts):
+    body = b""
+    for name, value, filename in parts:
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else "")
+        body += f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + value + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64 * 1024])
+def test_urlencoded_across_chunk_boundaries(monkeypatch, chunk_size):
+    """字段和 %XX 转义被切断在块边界时结果不变"""
+    monkeypatch.setattr(feedback_form, "CHUNK_SIZE", chunk_size)
+    with parse(urlencode(FIELDS).encode() + b"&bare") as form:
+        assert {name: form.get_text(name) for name in form.fields} == dict(FIELDS, bare="")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 64 * 1024])
+def test_multipart_across_chunk_boundaries(monkeypatch, chunk_size):
+    """multipart 分隔符被切断时也能识别，正文里形似分隔符的行保持原样"""
+    monkeypatch.setattr(feedback_form, "CHUNK_SIZE", chunk_size)
+    log = b"--not-the-boundary\r\n" * 20
+    body = multipart_body([("feedback_text", "多行\r\n文本".encode(), None), ("option_0", b"1", None),
+                           ("attachment", log, "build.log")])
+    with parse(body, f"multipart/form-data; boundary={BOUNDARY}") as form:
+        assert form.get_text("feedback_text") == "多行\r\n文本"
+        assert "option_0" in form
+        [upload] = form.files()
+        assert (upload.filename, upload.read_bytes()) == ("build.log", log)
+
+
+def test_large_values_spool_and_limit_is_enforced(monkeypatch):
+    """超过阈值的字段写入临时文件；超出大小上限的请求体不读取直接拒绝"""
+    monkeypatch.setattr(feedback_form, "SPOOL_SIZE", 1024)
+    text = "x" * 10000
+    with parse(urlencode({"feedback_text": text, "option_1": "1"}).encode()) as form:
+        assert form.get("feedback_text").spooled
+        assert not form.get("option_1").spooled
+        assert form.get_text("feedback_text") == text
+
+    stream = io.BytesIO(b"feedback_text=" + b"x" * 100)
+    with pytest.raises(feedback_form.FormTooLarge):
+        feedback_form.parse_form(stream, None, 114, max_size=100)
+    assert stream.tell() == 0
+
+    with pytest.raises(feedback_form.FormError):
+        parse(multipart_body([("a", b"1", None)])[:-10], f"multipart/form-data; boundary={BOUNDARY}")
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+反馈历史记录（SQLite WAL + FTS5）测试
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import feedback_history
+from feedback_history import FeedbackHistory, fts_query, main, parse_since
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = FeedbackHistory(str(tmp_path / "history.db"))
+    yield history
+    history.close()
+
+
+def test_writes_are_batched_off_the_caller(history, monkeypatch):
+    """记录只是入队，由写线程按批次写入，每批一个事务"""
+    batches = []
+    insert = FeedbackHistory._insert
+    monkeypatch.setattr(FeedbackHistory, "_insert", lambda self, db, batch: (batches.append(len(batch)), insert(self, db, batch)))
+
+    started = time.perf_counter()
+    for i in range(500):
+        history.record("interactive_feedback", f"Question {i}", ["yes", "no"], "yes", "answered", 1.5)
+    assert time.perf_counter() - started < 0.5
+    history.flush()
+
+    assert sum(batches) == 500
+    assert len(batches) < 10 and max(batches) <= feedback_history.BATCH_SIZE
+    with sqlite3.connect(history.path) as db:
+        assert db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert db.execute("SELECT COUNT(*) FROM entries").fetchone()[0] == 500
+
+
+def insert_rows(path, rows):
+    """直接写入带指定时间的记录（record() 总是用写入时的时间），rows 按 COLUMNS 顺序"""
+    db = feedback_history.connect(path)
+    with db:
+        db.execute("BEGIN")
+        db.executemany(f"INSERT INTO entries ({', '.join(feedback_history.COLUMNS)}) VALUES "
+                       f"({', '.join('?' * len(feedback_history.COLUMNS))})", rows)
+    db.close()
+
+
+def test_search_by_words_and_time_range(history):
+    """全文检索问题和回答，按时间范围过滤，最新的在前"""
+    now = time.time()
+    insert_rows(history.path, [
+        (now - 3 * 86400, "c1", "interactive_feedback", None, "Proceed with the database migration?",
+         '["yes", "no"]', "yes", "answered", 3.2),
+        (now - 3600, None, "interactive_feedback", None, "Run the tests?", "[]", "Only the migration tests",
+         "answered", 8),
+        (now, None, "interactive_feedback_batch", "cursor · 3f9a2c", "Deploy?", '["now", "later"]', "", "dismissed",
+         40),
+    ])
+
+    assert [e["question"] for e in history.search("migration")] == ["Run the tests?", "Proceed with the database migration?"]
+    assert [e["question"] for e in history.search("migr*", since=now - 86400)] == ["Run the tests?"]
+    assert [e["question"] for e in history.search(until=now - 60)] == ["Run the tests?", "Proceed with the database migration?"]
+    latest = history.search(limit=1)[0]
+    assert latest["options"] == ["now", "later"] and latest["client"] == "cursor · 3f9a2c"
+    assert latest["outcome"] == "dismissed"
+    # 引号、连字符等 FTS5 语法字符按普通文字处理
+    assert history.search('migration-plan "deploy') == []
+    assert [e["question"] for e in history.search('database-migration "yes')] == ["Proceed with the database migration?"]
+    assert history.stats()["outcomes"] == {"answered": 2, "dismissed": 1}
+
+
+def test_timestamps_never_go_back_in_id_order(history, monkeypatch):
+    """时钟回拨（或多个进程共用一个文件）时，后写入的记录时间也不早于已有记录，按时间范围检索仍然正确"""
+    clock = [0.0]
+    monkeypatch.setattr(feedback_history.time, "time", lambda: clock[0])
+    for question, now in (("First?", 1000.0), ("Second?", 2000.0), ("Third?", 1500.0)):
+        clock[0] = now
+        history.record("interactive_feedback", question, [], "ok", "answered", 1)
+        history.flush()
+    monkeypatch.undo()
+
+    entries = history.search(limit=10)
+    assert [(e["question"], e["ts"]) for e in entries] == [("Third?", 2000.0), ("Second?", 2000.0), ("First?", 1000.0)]
+    assert [e["question"] for e in history.search(since=1800)] == ["Third?", "Second?"]
+    assert [e["question"] for e in history.search(until=1800)] == ["First?"]
+
+
+def test_fts_query_and_durations():
+    assert fts_query('say "hi" migr*') == '"say" """hi""" "migr"*'
+    assert parse_since("7d", now=1_000_000) == 1_000_000 - 7 * 86400
+    assert parse_since("90m", now=10_000) == 10_000 - 5400
+    assert parse_since("1700000000") == 1_700_000_000
+
+
+def test_retention_prunes_and_compacts(tmp_path):
+    """超过保留天数或条数上限的记录被删除，全文索引同步更新"""
+    path = str(tmp_path / "history.db")
+    now = time.time()
+    insert_rows(path, [(now - 60 * 86400, None, "interactive_feedback", None, "Ancient question", "[]", "old answer",
+                        "answered", 1)] +
+                [(now - 5 + i, None, "interactive_feedback", None, f"Recent question {i}", "[]", "fresh answer",
+                  "answered", 1) for i in range(5)])
+    history = FeedbackHistory(path, retention_days=30, max_entries=3)
+    try:
+        assert history.prune(now=now) == 3
+        assert [e["question"] for e in history.search()] == [f"Recent question {i}" for i in (4, 3, 2)]
+        assert history.search("ancient") == []
+        assert history.search("fresh", limit=10) == history.search(limit=10)
+    finally:
+        history.close()
+
+
+def test_prune_returns_free_pages_to_the_file(tmp_path):
+    """删除大量记录后压缩：空闲页归还给文件系统，数据库文件变小"""
+    path = str(tmp_path / "history.db")
+    db = feedback_history.connect(path)
+    now = time.time()
+    rows = ((now - 90 * 86400 + i, None, "interactive_feedback", None, f"Old question {i} " + "x" * 500, "[]",
+             "old answer", "answered", 1.0) for i in range(5000))
+    with db:
+        db.execute("BEGIN")
+        db.executemany("INSERT INTO entries (ts, call, tool, client, question, options, answer, outcome, seconds) "
+                       "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    db.close()
+    size_before = os.path.getsize(path)
+
+    history = FeedbackHistory(path, retention_days=30)
+    try:
+        assert history.prune() == 5000
+        reader = history._reader()
+        assert reader.execute("PRAGMA freelist_count").fetchone()[0] == 0
+    finally:
+        history.close()
+    assert os.path.getsize(path) < size_before / 10
+
+
+def test_feedback_tools_record_history(tmp_path, monkeypatch):
+    """每次工具调用把问题、选项、回答和耗时写进历史，批量提问每个问题一条"""
+    server = pytest.importorskip("server")
+    history = FeedbackHistory(str(tmp_path / "history.db"))
+    monkeypatch.setattr(server, "history", history)
+    monkeypatch.setattr(server, "answer_cache", server.AnswerCache())
+    results = [{"interactive_feedback": "yes"},
+               {"answers": [{"message": "First?", "interactive_feedback": "a"},
+                            {"message": "Second?", "interactive_feedback": "b"}]}]
+
+    async def fake_launch(message, options=None, questions=None, timeout=None):
+        return results.pop(0)
+
+    monkeypatch.setattr(server, "launch_feedback_ui_async", fake_launch)
+    asyncio.run(server.interactive_feedback("Proceed?", ["yes", "no"]))
+    asyncio.run(server.interactive_feedback_batch([server.BatchQuestion(message="First?", predefined_options=["a"]),
+                                                   server.BatchQuestion(message="Second?")]))
+    history.flush()
+    try:
+        entries = history.search(limit=10)
+    finally:
+        history.close()
+
+    assert [(e["tool"], e["question"], e["options"], e["answer"]) for e in entries] == [
+        ("interactive_feedback_batch", "Second?", [], "b"),
+        ("interactive_feedback_batch", "First?", ["a"], "a"),
+        ("interactive_feedback", "Proceed?", ["yes", "no"], "yes"),
+    ]
+    assert entries[0]["call"] == entries[1]["call"] != entries[2]["call"]
+    assert all(e["outcome"] == "answered" and e["seconds"] >= 0 for e in entries)
+
+
+def test_cli_stays_fast_on_a_large_history(tmp_path, capsys):
+    """十万条记录时，CLI 的全文检索和时间范围查询仍在毫秒级，不随匹配条数增长"""
+    path = str(tmp_path / "history.db")
+    db = feedback_history.connect(path)
+    now = time.time()
+    words = ["deploy", "migration", "refactor", "tests", "release", "rollback"]
+    rows = ((now - 100_000 + i, None, "interactive_feedback", None, f"Question {i}: {words[i % 6]} step {i % 97}?",
+             "[]", f"answer {words[(i + 1) % 6]}", "answered", 1.0) for i in range(100_000))
+    with db:
+        db.execute("BEGIN")
+        db.executemany("INSERT INTO entries (ts, call, tool, client, question, options, answer, outcome, seconds) "
+                       "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    db.close()
+
+    for argv in (["search", "rollback", "--json"], ["search", "migration", "--since", "2h", "--json"],
+                 ["recent", "--until", "1d", "--json"]):
+        started = time.perf_counter()
+        assert main(["--db", path] + argv) == 0
+        elapsed = time.perf_counter() - started
+        entries = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        assert len(entries) == 20
+        assert elapsed < 0.2, f"{argv} 耗时 {elapsed * 1000:.1f} ms"
+    assert all(e["ts"] < time.time() - 86400 for e in entries)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+反馈子进程结果通道（feedback_ipc）测试
+"""
+
+import asyncio
+import io
+import os
+import subprocess
+import sys
+import urllib.request
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import feedback_ipc
+
+LARGE_PROMPT = "# 大提示\n\n" + "diff 行 +line\n" * 20000
+
+
+def test_frames_round_trip():
+    """编码后的帧可以原样解码，截断的数据会被识别出来"""
+    frames = [
+        {"type": "progress", "stage": "waiting", "url": "http://localhost:1/s/abc/"},
+        {"type": "result", "result": {"interactive_feedback": "好的\n继续"}},
+    ]
+    data = b"".join(feedback_ipc.encode_frame(frame) for frame in frames)
+    assert list(feedback_ipc.read_frames(io.BytesIO(data))) == frames
+
+    progress = []
+    result = feedback_ipc.result_from_frames(feedback_ipc.read_frames(io.BytesIO(data)), progress.append)
+    assert result == {"interactive_feedback": "好的\n继续"}
+    assert progress == frames[:1]
+
+    with pytest.raises(feedback_ipc.FrameError):
+        list(feedback_ipc.read_frames(io.BytesIO(data[:-1])))
+    # 只有进度、没有结果就结束
+    only_progress = feedback_ipc.encode_frame(frames[0])
+    with pytest.raises(feedback_ipc.FrameError):
+        feedback_ipc.result_from_frames(feedback_ipc.read_frames(io.BytesIO(only_progress)))
+
+
+def test_error_frame_becomes_error_result():
+    """子进程通过 error 帧结构化地报告错误"""
+    data = feedback_ipc.encode_frame({"type": "error", "message": "boom"})
+    assert feedback_ipc.result_from_frames(feedback_ipc.read_frames(io.BytesIO(data))) == {
+        "interactive_feedback": "Error: boom"
+    }
+
+
+def test_batch_questions_round_trip():
+    """批量问题随请求帧下发，格式不对时报错"""
+    questions = [{"prompt": "A?", "predefined_options": ["x|||y"]}, {"prompt": "B?"}]
+    request = io.BytesIO(feedback_ipc.encode_request("A?", None, questions))
+    assert feedback_ipc.read_request(request) == ("A?", None, [
+        {"prompt": "A?", "predefined_options": ["x|||y"]},
+        {"prompt": "B?", "predefined_options": []},
+    ])
+    assert feedback_ipc.read_request(io.BytesIO(feedback_ipc.encode_request("C?"))) == ("C?", None, None)
+
+    with pytest.raises(feedback_ipc.FrameError):
+        feedback_ipc.parse_questions([{"predefined_options": []}])
+
+
+def test_web_child_reports_over_stdout():
+    """feedback_web.py --ipc 从 stdin 读取问题，通过 stdout 发送进度和结果，不再写临时文件"""
+
+    async def run():
+        # 用 true 作为“浏览器”，避免测试时真的打开页面
+        env = dict(os.environ, BROWSER="true")
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.join(ROOT, "feedback_web.py"), "--ipc",
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, env=env,
+        )
+        try:
+            # 问题经 stdin 传入，超过单个命令行参数 128 KB 上限的提示也可以
+            process.stdin.write(feedback_ipc.encode_request(LARGE_PROMPT, ["A", "B"]))
+            await process.stdin.drain()
+            process.stdin.close()
+
+            progress = await asyncio.wait_for(feedback_ipc.read_frame(process.stdout), 10)
+            assert progress["type"] == "progress" and progress["stage"] == "waiting"
+
+            session_id = progress["url"].rstrip("/").rsplit("/", 1)[1]
+            base = progress["url"].split("/s/")[0]
+            with urllib.request.urlopen(f"{base}/api/sessions/{session_id}/prompt", timeout=5) as response:
+                assert response.read().decode("utf-8") == LARGE_PROMPT
+
+            def answer():
+                body = "option_1=1&feedback_text=via+ipc".encode("utf-8")
+                with urllib.request.urlopen(progress["url"] + "submit", data=body, timeout=5) as response:
+                    response.read()
+            await asyncio.to_thread(answer)
+
+            # 结果之前先报告页面是否还开着，供下一个子进程决定是否等它重连
+            finished = await asyncio.wait_for(feedback_ipc.read_frame(process.stdout), 10)
+            assert finished == {"type": "progress", "stage": "finished", "tab_open": False}
+            result = await asyncio.wait_for(feedback_ipc.read_frame(process.stdout), 10)
+            assert feedback_ipc.frame_result(result) == {"interactive_feedback": "B\n\nvia ipc"}
+            # 结果之后通道关闭，stdout 上没有其他输出
+            assert await asyncio.wait_for(process.stdout.read(), 10) == b""
+            assert await asyncio.wait_for(process.wait(), 10) == 0
+        finally:
+            if process.returncode is None:
+                process.kill()
+
+    asyncio.run(run())
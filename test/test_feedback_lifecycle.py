@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+取消、超时与进度心跳测试
+"""
+
+import asyncio
+import os
+import sys
+import time
+import webbrowser
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+server = pytest.importorskip("server")
+import feedback_web
+
+
+@pytest.fixture
+def web_server(monkeypatch):
+    """进程内 Web 后端，不真正打开浏览器"""
+    monkeypatch.setenv("INTERACTIVE_FEEDBACK_UI", "web")
+    monkeypatch.setenv("INTERACTIVE_FEEDBACK_WEB_MODE", "inprocess")
+    monkeypatch.setattr(webbrowser, "open", lambda url: True)
+    return server.get_feedback_server()
+
+
+async def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "等待超时"
+        await asyncio.sleep(0.005)
+
+
+def test_cancel_closes_session_immediately(web_server):
+    """MCP 客户端取消调用后，问题会话在毫秒级内关闭"""
+    async def scenario():
+        task = asyncio.ensure_future(server.launch_feedback_ui_async("Cancel me?", None, timeout=60))
+        await wait_until(lambda: web_server.sessions.pending_count() == 1)
+        started = time.perf_counter()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return time.perf_counter() - started
+
+    elapsed = asyncio.run(scenario())
+    assert web_server.sessions.pending_count() == 0
+    assert elapsed < 0.05, f"取消耗时 {elapsed * 1000:.1f} ms"
+
+
+def test_per_call_timeout_returns_empty_answer(web_server):
+    """每次调用可以单独设置超时，到时撤回问题并返回空反馈"""
+    started = time.perf_counter()
+    result = asyncio.run(server.launch_feedback_ui_async("Anyone there?", None, timeout=0.2))
+    assert result == {"interactive_feedback": ""}
+    assert time.perf_counter() - started < 1.0
+    assert web_server.sessions.pending_count() == 0
+
+
+def test_progress_heartbeats_while_waiting(monkeypatch):
+    """等待期间定期发送进度通知，得到回答后停止"""
+    monkeypatch.setattr(server, "PROGRESS_INTERVAL", 0.02)
+    reports = []
+
+    class FakeContext:
+        async def report_progress(self, progress, total=None, message=None):
+            reports.append((progress, total, message))
+
+    async def answer_later():
+        await asyncio.sleep(0.15)
+        return {"interactive_feedback": "done"}
+
+    result = asyncio.run(server.wait_with_progress(FakeContext(), answer_later(), 30))
+    assert result == {"interactive_feedback": "done"}
+    assert len(reports) >= 3
+    assert all(total == 30 and "Waiting" in message for _, total, message in reports)
+    assert [progress for progress, _, _ in reports] == sorted(progress for progress, _, _ in reports)
+
+
+def test_cancel_kills_and_reaps_feedback_subprocess(monkeypatch):
+    """子进程模式下取消调用会立即结束并回收子进程，不等它自己超时"""
+    monkeypatch.setenv("INTERACTIVE_FEEDBACK_UI", "web")
+    monkeypatch.setenv("INTERACTIVE_FEEDBACK_WEB_MODE", "subprocess")
+    # 子进程里的 webbrowser 通过 BROWSER 调用一个什么都不做的命令
+    monkeypatch.setenv("BROWSER", "true")
+    processes = []
+    create_subprocess_exec = asyncio.create_subprocess_exec
+
+    async def spawn(*args, **kwargs):
+        process = await create_subprocess_exec(*args, **kwargs)
+        processes.append((process, kwargs.get("env") or {}))
+        return process
+
+    monkeypatch.setattr(asyncio, "create_subprocess_exec", spawn)
+
+    async def scenario():
+        task = asyncio.ensure_future(server.launch_feedback_ui_async("Cancel me?", None, timeout=60))
+        await wait_until(lambda: processes)
+        # 等子进程读完问题、开始等待回答
+        await asyncio.sleep(0.5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    process, env = processes[0]
+    assert process.returncode is not None
+    # 子进程的超时比调用本身稍长，由服务端决定何时放弃
+    assert float(env["INTERACTIVE_FEEDBACK_TIMEOUT"]) == 60 + server.CHILD_TIMEOUT_GRACE
+
+
+def test_blocking_launch_shares_the_async_path(web_server):
+    """同步入口只是包装异步实现：同样按超时撤回问题"""
+    assert server.launch_feedback_ui("Anyone there?", None, timeout=0.2) == {"interactive_feedback": ""}
+    assert web_server.sessions.pending_count() == 0
+
+
+def test_malformed_timeout_setting_falls_back_to_default(monkeypatch, capsys):
+    """INTERACTIVE_FEEDBACK_TIMEOUT 无效时警告一次并使用默认超时，而不是让每次调用都出错"""
+    server.parse_feedback_timeout.cache_clear()
+    for value in ("5m", "-1", "nan"):
+        monkeypatch.setenv("INTERACTIVE_FEEDBACK_TIMEOUT", value)
+        assert server.feedback_timeout() == server.DEFAULT_FEEDBACK_TIMEOUT
+        assert server.feedback_timeout() == server.DEFAULT_FEEDBACK_TIMEOUT
+        assert capsys.readouterr().err.count("INTERACTIVE_FEEDBACK_TIMEOUT") == 1
+    monkeypatch.setenv("INTERACTIVE_FEEDBACK_TIMEOUT", "42.5")
+    assert server.feedback_timeout() == 42.5
+    assert server.feedback_timeout(7) == 7
+
+    monkeypatch.setenv("INTERACTIVE_FEEDBACK_TIMEOUT", "soon")
+    assert feedback_web.load_feedback_timeout() == feedback_web.DEFAULT_FEEDBACK_TIMEOUT
+    assert "INTERACTIVE_FEEDBACK_TIMEOUT" in capsys.readouterr().err
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+计时记录与 /metrics 指标测试
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import urllib.request
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import feedback_metrics
+import feedback_web
+from feedback_metrics import MetricsRegistry, SpanLog
+
+
+def test_registry_renders_prometheus_text():
+    """计数器和直方图按 Prometheus 文本格式输出，桶计数是累积的"""
+    registry = MetricsRegistry()
+    registry.inc("interactive_feedback_calls_total", tool="interactive_feedback", outcome="answered")
+    registry.inc("interactive_feedback_calls_total", tool="interactive_feedback", outcome="answered")
+    for seconds in (0.5, 3, 3, 4000):
+        registry.observe("interactive_feedback_response_seconds", seconds)
+    registry.add_collector(lambda: [("interactive_feedback_answer_cache_entries", {}, 7)])
+
+    text = registry.render([("interactive_feedback_sessions_pending", {}, 2)])
+    lines = text.splitlines()
+    assert 'interactive_feedback_calls_total{outcome="answered",tool="interactive_feedback"} 2' in lines
+    assert "# TYPE interactive_feedback_response_seconds histogram" in lines
+    assert 'interactive_feedback_response_seconds_bucket{le="1"} 1' in lines
+    assert 'interactive_feedback_response_seconds_bucket{le="5"} 3' in lines
+    assert 'interactive_feedback_response_seconds_bucket{le="1800"} 3' in lines
+    assert 'interactive_feedback_response_seconds_bucket{le="+Inf"} 4' in lines
+    assert "interactive_feedback_response_seconds_sum 4006.5" in lines
+    assert "interactive_feedback_response_seconds_count 4" in lines
+    assert "interactive_feedback_sessions_pending 2" in lines
+    assert "interactive_feedback_answer_cache_entries 7" in lines
+    # 没有数据的指标不输出
+    assert "interactive_feedback_phase_seconds" not in text
+
+
+def test_web_session_phases_and_metrics_endpoint(tmp_path, monkeypatch):
+    """一次 Web 问答写出 first_view、parse、submit 计时记录，/metrics 含作答耗时直方图"""
+    spans_path = tmp_path / "spans.jsonl"
+    monkeypatch.setattr(feedback_metrics, "span_log", SpanLog(str(spans_path)))
+    monkeypatch.setattr(feedback_metrics, "metrics", MetricsRegistry())
+    monkeypatch.setattr(feedback_web, "metrics", feedback_metrics.metrics)
+
+    server = feedback_web.FeedbackWebServer()
+    server.start()
+    try:
+        call_id = feedback_metrics.start_call()
+        session = server.create_session("Proceed?", ["yes", "no"])
+        urllib.request.urlopen(f"{server.url}/api/sessions/{session.id}", timeout=5).read()
+        urllib.request.urlopen(server.session_url(session) + "submit", data=b"option_0=1", timeout=5).read()
+        assert session.future.result(timeout=1) == {"interactive_feedback": "yes"}
+
+        with urllib.request.urlopen(server.url + "/metrics", timeout=5) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            text = response.read().decode("utf-8")
+    finally:
+        server.shutdown()
+
+    spans = [json.loads(line) for line in spans_path.read_text(encoding="utf-8").splitlines()]
+    assert [span["phase"] for span in spans] == ["first_view", "parse", "submit"]
+    assert all(span["call"] == call_id and span["session"] == session.id for span in spans)
+    assert spans[1]["bytes"] == len(b"option_0=1")
+
+    lines = text.splitlines()
+    assert "interactive_feedback_response_seconds_count 1" in lines
+    # 包含用户作答时间的阶段用秒到分钟级的桶，机器阶段用毫秒级的桶
+    assert 'interactive_feedback_wait_phase_seconds_count{phase="submit"} 1' in lines
+    assert 'interactive_feedback_wait_phase_seconds_bucket{le="1800",phase="submit"} 1' in lines
+    assert 'interactive_feedback_phase_seconds_count{phase="parse"} 1' in lines
+    assert not any(line.startswith("interactive_feedback_phase_seconds") and 'phase="submit"' in line for line in lines)
+    assert 'interactive_feedback_http_requests_total{code="200",method="POST"} 1' in lines
+    assert "interactive_feedback_sessions_pending 0" in lines
+
+
+def test_subprocess_spans_share_the_call_id(tmp_path):
+    """子进程模式：子进程写出的计时记录沿用启动它的工具调用的 call ID"""
+    server = pytest.importorskip("server")
+    from feedback_ipc import encode_request, read_frames
+
+    spans_path = tmp_path / "spans.jsonl"
+    call_id = feedback_metrics.start_call()
+    env = dict(server.child_env(5), INTERACTIVE_FEEDBACK_SPANS=str(spans_path), INTERACTIVE_FEEDBACK_PORT="0",
+               BROWSER="true")
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "feedback_web.py")
+    process = subprocess.Popen([sys.executable, script, "--ipc"], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL, env=env)
+    try:
+        process.stdin.write(encode_request("Proceed?", ["yes", "no"]))
+        process.stdin.close()
+        frames = read_frames(process.stdout)
+        url = next(frames)["url"]
+        session_id = url.rstrip("/").rsplit("/", 1)[1]
+        base = url.split("/s/")[0]
+        urllib.request.urlopen(f"{base}/api/sessions/{session_id}", timeout=5).read()
+        urllib.request.urlopen(url + "submit", data=b"option_1=1", timeout=5).read()
+        assert [frame.get("result") for frame in frames] == [None, {"interactive_feedback": "no"}]
+        assert process.wait(timeout=10) == 0
+    finally:
+        process.kill()
+
+    spans = [json.loads(line) for line in spans_path.read_text(encoding="utf-8").splitlines()]
+    assert {"first_view", "parse", "submit"} <= {span["phase"] for span in spans}
+    assert all(span["call"] == call_id for span in spans)
+
+
+def test_tool_calls_counted_by_outcome(monkeypatch):
+    """每次工具调用按结果计数，并记录整个调用的 call 计时"""
+    server = pytest.importorskip("server")
+    registry = MetricsRegistry()
+    monkeypatch.setattr(feedback_metrics, "metrics", registry)
+    monkeypatch.setattr(server, "metrics", registry)
+    monkeypatch.setattr(server, "answer_cache", server.AnswerCache())
+    results = [{"interactive_feedback": "ok"}, {"interactive_feedback": ""}, {"interactive_feedback": "Error: boom"}]
+
+    async def fake_launch(message, options=None, questions=None, timeout=None):
+        return results.pop(0)
+
+    monkeypatch.setattr(server, "launch_feedback_ui_async", fake_launch)
+    for _ in range(3):
+        asyncio.run(server.interactive_feedback("Proceed?", None))
+
+    for outcome in ("answered", "empty", "error"):
+        assert registry.counter_value("interactive_feedback_calls_total",
+                                      tool="interactive_feedback", outcome=outcome) == 1
+    assert registry.histogram("interactive_feedback_wait_phase_seconds", phase="call").count == 3
+    assert registry.histogram("interactive_feedback_phase_seconds", phase="call") is None
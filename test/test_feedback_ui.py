@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Qt 反馈界面测试（offscreen 平台运行）
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+
+pytest.importorskip("PySide6")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PySide6.QtNetwork import QLocalSocket
+from PySide6.QtWidgets import QApplication, QLineEdit
+
+import feedback_ui
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+def answer(window, text):
+    """在每个输入框里填上 text 并提交，就像用户作答一样"""
+    for text_edit in window.feedback_texts:
+        text_edit.setPlainText(text)
+    window._submit_feedback()
+
+
+def test_option_model_filters_without_losing_checks(app):
+    """筛选只改变显示的行，勾选状态和提交顺序按原始选项"""
+    model = feedback_ui.OptionListModel(["alpha", "Beta", "gamma", "alphabet"])
+    model.toggle(model.index(3))
+    model.set_filter("ALPHA")
+    assert model.rowCount() == 2
+    model.toggle(model.index(0))
+    model.set_filter("")
+    assert model.rowCount() == 4
+    assert model.selected_options() == ["alpha", "alphabet"]
+
+
+def test_ten_thousand_options_build_quickly(app):
+    """10k 个选项时窗口构建不应随选项数逐个创建控件"""
+    options = [f"option {i}" for i in range(10000)]
+    started = time.perf_counter()
+    window = feedback_ui.FeedbackUI("Pick some", options)
+    window.show()
+    app.processEvents()
+    elapsed = time.perf_counter() - started
+    try:
+        assert elapsed < 1.0, f"构建耗时 {elapsed * 1000:.1f} ms"
+        window.findChild(QLineEdit).setText("9999")
+        assert window.option_model.rowCount() == 1
+        window.option_model.toggle(window.option_model.index(0))
+        answer(window, "done")
+        assert window.feedback_result == {"interactive_feedback": "option 9999\n\ndone"}
+    finally:
+        window.close()
+
+
+def test_batch_questions_answered_on_one_form(app):
+    """批量提问：每个问题一组选项和输入框，一次提交返回 answers 列表"""
+    questions = [
+        {"prompt": "Which database?", "predefined_options": ["sqlite", "postgres"]},
+        {"prompt": "Anything else?", "predefined_options": []},
+    ]
+    window = feedback_ui.FeedbackUI("Which database?", None, questions)
+    window.show()
+    app.processEvents()
+    try:
+        assert len(window.feedback_texts) == 2
+        model = window.option_models[0]
+        model.toggle(model.index(1))
+        window.feedback_texts[1].setPlainText("ship it")
+        window._submit_feedback()
+        assert window.feedback_result == {"answers": [
+            {"message": "Which database?", "interactive_feedback": "postgres"},
+            {"message": "Anything else?", "interactive_feedback": "ship it"},
+        ]}
+    finally:
+        window.close()
+
+
+@pytest.fixture
+def daemon(app):
+    path = os.path.join(tempfile.gettempdir(), f"feedback-daemon-test-{os.getpid()}")
+    daemon = feedback_ui.FeedbackDaemon(path)
+    assert daemon.listen()
+    yield daemon
+    daemon.server.close()
+    daemon.window.hide()
+
+
+def wait_for(app, condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "等待超时"
+        app.processEvents()
+        time.sleep(0.005)
+
+
+def ask(app, daemon, prompt, options=None):
+    """像 server.py 的守护进程客户端一样连上本地套接字，发送一行 JSON 请求"""
+    client = QLocalSocket()
+    client.connectToServer(daemon.socket_path)
+    assert client.waitForConnected(1000)
+    client.write(json.dumps({"prompt": prompt, "predefined_options": options}).encode("utf-8") + b"\n")
+    client.flush()
+    return client
+
+
+def reply(app, client):
+    """读取守护进程回写的一行结果"""
+    received = b""
+    wait_for(app, lambda: client.bytesAvailable() or client.state() == QLocalSocket.UnconnectedState)
+    while b"\n" not in received:
+        app.processEvents()
+        received += bytes(client.readAll())
+        assert client.state() == QLocalSocket.ConnectedState or b"\n" in received, "守护进程没有回写结果"
+    return json.loads(received.split(b"\n", 1)[0])
+
+
+def test_daemon_answers_over_local_socket(app, daemon):
+    """守护进程：请求经本地套接字送达，窗口显示问题，回答原路写回给客户端"""
+    client = ask(app, daemon, "Proceed?", ["yes", "no"])
+    wait_for(app, lambda: daemon.window.isVisible() and daemon.window.prompt == "Proceed?")
+    assert daemon.window.predefined_options == ["yes", "no"]
+    daemon.window.option_model.toggle(daemon.window.option_model.index(0))
+    answer(daemon.window, "go")
+    assert reply(app, client) == {"interactive_feedback": "yes\n\ngo"}
+    # 回答后窗口留着复用，等待下一个问题
+    assert daemon.current is None and not daemon.pending
+
+
+def test_daemon_queues_second_question(app, daemon):
+    """显示问题期间到达的第二个问题排队，第一个回答后才显示"""
+    first = ask(app, daemon, "First?")
+    wait_for(app, lambda: daemon.window.prompt == "First?")
+    second = ask(app, daemon, "Second?")
+    wait_for(app, lambda: len(daemon.pending) == 1)
+    assert daemon.window.prompt == "First?"
+
+    answer(daemon.window, "one")
+    assert reply(app, first) == {"interactive_feedback": "one"}
+    wait_for(app, lambda: daemon.window.prompt == "Second?" and daemon.window.isVisible())
+    answer(daemon.window, "two")
+    assert reply(app, second) == {"interactive_feedback": "two"}
+
+
+def test_daemon_withdraws_question_when_client_disconnects(app, daemon):
+    """客户端断开（调用取消）：正在显示的问题被撤回，排队中的问题被丢弃，下一个问题接着显示"""
+    shown = ask(app, daemon, "Cancelled while shown?")
+    wait_for(app, lambda: daemon.window.prompt == "Cancelled while shown?")
+    queued = ask(app, daemon, "Cancelled while queued?")
+    remaining = ask(app, daemon, "Still wanted?")
+    wait_for(app, lambda: len(daemon.pending) == 2)
+
+    queued.disconnectFromServer()
+    wait_for(app, lambda: len(daemon.pending) == 1)
+    assert daemon.window.prompt == "Cancelled while shown?"
+
+    shown.disconnectFromServer()
+    wait_for(app, lambda: daemon.window.prompt == "Still wanted?" and daemon.window.isVisible())
+    assert not daemon.pending
+    answer(daemon.window, "yes")
+    assert reply(app, remaining) == {"interactive_feedback": "yes"}
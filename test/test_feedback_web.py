@@ -0,0 +1,807 @@
+#!/usr/bin/env python3
+"""
+Web 反馈服务器测试
+"""
+
+import asyncio
+import gzip
+import http.client
+import io
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import webbrowser
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import feedback_web
+
+
+def submit(url, body):
+    """向会话页面提交表单，返回响应状态码"""
+    with urllib.request.urlopen(url + "submit", data=body.encode("utf-8"), timeout=5) as response:
+        response.read()
+        return response.status
+
+
+def test_submit_wakes_waiter_immediately(monkeypatch):
+    """提交后 get_user_input_web 应在毫秒级返回，而不是等下一次轮询"""
+    timings = {}
+
+    def fake_open(url):
+        def respond():
+            urllib.request.urlopen(url, timeout=5).read()
+            timings["submit"] = time.perf_counter()
+            submit(url, "option_1=1&feedback_text=looks+good")
+        threading.Thread(target=respond, daemon=True).start()
+        return True
+
+    monkeypatch.setattr(webbrowser, "open", fake_open)
+
+    result = feedback_web.get_user_input_web("Proceed?", ["yes", "no"])
+    latency = time.perf_counter() - timings["submit"]
+
+    assert result == {"interactive_feedback": "no\n\nlooks good"}
+    assert latency < 0.25, f"提交到返回耗时 {latency * 1000:.1f} ms"
+
+
+def test_concurrent_sessions_share_one_server():
+    """多个问题同时等待时共用一个服务器，队列接口能列出并分别回答"""
+    server = feedback_web.FeedbackWebServer()
+    server.start()
+    try:
+        sessions = [server.create_session(f"Question {i}", ["yes", "no"]) for i in range(30)]
+
+        with urllib.request.urlopen(server.url + "/api/sessions", timeout=5) as response:
+            pending = json.loads(response.read())
+        assert [item["id"] for item in pending] == [s.id for s in sessions]
+
+        for i, session in enumerate(sessions):
+            assert submit(server.session_url(session), f"option_{i % 2}=1") == 200
+
+        assert [s.future.result(timeout=1) for s in sessions] == [
+            {"interactive_feedback": "yes" if i % 2 == 0 else "no"} for i in range(30)
+        ]
+        assert server.sessions.pending_count() == 0
+    finally:
+        server.shutdown()
+
+
+def test_open_tab_receives_new_question_via_sse(monkeypatch):
+    """已有页面连接时通过 SSE 推送新问题，而不是再打开浏览器"""
+    opened = []
+    monkeypatch.setattr(webbrowser, "open", lambda url: opened.append(url))
+
+    server = feedback_web.FeedbackWebServer()
+    server.start()
+    try:
+        connection = http.client.HTTPConnection(server.host, server.port, timeout=5)
+        connection.request("GET", "/events")
+        stream = connection.getresponse()
+        assert stream.getheader("Content-Type").startswith("text/event-stream")
+        assert stream.readline() == b"retry: 1000\n"
+        stream.readline()
+
+        deadline = time.monotonic() + 5
+        while server.events.client_count() == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        session = server.open_session("Next question?")
+        assert stream.readline() == b"event: session_created\n"
+        data = json.loads(stream.readline()[len(b"data: "):])
+        assert data["id"] == session.id
+        assert opened == []
+        connection.close()
+    finally:
+        server.shutdown()
+
+
+def open_event_stream(server, client_id):
+    """以页面身份连上事件流；返回的响应对象持有连接，close() 即模拟关闭页面"""
+    connection = http.client.HTTPConnection(server.host, server.port, timeout=5)
+    connection.request("GET", f"/events?client={client_id}")
+    stream = connection.getresponse()
+    assert stream.readline() == b"retry: 1000\n"
+    return stream
+
+
+def view(server, session, client_id):
+    urllib.request.urlopen(f"{server.url}/api/sessions/{session.id}?client={client_id}", timeout=5).read()
+
+
+def test_closed_tab_dismisses_question(monkeypatch):
+    """显示问题的页面关闭（事件流断开或 pagehide beacon）后很快以 dismissed 结束，而不是等到超时"""
+    monkeypatch.setattr(feedback_web, "DISMISS_GRACE", 0.3)
+    server = feedback_web.FeedbackWebServer()
+    server.start()
+    try:
+        # 关闭标签页：事件流断开
+        session = server.create_session("Still there?")
+        stream = open_event_stream(server, "tab-1")
+        view(server, session, "tab-1")
+        started = time.perf_counter()
+        stream.close()
+        assert session.future.result(timeout=4) == {"interactive_feedback": "", "status": "dismissed"}
+        assert time.perf_counter() - started < 2.0
+
+        # pagehide beacon 不必等事件流断开
+        session = server.create_session("Still there?")
+        stream = open_event_stream(server, "tab-2")
+        view(server, session, "tab-2")
+        started = time.perf_counter()
+        request = urllib.request.Request(f"{server.url}/api/clients/tab-2/gone", data=b"", method="POST")
+        assert urllib.request.urlopen(request, timeout=5).status == 204
+        assert session.future.result(timeout=4)["status"] == "dismissed"
+        assert time.perf_counter() - started < 1.0
+        stream.close()
+    finally:
+        server.shutdown()
+
+
+def test_reloaded_tab_keeps_question_open(monkeypatch):
+    """刷新页面时旧页面离开、新页面在宽限期内重新显示问题，问题不会被结束"""
+    monkeypatch.setattr(feedback_web, "DISMISS_GRACE", 0.3)
+    server = feedback_web.FeedbackWebServer()
+    server.start()
+    try:
+        session = server.create_session("Reload me?", ["yes"])
+        old = open_event_stream(server, "before-reload")
+        view(server, session, "before-reload")
+        old.close()
+        new = open_event_stream(server, "after-reload")
+        view(server, session, "after-reload")
+        time.sleep(1.5)
+        assert not session.completed
+
+        # 回到问题队列的页面不再算作在看这个问题
+        urllib.request.urlopen(f"{server.url}/api/sessions?client=after-reload", timeout=5).read()
+        new.close()
+        time.sleep(1.5)
+        assert not session.completed
+        assert submit(server.session_url(session), "option_0=1") == 200
+        assert session.future.result(timeout=1) == {"interactive_feedback": "yes"}
+    finally:
+        server.shutdown()
+
+
+def test_slow_reload_keeps_question_open(monkeypatch):
+    """刷新比宽限期慢时，只要页面外壳已被重新请求，就等新页面登记而不结束问题"""
+    monkeypatch.setattr(feedback_web, "DISMISS_GRACE", 0.2)
+    monkeypatch.setattr(feedback_web, "RELOAD_WAIT", 0.8)
+    server = feedback_web.FeedbackWebServer()
+    server.start()
+    try:
+        session = server.create_session("Reload slowly?", ["yes"])
+        old = open_event_stream(server, "before-reload")
+        view(server, session, "before-reload")
+        request = urllib.request.Request(f"{server.url}/api/clients/before-reload/gone", data=b"", method="POST")
+        urllib.request.urlopen(request, timeout=5).read()
+        old.close()
+        # 新页面先请求外壳，脚本过了宽限期才登记
+        urllib.request.urlopen(server.session_url(session), timeout=5).read()
+        time.sleep(0.4)
+        assert not session.completed
+        new = open_event_stream(server, "after-reload")
+        view(server, session, "after-reload")
+        time.sleep(0.8)
+        assert not session.completed
+        assert submit(server.session_url(session), "option_0=1") == 200
+        new.close()
+
+        # 外壳请求了但新页面始终没有登记：等完 RELOAD_WAIT 后仍按 dismissed 结束
+        session = server.create_session("Reload fails?")
+        old = open_event_stream(server, "tab")
+        view(server, session, "tab")
+        urllib.request.urlopen(server.session_url(session), timeout=5).read()
+        old.close()
+        assert session.future.result(timeout=3)["status"] == "dismissed"
+    finally:
+        server.shutdown()
+
+
+def test_end_events_carry_reason():
+    """问题结束事件带上原因，页面据此显示已回答、页面关闭或超时撤回"""
+    server = feedback_web.FeedbackWebServer()
+    server.start()
+    try:
+        stream = open_event_stream(server, "watcher")
+        stream.readline()
+
+        def next_event():
+            event = stream.readline().decode().strip()[len("event: "):]
+            data = json.loads(stream.readline()[len(b"data: "):])
+            stream.readline()
+            return event, data.get("reason")
+
+        answered = server.create_session("Answer me?")
+        submit(server.session_url(answered), "feedback_text=ok")
+        assert next_event() == ("session_completed", "answered")
+        server.close_session(answered)
+        assert next_event() == ("session_closed", "answered")
+
+        withdrawn = server.create_session("Withdraw me?")
+        server.close_session(withdrawn)
+        assert next_event() == ("session_closed", "closed")
+
+        dismissed = server.create_session("Dismiss me?")
+        dismissed.dismiss()
+        server.close_session(dismissed)
+        assert next_event() == ("session_closed", "dismissed")
+        stream.close()
+    finally:
+        server.shutdown()
+
+
+def test_foreign_host_and_origin_rejected():
+    """DNS 重绑定：Host 不是本机的请求一律拒绝，其他网页发来的提交也拒绝"""
+    server = feedback_web.FeedbackWebServer()
+    server.start()
+    try:
+        session = server.create_session("Secret plan?", ["yes", "no"])
+
+        def request(path, headers, data=None):
+            request = urllib.request.Request(server.url + path, data=data, headers=headers)
+            try:
+                with urllib.request.urlopen(request, timeout=5) as response:
+                    return response.status, response.read()
+            except urllib.error.HTTPError as e:
+                return e.code, e.read()
+
+        port = server.port
+        for host in (f"evil.example:{port}", "localhost:1", "localhost.evil.example", ""):
+            status, body = request("/api/sessions", {"Host": host})
+            assert status == 403 and b"Secret" not in body, host
+        for host in (f"localhost:{port}", f"127.0.0.1:{port}", f"[::1]:{port}"):
+            assert request("/api/sessions", {"Host": host})[0] == 200, host
+
+        submit_path = f"/s/{session.id}/submit"
+        for origin in (f"http://evil.example:{port}", "null", f"http://localhost:{port + 1}"):
+            assert request(submit_path, {"Origin": origin}, b"option_0=1")[0] == 403, origin
+        assert request(f"/api/clients/tab/gone", {"Origin": "http://evil.example"}, b"")[0] == 403
+        assert not session.completed
+        assert request(submit_path, {"Origin": f"http://localhost:{port}"}, b"option_1=1")[0] == 200
+        assert session.future.result(timeout=1) == {"interactive_feedback": "no"}
+    finally:
+        server.shutdown()
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("localhost", 0))
+        return probe.getsockname()[1]
+
+
+def test_fixed_port_rebinds_and_falls_back_when_taken(capsys):
+    """固定端口在服务器重启后立即可用；被占用时改用下一个端口并给出提示"""
+    port = free_port()
+    server = feedback_web.FeedbackWebServer(port=port)
+    server.start()
+    session = server.create_session("Bind?")
+    assert submit(server.session_url(session), "feedback_text=ok") == 200
+    server.shutdown()
+
+    # 刚关闭的端口（有 TIME_WAIT 连接）可以立即重新绑定
+    server = feedback_web.FeedbackWebServer(port=port)
+    server.start()
+    try:
+        assert server.port == port
+        other = feedback_web.FeedbackWebServer(port=port)
+        other.start()
+        try:
+            assert other.port == port + 1
+            assert f"端口 {port} 已被占用" in capsys.readouterr().err
+        finally:
+            other.shutdown()
+    finally:
+        server.shutdown()
+
+
+def test_invalid_port_falls_back_to_random(monkeypatch, capsys):
+    """超出 1-65535 的端口设置改用随机端口，而不是启动失败"""
+    for value in ("65536", "-1", "http"):
+        monkeypatch.setenv("INTERACTIVE_FEEDBACK_PORT", value)
+        assert feedback_web.feedback_port() == 0
+        assert "不是有效端口" in capsys.readouterr().err
+    monkeypatch.setenv("INTERACTIVE_FEEDBACK_PORT", "0")
+    assert feedback_web.feedback_port() == 0
+
+    for port in (65536, 70000, -5):
+        server = feedback_web.FeedbackWebServer(port=port)
+        server.start()
+        try:
+            assert 0 < server.port <= 65535
+        finally:
+            server.shutdown()
+
+
+def test_server_waits_for_tab_of_previous_question(monkeypatch):
+    """上一个问题的页面还开着时，新服务器等它重连后把新问题推给它，而不是再开一个标签页"""
+    opened = []
+    monkeypatch.setattr(webbrowser, "open", lambda url: opened.append(url))
+    server = feedback_web.FeedbackWebServer(port=free_port(), reconnect_tabs=True)
+    server.start()
+    streams = []
+
+    def reconnect():
+        # 模拟旧页面的 EventSource 在新服务器启动后约 1 秒内重连
+        time.sleep(0.3)
+        streams.append(open_event_stream(server, "old-tab"))
+
+    try:
+        reconnecting = threading.Thread(target=reconnect, daemon=True)
+        reconnecting.start()
+        started = time.perf_counter()
+        session = server.open_session("After restart?")
+        assert time.perf_counter() - started < feedback_web.TAB_RECONNECT_WAIT
+        assert opened == []
+        reconnecting.join(timeout=5)
+        stream = streams[0]
+        stream.readline()
+        assert stream.readline() == b"event: session_created\n"
+        assert json.loads(stream.readline()[len(b"data: "):])["id"] == session.id
+        stream.close()
+    finally:
+        server.shutdown()
+
+
+def test_fresh_server_opens_browser_without_waiting(monkeypatch):
+    """没有页面会重连过来时，新服务器不等旧标签页，立即打开浏览器"""
+    opened = []
+    monkeypatch.setattr(webbrowser, "open", lambda url: opened.append(url))
+    server = feedback_web.FeedbackWebServer(port=free_port())
+    server.start()
+    try:
+        started = time.perf_counter()
+        session = server.open_session("First question?")
+        assert time.perf_counter() - started < 0.5
+        assert opened == [server.session_url(session)]
+    finally:
+        server.shutdown()
+
+
+def test_subprocess_server_ready_without_reconnect_wait():
+    """子进程模式下上一个问题没有留下打开的页面时，新子进程在固定端口上也不等重连"""
+    from feedback_ipc import encode_request, read_frames
+
+    env = dict(os.environ, INTERACTIVE_FEEDBACK_PORT=str(free_port()), BROWSER="true")
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "feedback_web.py")
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, script, "--ipc"], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL, env=env)
+    try:
+        process.stdin.write(encode_request("Ready?", ["yes"]))
+        process.stdin.close()
+        frames = read_frames(process.stdout)
+        waiting = next(frames)
+        ready = time.perf_counter() - started
+        assert waiting["stage"] == "waiting"
+        # 含解释器启动和模块导入；多等一次重连就会超过 TAB_RECONNECT_WAIT
+        assert ready < feedback_web.TAB_RECONNECT_WAIT, f"就绪耗时 {ready * 1000:.1f} ms"
+        assert submit(waiting["url"], "option_0=1") == 200
+        assert next(frames) == {"type": "progress", "stage": "finished", "tab_open": False}
+        assert next(frames)["result"] == {"interactive_feedback": "yes"}
+    finally:
+        process.kill()
+        process.wait()
+
+
+def test_subprocess_questions_reuse_open_tab(tmp_path, monkeypatch):
+    """子进程模式：上一个问题结束时页面还开着，下一个子进程等它重连并推送问题，不再打开浏览器"""
+    server = pytest.importorskip("server")
+    port = free_port()
+    opened = tmp_path / "opened"
+    monkeypatch.setenv("INTERACTIVE_FEEDBACK_UI", "web")
+    monkeypatch.setenv("INTERACTIVE_FEEDBACK_WEB_MODE", "subprocess")
+    monkeypatch.setenv("INTERACTIVE_FEEDBACK_PORT", str(port))
+    # 每次打开浏览器记一行
+    monkeypatch.setenv("BROWSER", f"{sys.executable} -c \"open(r'{opened}', 'a').write('x')\" %s")
+    monkeypatch.setattr(server, "_web_tab_open", False)
+    answered = []
+    done = threading.Event()
+
+    def tab():
+        """模拟反馈页面：连上事件流，回答所有待回答的问题；断线后每 0.1 秒重连"""
+        base = f"http://localhost:{port}"
+        while not done.is_set():
+            try:
+                stream = urllib.request.urlopen(f"{base}/events?client=tab", timeout=5)
+            except OSError:
+                time.sleep(0.1)
+                continue
+            try:
+                while not done.is_set():
+                    with urllib.request.urlopen(f"{base}/api/sessions", timeout=5) as response:
+                        pending = [s["id"] for s in json.loads(response.read()) if s["id"] not in answered]
+                    for session_id in pending:
+                        answered.append(session_id)
+                        submit(f"{base}/s/{session_id}/", "feedback_text=ok")
+                    if not stream.readline():
+                        break
+            except (OSError, http.client.HTTPException, ValueError):
+                # 子进程退出时连接中途断开
+                pass
+            finally:
+                stream.close()
+
+    processes = []
+    create_subprocess_exec = asyncio.create_subprocess_exec
+
+    async def spawn(*args, **kwargs):
+        processes.append(await create_subprocess_exec(*args, **kwargs))
+        return processes[-1]
+
+    monkeypatch.setattr(asyncio, "create_subprocess_exec", spawn)
+
+    async def scenario():
+        results = [await server.launch_feedback_ui_async(question, None, timeout=30)
+                   for question in ("First?", "Second?")]
+        # 子进程在返回结果后自行退出，等它们退出后再关闭事件循环
+        for process in processes:
+            await process.wait()
+        return results
+
+    threading.Thread(target=tab, daemon=True).start()
+    try:
+        assert asyncio.run(scenario()) == [{"interactive_feedback": "ok"}] * 2
+    finally:
+        done.set()
+    assert len(answered) == 2
+    assert opened.read_text() == "x"
+
+
+def test_static_shell_cached_and_question_fetched_as_json():
+    """静态外壳支持 ETag 协商和 gzip，问题内容单独以 JSON 返回"""
+    server = feedback_web.FeedbackWebServer()
+    server.start()
+    try:
+        session = server.create_session("Ship it?", ["yes", "no"])
+        connection = http.client.HTTPConnection(server.host, server.port, timeout=5)
+
+        connection.request("GET", f"/s/{session.id}/", headers={"Accept-Encoding": "gzip"})
+        response = connection.getresponse()
+        shell = gzip.decompress(response.read())
+        etag = response.getheader("ETag")
+        assert response.getheader("Content-Encoding") == "gzip"
+        assert b"Ship it?" not in shell
+
+        connection.request("GET", "/", headers={"If-None-Match": etag})
+        response = connection.getresponse()
+        assert response.status == 304
+        assert response.read() == b""
+
+        # Markdown 渲染器随项目分发，不再依赖 CDN
+        assert b"cdn.jsdelivr.net" not in shell
+        for name in (rb"markdown\.js", rb"app\.js"):
+            script = re.search(rb'src="(/static/' + name + rb'\?v=\w+)"', shell).group(1).decode()
+            connection.request("GET", script)
+            response = connection.getresponse()
+            assert response.status == 200 and response.read()
+            assert "immutable" in response.getheader("Cache-Control")
+
+        connection.request("GET", f"/api/sessions/{session.id}")
+        response = connection.getresponse()
+        payload = response.read()
+        data = json.loads(payload)
+        data.pop("html", None)
+        assert data == {"id": session.id, "prompt": "Ship it?", "options": ["yes", "no"],
+                        "max_body_size": feedback_web.MAX_BODY_SIZE}
+        assert len(payload) < 200
+        connection.close()
+    finally:
+        server.shutdown()
+
+
+
+def test_keep_alive_and_stalled_connection_do_not_block_submit(monkeypatch):
+    """HTTP/1.1 复用连接；卡住的连接既不影响提交，也会在超时后被关闭"""
+    monkeypatch.setattr(feedback_web.FeedbackHandler, "timeout", 0.5)
+    server = feedback_web.FeedbackWebServer()
+    server.start()
+    try:
+        session = server.create_session("Keep alive?", ["yes"])
+
+        # 只发了一半请求头的连接，会一直占着自己的处理线程
+        stalled = socket.create_connection((server.host, server.port))
+        stalled.sendall(b"GET / HTTP/1.1\r\nHost: x\r\n")
+
+        connection = http.client.HTTPConnection(server.host, server.port, timeout=5)
+        connection.request("GET", "/api/sessions")
+        response = connection.getresponse()
+        response.read()
+        assert response.version == 11
+        sock = connection.sock
+        # 没有响应体的 404 也带长度，连接可以继续使用
+        connection.request("GET", "/missing")
+        response = connection.getresponse()
+        assert response.status == 404 and response.read() == b""
+
+        started = time.perf_counter()
+        connection.request("POST", f"/s/{session.id}/submit", body="option_0=1",
+                           headers={"Content-Type": "application/x-www-form-urlencoded"})
+        response = connection.getresponse()
+        assert json.loads(response.read())["status"] == "ok"
+        assert time.perf_counter() - started < 0.25
+        assert connection.sock is sock
+        assert session.future.result(timeout=1) == {"interactive_feedback": "yes"}
+        connection.close()
+
+        stalled.settimeout(5)
+        assert stalled.recv(1024) == b""
+        stalled.close()
+    finally:
+        server.shutdown()
+
+
+def test_connections_over_limit_are_rejected():
+    """超出连接上限时立即返回 503，而不是排队等待"""
+    server = feedback_web.FeedbackWebServer(max_connections=2)
+    server.start()
+    try:
+        held = [socket.create_connection((server.host, server.port)) for _ in range(2)]
+        time.sleep(0.1)
+        extra = socket.create_connection((server.host, server.port))
+        extra.settimeout(5)
+        assert extra.recv(1024).startswith(b"HTTP/1.1 503")
+        extra.close()
+
+        # 释放连接后恢复服务
+        for sock in held:
+            sock.close()
+        time.sleep(0.1)
+        with urllib.request.urlopen(server.url + "/api/sessions", timeout=5) as response:
+            assert response.status == 200
+    finally:
+        server.shutdown()
+
+
+def test_large_prompt_streamed_in_chunks():
+    """大提示不内嵌在问题 JSON 中，而是以 chunked 编码（可 gzip）分块发送"""
+    prompt = "## 日志\n\n" + "".join(f"line {i}: 状态正常\n" for i in range(100000))
+    server = feedback_web.FeedbackWebServer()
+    server.start()
+    try:
+        session = server.create_session(prompt, ["ok"])
+        connection = http.client.HTTPConnection(server.host, server.port, timeout=5)
+
+        connection.request("GET", f"/api/sessions/{session.id}")
+        response = connection.getresponse()
+        payload = response.read()
+        data = json.loads(payload)
+        assert "prompt" not in data and "html" not in data
+        assert data["prompt_size"] == len(prompt.encode("utf-8"))
+        assert len(payload) < 200
+
+        connection.request("GET", data["prompt_url"])
+        response = connection.getresponse()
+        assert response.getheader("Transfer-Encoding") == "chunked"
+        assert response.read().decode("utf-8") == prompt
+
+        connection.request("GET", data["prompt_url"], headers={"Accept-Encoding": "gzip"})
+        response = connection.getresponse()
+        assert response.getheader("Content-Encoding") == "gzip"
+        assert gzip.decompress(response.read()).decode("utf-8") == prompt
+        connection.close()
+    finally:
+        server.shutdown()
+
+def test_large_option_list_keeps_indices_and_text():
+    """上万个选项以 JSON 列表原样下发，提交按原始下标还原（含 ||| 等分隔符）"""
+    options = [f"tests/test_{i}.py::case|||{i}" for i in range(10000)]
+    server = feedback_web.FeedbackWebServer()
+    server.start()
+    try:
+        session = server.create_session("Which tests failed?", options)
+        with urllib.request.urlopen(f"{server.url}/api/sessions/{session.id}", timeout=5) as response:
+            assert json.loads(response.read())["options"] == options
+
+        assert submit(server.session_url(session), "option_9999=1&option_0=1&option_5000=1") == 200
+        assert session.future.result(timeout=1) == {
+            "interactive_feedback": "; ".join([options[0], options[5000], options[9999]])
+        }
+    finally:
+        server.shutdown()
+
+
+def test_batch_questions_answered_in_one_submit():
+    """批量提问：一个页面列出全部问题，字段带 q<j>. 前缀，一次提交得到 answers 列表"""
+    questions = [
+        {"prompt": "Which database?", "predefined_options": ["sqlite", "postgres"]},
+        {"prompt": "# Deploy now?", "predefined_options": []},
+    ]
+    server = feedback_web.FeedbackWebServer()
+    server.start()
+    try:
+        session = server.create_session("Which database?", None, questions)
+        with urllib.request.urlopen(f"{server.url}/api/sessions/{session.id}", timeout=5) as response:
+            payload = json.loads(response.read())
+        assert [(q["prompt"], q["options"]) for q in payload["questions"]] == [
+            ("Which database?", ["sqlite", "postgres"]), ("# Deploy now?", []),
+        ]
+
+        assert submit(server.session_url(session), "q0.option_1=1&q0.feedback_text=&q1.feedback_text=yes") == 200
+        assert session.future.result(timeout=1) == {"answers": [
+            {"message": "Which database?", "interactive_feedback": "postgres"},
+            {"message": "# Deploy now?", "interactive_feedback": "yes"},
+        ]}
+    finally:
+        server.shutdown()
+
+
+def test_batch_tool_returns_one_answer_per_question(monkeypatch):
+    """interactive_feedback_batch 总是按问题数返回 answers，超时或出错时为空并附带 error"""
+    import asyncio
+    server = pytest.importorskip("server")
+    results = [{"answers": [{"message": "A?", "interactive_feedback": "a"},
+                            {"message": "B?", "interactive_feedback": "b"}]},
+               {"interactive_feedback": ""},
+               {"interactive_feedback": "Error: boom"},
+               {"interactive_feedback": "", "status": "dismissed"}]
+
+    async def fake_launch(message, options=None, questions=None, timeout=None):
+        assert (message, options) == ("A?", None)
+        assert questions == [{"prompt": "A?", "predefined_options": ["1"]}, {"prompt": "B?", "predefined_options": []}]
+        return results.pop(0)
+
+    monkeypatch.setattr(server, "launch_feedback_ui_async", fake_launch)
+    batch = [server.BatchQuestion(message="A?", predefined_options=["1"]), server.BatchQuestion(message="B?")]
+    assert asyncio.run(server.interactive_feedback_batch(batch))["answers"][1]["interactive_feedback"] == "b"
+    empty = [{"message": "A?", "interactive_feedback": ""}, {"message": "B?", "interactive_feedback": ""}]
+    assert asyncio.run(server.interactive_feedback_batch(batch)) == {"answers": empty}
+    assert asyncio.run(server.interactive_feedback_batch(batch)) == {"answers": empty, "error": "Error: boom"}
+    assert asyncio.run(server.interactive_feedback_batch(batch)) == {"answers": empty, "status": "dismissed"}
+    assert asyncio.run(server.interactive_feedback_batch([])) == {"answers": []}
+
+
+def test_submit_body_limit_and_multipart():
+    """超出上限的提交返回 413 且问题仍待回答；multipart 提交与表单提交结果一致"""
+    server = feedback_web.FeedbackWebServer(max_body_size=1024)
+    server.start()
+    try:
+        session = server.create_session("Paste the log", ["yes", "no"])
+        with urllib.request.urlopen(f"{server.url}/api/sessions/{session.id}", timeout=5) as response:
+            assert json.loads(response.read())["max_body_size"] == 1024
+        with pytest.raises(urllib.error.HTTPError) as error:
+            submit(server.session_url(session), "feedback_text=" + "x" * 2000)
+        assert error.value.code == 413
+        assert not session.completed
+
+        boundary = "----feedbackBoundary"
+        body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"option_1\"\r\n\r\n1\r\n"
+                f"--{boundary}\r\nContent-Disposition: form-data; name=\"feedback_text\"\r\n\r\nsee log\r\n"
+                f"--{boundary}--\r\n").encode("utf-8")
+        request = urllib.request.Request(server.session_url(session) + "submit", data=body,
+                                         headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+        with urllib.request.urlopen(request, timeout=5) as response:
+            assert response.status == 200
+        assert session.future.result(timeout=1) == {"interactive_feedback": "no\n\nsee log"}
+    finally:
+        server.shutdown()
+
+
+def multipart(fields, boundary="----feedbackBoundary"):
+    """[(name, filename, bytes)] -> (请求体, Content-Type)"""
+    body = b""
+    for name, filename, data in fields:
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else "")
+        body += f"--{boundary}\r\nContent-Disposition: {disposition}\r\n\r\n".encode("utf-8") + data + b"\r\n"
+    return body + f"--{boundary}--\r\n".encode("utf-8"), f"multipart/form-data; boundary={boundary}"
+
+
+def test_attachments_stored_by_hash_and_served_with_sendfile(tmp_path, monkeypatch):
+    """附件按内容哈希去重存储，预览走 sendfile，提交结果里是文件路径而不是内容"""
+    sent = []
+    real_sendfile = os.sendfile
+    monkeypatch.setattr(os, "sendfile", lambda *args: sent.append(args[3]) or real_sendfile(*args))
+
+    server = feedback_web.FeedbackWebServer(attachment_dir=str(tmp_path))
+    server.start()
+    try:
+        session = server.create_session("Send me the screenshot", ["yes"])
+        upload_url = server.session_url(session) + "attachments"
+        screenshot = os.urandom(300 * 1024)
+
+        def upload(fields):
+            body, content_type = multipart(fields)
+            request = urllib.request.Request(upload_url, data=body, headers={"Content-Type": content_type})
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return json.loads(response.read())["attachments"]
+
+        [first, log] = upload([("file", "shot.png", screenshot), ("file", "build.log", b"error: boom\n")])
+        [again] = upload([("file", "copy.png", screenshot)])
+        assert again["id"] == first["id"] and first["preview"] and not log["preview"]
+        stored = [p for p in tmp_path.rglob("*") if p.is_file()]
+        assert len(stored) == 2
+
+        with urllib.request.urlopen(server.url + first["url"], timeout=5) as response:
+            assert response.read() == screenshot
+            assert response.getheader("Content-Type") == "image/png"
+            assert "immutable" in response.getheader("Cache-Control")
+        with urllib.request.urlopen(server.url + log["url"], timeout=5) as response:
+            assert response.getheader("Content-Disposition") == "attachment"
+        assert sum(sent) >= len(screenshot)
+
+        for bad in ["../../etc/passwd", "0" * 64, first["id"] + "x"]:
+            with pytest.raises(urllib.error.HTTPError) as error:
+                urllib.request.urlopen(f"{server.url}/attachments/{bad}", timeout=5)
+            assert error.value.code == 404
+
+        body = f"feedback_text=see+attached&attachment={log['id']}&attachment={first['id']}&attachment=bogus"
+        assert submit(server.session_url(session), body) == 200
+        feedback = session.future.result(timeout=1)["interactive_feedback"]
+        path = str(tmp_path / first["id"][:2] / first["id"])
+        assert feedback.startswith("see attached\n\nAttachments:\n- ")
+        assert f"- {path} (shot.png, image/png, {len(screenshot)} bytes)" in feedback
+        assert feedback.index("build.log") < feedback.index("shot.png")
+    finally:
+        server.shutdown()
+
+
+def test_old_attachments_pruned_when_store_opens(tmp_path):
+    """打开附件目录时按保留天数和总大小清理旧文件，重复上传会刷新文件时间"""
+    from feedback_attachments import AttachmentStore
+
+    first = AttachmentStore(str(tmp_path / "a"), retention_days=0, max_bytes=0)
+    day = 86400
+    now = time.time()
+    stored = {}
+    for name, age in [("stale", 30 * day), ("old", 3 * day), ("older", 5 * day), ("new", 0)]:
+        attachment = first.put(io.BytesIO(name.encode() * 100), name + ".log")
+        os.utime(attachment.path, (now - age, now - age))
+        stored[name] = attachment.path
+    # 再次上传同样的内容，这个文件不再算旧
+    first.put(io.BytesIO(b"older" * 100), "again.log")
+
+    # 同一进程里同一个目录只清理一次
+    AttachmentStore(str(tmp_path / "a"), retention_days=7, max_bytes=900)
+    assert all(os.path.exists(path) for path in stored.values())
+
+    store = AttachmentStore(str(tmp_path / "a"), retention_days=0, max_bytes=0)
+    store.retention_days, store.max_bytes = 7, 900
+    assert store.prune() == 2
+    assert [name for name, path in stored.items() if os.path.exists(path)] == ["older", "new"]
+
+
+def test_sanitize_html_strips_scripts_and_unsafe_links():
+    """服务端渲染结果只保留安全的标签和链接"""
+    cleaned = feedback_web.sanitize_html(
+        '<p onclick="x()">hi<script>alert(1)</script>'
+        '<a href="javascript:alert(1)">a</a><a href="https://example.com">b</a></div>'
+    )
+    # 链接一律在新标签页打开，点击不会让反馈页面离开当前问题
+    link = ' target="_blank" rel="noopener noreferrer"'
+    assert cleaned == f'<p>hi<a{link}>a</a><a href="https://example.com"{link}>b</a></p>'
+
+
+def test_server_side_markdown_cached_by_prompt_hash(monkeypatch):
+    """相同提示只解析一次，之后直接命中 LRU 缓存"""
+    pytest.importorskip("markdown")
+    monkeypatch.setattr(feedback_web, "_markdown_cache", feedback_web.MarkdownCache(max_size=2))
+    prompt = "## Plan\n\n```python\nprint('<hi>')\n```"
+
+    first = feedback_web.render_markdown(prompt)
+    assert "<h2>Plan</h2>" in first
+    assert 'class="codehilite"' in first
+    assert "&lt;hi&gt;" in first
+
+    calls = []
+    monkeypatch.setattr(feedback_web.markdown_lib, "markdown", lambda *a, **k: calls.append(a) or "")
+    assert feedback_web.render_markdown(prompt) == first
+    assert calls == []
+    assert feedback_web._markdown_cache.hits == 1
+
+    feedback_web.render_markdown("a")
+    feedback_web.render_markdown("b")
+    assert feedback_web._markdown_cache.get(feedback_web.MarkdownCache.key(prompt)) is None
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
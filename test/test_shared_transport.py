@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+共享 HTTP 传输测试：一个服务器进程同时服务多个 MCP 客户端
+"""
+
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+server = pytest.importorskip("server")
+fastmcp = pytest.importorskip("fastmcp")
+from mcp import types
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("localhost", 0))
+        return probe.getsockname()[1]
+
+
+def test_transport_args_default_to_stdio(monkeypatch):
+    """默认仍是 stdio；环境变量或命令行可以切换到共享的 HTTP 传输"""
+    monkeypatch.delenv("INTERACTIVE_FEEDBACK_TRANSPORT", raising=False)
+    args = server.parse_args([])
+    assert (args.transport, args.host, args.port) == ("stdio", "127.0.0.1", server.DEFAULT_MCP_PORT)
+
+    # 默认端口不在反馈页面的端口及其备用端口范围内，两者不会抢同一个端口
+    feedback_web = pytest.importorskip("feedback_web")
+    page_ports = range(feedback_web.DEFAULT_PORT, feedback_web.DEFAULT_PORT + feedback_web.PORT_FALLBACK_ATTEMPTS)
+    assert server.DEFAULT_MCP_PORT not in page_ports
+
+    monkeypatch.setenv("INTERACTIVE_FEEDBACK_TRANSPORT", "HTTP")
+    assert server.parse_args([]).transport == "http"
+    assert server.parse_args(["--transport", "sse", "--port", "9000"]).port == 9000
+
+
+def test_answer_cache_scoped_per_client_session():
+    """共享服务器上一个客户端的回答不会被另一个客户端复用"""
+    cache = server.AnswerCache(mode="auto")
+    cache.put("Proceed?", ["yes", "no"], "yes", scope="session-a")
+    assert cache.get("Proceed?", ["yes", "no"], scope="session-a") == "yes"
+    assert cache.get("Proceed?", ["yes", "no"], scope="session-b") is None
+    assert cache.get("Proceed?", ["yes", "no"]) is None
+
+
+@pytest.fixture
+def shared_server(tmp_path):
+    """以 HTTP 传输启动的服务器进程，返回 (MCP 地址, 反馈页面地址)"""
+    mcp_port, page_port = free_port(), free_port()
+    env = dict(os.environ, INTERACTIVE_FEEDBACK_UI="web", INTERACTIVE_FEEDBACK_PORT=str(page_port),
+               BROWSER="true", FASTMCP_SHOW_SERVER_BANNER="false")
+    log = open(tmp_path / "server.log", "wb")
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, "server.py"), "--transport", "http",
+                                "--port", str(mcp_port)], env=env, stdout=log, stderr=log)
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", mcp_port), timeout=1).close()
+                break
+            except OSError:
+                assert process.poll() is None and time.monotonic() < deadline, (tmp_path / "server.log").read_text()
+                time.sleep(0.1)
+        yield f"http://127.0.0.1:{mcp_port}/mcp", f"http://localhost:{page_port}"
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+        log.close()
+
+
+def test_one_server_routes_questions_of_many_clients(shared_server):
+    """两个 IDE 连接同一个服务器：问题在同一个队列里按客户端标注，回答各自回到提问的客户端"""
+    mcp_url, page_url = shared_server
+
+    def pending():
+        with urllib.request.urlopen(page_url + "/api/sessions", timeout=5) as response:
+            return json.loads(response.read())
+
+    async def ask(name, question):
+        client = fastmcp.Client(mcp_url, client_info=types.Implementation(name=name, version="1.0"))
+        async with client:
+            result = await client.call_tool("interactive_feedback", {"message": question, "predefined_options": ["A", "B"]})
+            return json.loads(result.content[0].text)
+
+    async def answer():
+        deadline = time.monotonic() + 30
+        while len(sessions := await asyncio.to_thread(pending)) < 2:
+            assert time.monotonic() < deadline, "问题没有出现在队列里"
+            await asyncio.sleep(0.1)
+        for session in sessions:
+            # 每个问题选与客户端对应的选项，回答若串到另一个客户端就能看出来
+            body = b"option_0=1" if session["client"].startswith("cursor") else b"option_1=1"
+            request = urllib.request.Request(f"{page_url}/s/{session['id']}/submit", data=body)
+            await asyncio.to_thread(lambda: urllib.request.urlopen(request, timeout=5).read())
+        return sessions
+
+    async def scenario():
+        return await asyncio.gather(ask("cursor", "From Cursor?"), ask("windsurf", "From Windsurf?"), answer())
+
+    cursor, windsurf, sessions = asyncio.run(scenario())
+    assert cursor == {"interactive_feedback": "A"}
+    assert windsurf == {"interactive_feedback": "B"}
+    labels = {session["preview"]: session["client"] for session in sessions}
+    assert labels["From Cursor?"].startswith("cursor · ")
+    assert labels["From Windsurf?"].startswith("windsurf · ")
+    # 标签带上各自的 MCP 会话 ID
+    assert labels["From Cursor?"].split(" · ")[1] != labels["From Windsurf?"].split(" · ")[1]
+
+
+def test_foreign_host_and_origin_rejected(shared_server):
+    """DNS 重绑定：Host 不是本服务器、或浏览器请求来自其他网站时，MCP 端点返回 403"""
+    mcp_url, _ = shared_server
+    port = int(mcp_url.split(":")[2].split("/")[0])
+    initialize = json.dumps({"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {
+        "protocolVersion": "2025-03-26", "capabilities": {}, "clientInfo": {"name": "probe", "version": "1"}}})
+
+    def post(headers):
+        request = urllib.request.Request(mcp_url, data=initialize.encode("utf-8"), headers={
+            "Content-Type": "application/json", "Accept": "application/json, text/event-stream", **headers})
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    assert post({"Origin": "http://evil.example"}) == 403
+    assert post({"Host": f"evil.example:{port}"}) == 403
+    assert post({"Host": f"evil.example:{port}", "Origin": f"http://evil.example:{port}"}) == 403
+    assert post({"Origin": "null"}) == 403
+    assert post({"Origin": f"http://localhost:{port}"}) == 200
+    assert post({}) == 200
+
+
+def test_guard_on_wildcard_address_allows_any_host_but_same_origin_only():
+    """监听所有地址时任何 Host 都可能合法，但浏览器请求仍只能来自同一来源"""
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope["path"])
+
+    guard = server.LocalOriginGuard(app, host="0.0.0.0", port=8780)
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    def request(headers):
+        scope = {"type": "http", "path": "/mcp",
+                 "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()]}
+        asyncio.run(guard(scope, None, send))
+
+    request({"Host": "devbox.lan:8780"})
+    request({"Host": "devbox.lan:8780", "Origin": "http://devbox.lan:8780"})
+    assert calls == ["/mcp", "/mcp"] and not sent
+    request({"Host": "devbox.lan:8780", "Origin": "http://evil.example"})
+    assert calls == ["/mcp", "/mcp"] and sent[0]["status"] == 403
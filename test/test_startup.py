@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+server.py 启动耗时测试
+
+IDE 会频繁重启 MCP 服务器，这里用 `python -X importtime` 统计导入 server.py
+本身的开销（fastmcp/pydantic 先行导入，不计入预算），超出预算即失败。
+预算可通过 INTERACTIVE_FEEDBACK_IMPORT_BUDGET_MS 调整。
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("fastmcp")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_BUDGET_MS = float(os.environ.get("INTERACTIVE_FEEDBACK_IMPORT_BUDGET_MS", "150"))
+RUNS = 5
+
+# 只在第一次提问时才需要的模块，不应在启动时导入
+LAZY_MODULES = ["PySide6", "feedback_web", "feedback_ui", "http.server", "markdown", "pygments"]
+
+# 先导入框架，统计的就只是 server.py 自己带来的导入
+PRELUDE = "import fastmcp, pydantic; from fastmcp import FastMCP; "
+
+
+def import_server(code):
+    """在新的解释器里导入 server，返回 (-X importtime 输出, stdout)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PRELUDE + "import server; " + code],
+        cwd=ROOT, capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    return result.stderr, result.stdout
+
+
+def server_import_ms(importtime_output):
+    """从 -X importtime 输出中取出 server 模块的累计耗时（毫秒）"""
+    for line in importtime_output.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == "server":
+            return int(fields[1]) / 1000
+    raise AssertionError("server not found in -X importtime output")
+
+
+def test_import_time_budget():
+    """导入 server.py 的耗时（取中位数）应在预算之内"""
+    timings = [server_import_ms(import_server("")[0]) for _ in range(RUNS)]
+    median = statistics.median(timings)
+    print(f"server import: median {median:.1f} ms, runs {[round(t, 1) for t in timings]}")
+    assert median <= IMPORT_BUDGET_MS, (
+        f"importing server.py took {median:.1f} ms (budget {IMPORT_BUDGET_MS:.0f} ms)"
+    )
+
+
+def test_backends_not_imported_at_startup():
+    """启动时不应导入反馈界面、Qt 或 Markdown 等重量级模块"""
+    code = f"import json, sys; print(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))"
+    _, stdout = import_server(code)
+    assert json.loads(stdout) == []
+
+
+def test_backend_detection_is_cached():
+    """后端探测只做一次，且不会为检查 PySide6 而导入它"""
+    code = (
+        "import json, sys; "
+        "server.select_feedback_interface(); server.select_feedback_interface(); "
+        "info = server.detect_feedback_backends.cache_info(); "
+        "print(json.dumps([info.misses, info.hits, 'PySide6' in sys.modules]))"
+    )
+    _, stdout = import_server(code)
+    assert json.loads(stdout) == [1, 1, False]